@@ -0,0 +1,95 @@
+"""Cached set of guild administrators for the Discord bot.
+
+Finding who to notify used to mean walking every member of the guild on each
+`!verify`. AdminDirectory keeps the admin member IDs per guild instead, built
+once when the guild becomes available and then kept current from member and
+role events. A member counts as an admin if they have the Administrator
+permission or hold one of ADMIN_ROLE_IDS; bots never do.
+
+Notifications go out concurrently, at most `concurrency` DMs in flight at a
+time. discord.py already waits out 429s per route bucket, so keeping the burst
+small is what keeps a large admin team from tripping the limits in the first
+place.
+"""
+import asyncio
+
+import discord
+
+
+class AdminDirectory:
+    """Admin member IDs per guild, kept up to date from gateway events"""
+
+    def __init__(self, admin_role_ids=(), concurrency=5):
+        self.admin_role_ids = {int(role_id) for role_id in admin_role_ids}
+        self.concurrency = concurrency
+        self._admins = {}  # guild_id -> set of member IDs
+
+    def is_admin(self, member):
+        if member.bot:
+            return False
+        if member.guild_permissions.administrator:
+            return True
+        return any(role.id in self.admin_role_ids for role in member.roles)
+
+    # === INDEX MAINTENANCE ===
+    def rebuild(self, guild):
+        """Scan a guild's members once (on ready / join / permission changes)"""
+        self._admins[guild.id] = {member.id for member in guild.members if self.is_admin(member)}
+
+    def update_member(self, member):
+        """Re-evaluate one member after they joined or their roles changed"""
+        admins = self._admins.get(member.guild.id)
+        if admins is None:
+            return
+        if self.is_admin(member):
+            admins.add(member.id)
+        else:
+            admins.discard(member.id)
+
+    def remove_member(self, member):
+        admins = self._admins.get(member.guild.id)
+        if admins is not None:
+            admins.discard(member.id)
+
+    def role_changed(self, before, after):
+        """Re-scan when a role gains or loses Administrator, or an admin role is deleted"""
+        if after is None:
+            if before.id in self.admin_role_ids or before.permissions.administrator:
+                self.rebuild(before.guild)
+        elif before.permissions.administrator != after.permissions.administrator:
+            self.rebuild(after.guild)
+
+    def forget_guild(self, guild):
+        self._admins.pop(guild.id, None)
+
+    # === LOOKUP ===
+    def admins(self, guild):
+        """Admin members of a guild, building the index on first use"""
+        if guild.id not in self._admins:
+            self.rebuild(guild)
+        members = []
+        for member_id in list(self._admins[guild.id]):
+            member = guild.get_member(member_id)
+            if member is not None:
+                members.append(member)
+        return members
+
+    def count(self, guild):
+        return len(self._admins.get(guild.id, ()))
+
+    async def notify(self, guild, **message):
+        """DM every admin of a guild concurrently; returns how many received it"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send(member):
+            async with semaphore:
+                try:
+                    await member.send(**message)
+                    return True
+                except (discord.Forbidden, discord.HTTPException) as e:
+                    # Usually the admin has DMs from server members turned off
+                    print(f"⚠️  Could not DM admin {member.id}: {e}")
+                    return False
+
+        results = await asyncio.gather(*(send(member) for member in self.admins(guild)))
+        return sum(results)
@@ -0,0 +1,484 @@
+"""Single-event-loop serving mode: the HTTP API and the Discord bot share one asyncio loop.
+
+`SERVER_MODE=async python main.py` runs this instead of waitress threads plus
+a bot thread with its own loop. The endpoints game servers and the bot's
+users hit are served natively by aiohttp handlers on top of the async
+service API: reads come straight from the in-memory snapshot, Roblox lookups
+go through aiohttp and writes await the WAL group commit, so none of them
+needs a thread. Every other route (admin panel, bulk import/export,
+replication, status pages) falls through to the Flask app on a worker
+thread, with its request and response bodies streamed, so both modes serve
+the same API.
+"""
+import asyncio
+import io
+import sys
+import time
+
+from aiohttp import web
+
+from expiry import parse_expires_at
+from roblox_client import budget as roblox_budget
+import web_server
+from web_server import (
+    BOT_TOKEN, HTTP_REQUEST_SECONDS, HTTP_REQUESTS, RATE_LIMITED, WRITE_ENDPOINTS,
+    bot, client_key, in_flight_limits, rate_limiters, store, whitelist_service
+)
+
+# Chunks of a fallback (Flask) response buffered ahead of a slow client
+FALLBACK_QUEUE_SIZE = 8
+
+
+# === RESPONSES ===
+def json_error(message, status):
+    return web.json_response({'error': message}, status=status)
+
+
+def too_many_requests(retry_after, message):
+    retry_after = max(1, int(-(-retry_after // 1)))
+    return web.json_response({'error': message, 'retry_after': retry_after}, status=429,
+                             headers={'Retry-After': str(retry_after)})
+
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+# === GAME SERVER / API ROUTES ===
+async def health_check(request):
+    return web.json_response({
+        'status': 'healthy',
+        'service': 'Roblox Whitelist API',
+        'timestamp': time.time(),
+        'discord_bot': 'online'
+    })
+
+
+async def check_whitelist(request):
+    user_id = request.query.get('user_id')
+
+    if not user_id:
+        return json_error('No user_id provided', 400)
+
+    try:
+        user_id = int(user_id)
+    except ValueError:
+        return json_error('Invalid user_id', 400)
+    return web.json_response(await whitelist_service.check_async(user_id))
+
+
+async def check_whitelist_batch(request):
+    payload, status_code = web_server.batch_check(await read_json(request) or {})
+    return web.json_response(payload, status=status_code)
+
+
+async def verify_username(request):
+    username = request.query.get('username')
+
+    if not username:
+        return json_error('No username provided', 400)
+
+    result = await whitelist_service.verify_async(username)
+    if result:
+        return web.json_response(result)
+    return web.json_response({'success': False, 'error': 'User not found on Roblox'}, status=404)
+
+
+async def get_whitelist_changes(request):
+    since = request.query.get('since')
+
+    if since is None:
+        return json_error('No since provided', 400)
+
+    try:
+        since = int(since)
+    except ValueError:
+        return json_error('Invalid since', 400)
+
+    result = whitelist_service.changes_since(since)
+    if result is None:
+        return web.json_response({
+            'status': 'resync',
+            'resync': True,
+            'message': 'Requested sequence is no longer available, fetch /whitelist again',
+            'since': since
+        })
+
+    seq, added, removed = result
+    return web.json_response({
+        'status': 'success',
+        'resync': False,
+        'since': since,
+        'seq': seq,
+        'added': [user_id for user_id, _ in added],
+        'added_users': {str(user_id): user_data for user_id, user_data in added},
+        'removed': removed
+    })
+
+
+async def add_to_whitelist(request):
+    try:
+        data = await request.json()
+        user_id = data.get('user_id')
+
+        if not user_id:
+            return json_error('No user_id provided', 400)
+        try:
+            expires_at = parse_expires_at(data.get('expires_at'))
+        except ValueError as e:
+            return json_error(str(e), 400)
+
+        user_id = int(user_id)
+        user_data = await whitelist_service.add_async(
+            user_id,
+            username=data.get('username'),
+            discord_user=data.get('discord_user', 'API'),
+            added_by=data.get('added_by', 'API'),
+            expires_at=expires_at
+        )
+        username = user_data['username']
+
+        return web.json_response({
+            'status': 'success',
+            'message': f'User {username} ({user_id}) added to whitelist',
+            'user_id': user_id,
+            'username': username,
+            'expires_at': expires_at,
+            'whitelist': whitelist_service.ids()
+        })
+
+    except ValueError:
+        return json_error('Invalid user_id format', 400)
+    except Exception as e:
+        return json_error(str(e), 500)
+
+
+async def remove_user(user_id):
+    """Shared body of POST /whitelist/remove and DELETE /whitelist/{user_id}"""
+    removed_user = await whitelist_service.remove_async(user_id)
+    if removed_user is None:
+        return web.json_response({
+            'status': 'error',
+            'message': f'User {user_id} not found in whitelist'
+        }, status=404)
+    return web.json_response({
+        'status': 'success',
+        'message': f'User {removed_user.get("username", "Unknown")} ({user_id}) removed from whitelist',
+        'user_id': user_id,
+        'username': removed_user.get('username', 'Unknown'),
+        'whitelist': whitelist_service.ids()
+    })
+
+
+async def remove_from_whitelist(request):
+    try:
+        data = await request.json()
+        user_id = data.get('user_id')
+
+        if not user_id:
+            return json_error('No user_id provided', 400)
+        return await remove_user(int(user_id))
+
+    except ValueError:
+        return json_error('Invalid user_id format', 400)
+    except Exception as e:
+        return json_error(str(e), 500)
+
+
+async def remove_from_whitelist_direct(request):
+    try:
+        return await remove_user(int(request.match_info['user_id']))
+    except ValueError:
+        return json_error('Invalid user_id format', 400)
+    except Exception as e:
+        return json_error(str(e), 500)
+
+
+async def webhook_verify(request):
+    try:
+        data = await request.json()
+
+        user_id = data.get('user_id')
+        action = data.get('action', 'check')  # check, add, remove
+
+        if not user_id:
+            return json_error('No user_id provided', 400)
+
+        user_id = int(user_id)
+
+        if action == 'check':
+            return web.json_response(await whitelist_service.check_async(user_id))
+
+        elif action == 'add':
+            try:
+                expires_at = parse_expires_at(data.get('expires_at'))
+            except ValueError as e:
+                return json_error(str(e), 400)
+            user_data = await whitelist_service.add_async(
+                user_id,
+                username=data.get('username'),
+                discord_user=data.get('discord_user', 'API'),
+                added_by=data.get('added_by', 'API'),
+                added_at=data.get('added_at'),
+                expires_at=expires_at
+            )
+            username = user_data['username']
+            return web.json_response({
+                'success': True,
+                'message': f'User {username} ({user_id}) added to whitelist',
+                'user_id': user_id,
+                'username': username,
+                'expires_at': expires_at
+            })
+
+        elif action == 'remove':
+            removed_user = await whitelist_service.remove_async(user_id)
+            if removed_user is not None:
+                return web.json_response({
+                    'success': True,
+                    'message': f'User {removed_user.get("username", "Unknown")} removed from whitelist'
+                })
+            return json_error('User not in whitelist', 404)
+
+        else:
+            return json_error('Invalid action. Use "check", "add", or "remove"', 400)
+
+    except Exception as e:
+        return json_error(str(e), 500)
+
+
+async def add_user(request):
+    try:
+        data = await request.json()
+        user_id = data.get('user_id')
+
+        if not user_id:
+            return json_error('No user_id provided', 400)
+        try:
+            expires_at = parse_expires_at(data.get('expires_at'))
+        except ValueError as e:
+            return json_error(str(e), 400)
+
+        user_id = int(user_id)
+        user_data = await whitelist_service.add_async(
+            user_id,
+            username=data.get('username'),
+            discord_user=data.get('discord_user', 'Manual'),
+            added_by=data.get('added_by', 'Manual'),
+            expires_at=expires_at
+        )
+        username = user_data['username']
+
+        return web.json_response({
+            'success': True,
+            'message': f'User {username} added successfully',
+            'user_id': user_id,
+            'username': username,
+            'expires_at': expires_at
+        })
+
+    except Exception as e:
+        return json_error(str(e), 500)
+
+
+# === FLASK FALLBACK ===
+class _RequestBody(io.RawIOBase):
+    """wsgi.input for a worker thread, reading the aiohttp request body from the loop"""
+
+    def __init__(self, content, loop):
+        self.content = content
+        self.loop = loop
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = asyncio.run_coroutine_threadsafe(self.content.read(len(buffer)), self.loop).result()
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def wsgi_environ(request, loop, body=None):
+    """WSGI environ for request; `body` replaces the stream when it was already read"""
+    stream = io.BytesIO(body) if body is not None else io.BufferedReader(_RequestBody(request.content, loop))
+    environ = {
+        'REQUEST_METHOD': request.method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': request.path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': request.query_string,
+        'SERVER_NAME': request.url.host or 'localhost',
+        'SERVER_PORT': str(request.url.port or 80),
+        'SERVER_PROTOCOL': f'HTTP/{request.version.major}.{request.version.minor}',
+        'REMOTE_ADDR': request.remote or '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': request.scheme,
+        'wsgi.input': stream,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name in set(request.headers.keys()):
+        value = ','.join(request.headers.getall(name))
+        key = name.upper().replace('-', '_')
+        if key in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[key] = value
+        else:
+            environ['HTTP_' + key] = value
+    return environ
+
+
+async def flask_fallback(request):
+    """Serve a route only the Flask app has, on a worker thread"""
+    loop = asyncio.get_running_loop()
+    chunks = asyncio.Queue(FALLBACK_QUEUE_SIZE)
+    started = loop.create_future()
+    # A native route (e.g. webhook_verify on a replica) may have read the body
+    # already; aiohttp keeps those bytes, the stream itself is spent
+    body = await request.read() if request.content.at_eof() else None
+
+    def set_started(result):
+        if not started.done():
+            started.set_result(result)
+
+    def start_response(status, headers, exc_info=None):
+        loop.call_soon_threadsafe(set_started, (status, headers))
+
+    def run():
+        # Flask's request context must be entered and left on one thread, so
+        # the whole response is iterated here and handed over chunk by chunk
+        try:
+            result = web_server.app(wsgi_environ(request, loop, body), start_response)
+            try:
+                for chunk in result:
+                    if chunk:
+                        asyncio.run_coroutine_threadsafe(chunks.put(chunk), loop).result()
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        finally:
+            asyncio.run_coroutine_threadsafe(chunks.put(None), loop).result()
+
+    worker = asyncio.ensure_future(asyncio.to_thread(run))
+    await asyncio.wait([started, worker], return_when=asyncio.FIRST_COMPLETED)
+    if not started.done():
+        await worker  # the app raised before responding
+        return json_error('Internal server error', 500)
+    status, headers = started.result()
+    response = web.StreamResponse(status=int(status.split(' ', 1)[0]))
+    for name, value in headers:
+        response.headers.add(name, value)
+
+    chunk = b''
+    try:
+        await response.prepare(request)
+        while chunk is not None:
+            chunk = await chunks.get()
+            if chunk is not None:
+                await response.write(chunk)
+    finally:
+        # If the client went away, keep draining so the worker can finish
+        while chunk is not None:
+            chunk = await chunks.get()
+        await worker
+    await response.write_eof()
+    return response
+
+
+# === MIDDLEWARE ===
+@web.middleware
+async def api_middleware(request, handler):
+    """Per-route metrics, rate limits and replica write forwarding for the native routes"""
+    route = request.match_info.route
+    endpoint = route.name
+    if endpoint is None:
+        # Flask fallback: the Flask app's own hooks do all of this
+        return await handler(request)
+
+    if web_server.replica is not None and endpoint in WRITE_ENDPOINTS | {'webhook_verify'}:
+        if endpoint != 'webhook_verify' or ((await read_json(request)) or {}).get('action', 'check') != 'check':
+            return await flask_fallback(request)
+
+    started = time.perf_counter()
+    limiter = rate_limiters.get(endpoint)
+    in_flight = in_flight_limits.get(endpoint)
+    retry_after = limiter.acquire(client_key(request.headers, request.remote)) if limiter is not None else 0
+    if retry_after:
+        RATE_LIMITED.inc(endpoint, 'rate')
+        response = too_many_requests(retry_after, 'Rate limit exceeded')
+    elif in_flight is not None and not in_flight.try_acquire():
+        RATE_LIMITED.inc(endpoint, 'in_flight')
+        response = too_many_requests(1, 'Server busy, try again shortly')
+    else:
+        try:
+            if web_server.ROBLOX_REQUEST_BUDGET > 0:
+                with roblox_budget(web_server.ROBLOX_REQUEST_BUDGET):
+                    response = await handler(request)
+            else:
+                response = await handler(request)
+        finally:
+            if in_flight is not None:
+                in_flight.release()
+
+    response.headers['X-Whitelist-Seq'] = str(store.seq)
+    rule = route.resource.canonical
+    HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, rule, request.method)
+    HTTP_REQUESTS.inc(rule, request.method, response.status)
+    return response
+
+
+def create_app():
+    app = web.Application(middlewares=[api_middleware], client_max_size=64 * 1024 ** 2)
+    app.router.add_get('/health', health_check, name='health_check')
+    app.router.add_get('/check_whitelist', check_whitelist, name='check_whitelist')
+    app.router.add_post('/check_whitelist/batch', check_whitelist_batch, name='check_whitelist_batch')
+    app.router.add_get('/verify', verify_username, name='verify_username')
+    app.router.add_get('/whitelist/changes', get_whitelist_changes, name='get_whitelist_changes')
+    app.router.add_post('/whitelist/add', add_to_whitelist, name='add_to_whitelist')
+    app.router.add_post('/whitelist/remove', remove_from_whitelist, name='remove_from_whitelist')
+    app.router.add_delete('/whitelist/{user_id}', remove_from_whitelist_direct, name='remove_from_whitelist_direct')
+    app.router.add_post('/webhook_verify', webhook_verify, name='webhook_verify')
+    app.router.add_post('/add_user', add_user, name='add_user')
+    app.router.add_route('*', '/{path:.*}', flask_fallback)
+    return app
+
+
+# === STARTUP ===
+async def run_discord_bot():
+    try:
+        print("🤖 Starting Discord bot on the server's event loop...")
+        await bot.start(BOT_TOKEN)
+    except Exception as e:
+        print(f"❌ Discord bot failed: {e}")
+
+
+async def serve(host, port):
+    # Bodies reach the handlers (and Flask) as sent, as they do under waitress
+    runner = web.AppRunner(create_app(), access_log=None, auto_decompress=False)
+    await runner.setup()
+    await web.TCPSite(runner, host, port, backlog=1024).start()
+    print(f"⚡ Async server listening on {host}:{port}")
+
+    loop = asyncio.get_running_loop()
+    bot_tasks = []
+
+    def start_bot():
+        # May be called from the election thread once this process wins
+        if BOT_TOKEN and BOT_TOKEN != "YOUR_BOT_TOKEN_HERE":
+            loop.call_soon_threadsafe(lambda: bot_tasks.append(loop.create_task(run_discord_bot())))
+        else:
+            print("❌ No valid BOT_TOKEN configured - Discord bot disabled")
+
+    web_server.start_discord_bot_when_elected(start_bot)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await web_server.roblox_client.aclose()
+
+
+def run(host='0.0.0.0', port=8080):
+    asyncio.run(serve(host, port))
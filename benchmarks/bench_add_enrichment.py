@@ -0,0 +1,80 @@
+"""Add latency with the Roblox lookup in the request vs deferred to the username backfill.
+
+POSTs /whitelist/add without a username (so the server has to find it on
+Roblox) against the stub API with injected latency, first with the lookup
+in the request thread (the old behaviour) and then with the placeholder +
+background backfill. Then takes Roblox away for a moment to show the
+backlog retrying and draining once it is back.
+
+Usage: python benchmarks/bench_add_enrichment.py [--adds 200] [--latency 0.2]
+"""
+import argparse
+import time
+
+from harness import disable_rate_limits, free_port, report, use_temp_data_dir
+from stub_roblox import StubRoblox
+
+use_temp_data_dir()
+disable_rate_limits()
+
+import web_server
+from bulk import placeholder_username
+
+
+def add_users(client, first, count):
+    samples = []
+    for user_id in range(first, first + count):
+        started = time.perf_counter()
+        response = client.post('/whitelist/add', json={'user_id': user_id})
+        samples.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.json
+    return samples
+
+
+def wait_for_backfill(timeout=120):
+    started = time.perf_counter()
+    deadline = time.monotonic() + timeout
+    while web_server.username_backfill.pending() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--adds', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.2, help='injected Roblox API latency (s)')
+    args = parser.parse_args()
+
+    stub = StubRoblox(latency=args.latency).start()
+    roblox = web_server.roblox_client
+    roblox.base_url = roblox.users_url = stub.url
+    service = web_server.whitelist_service
+    client = web_server.app.test_client()
+
+    enrich = service.enrich
+    service.enrich = None
+    report('lookup in request', add_users(client, 1_000_000, args.adds))
+    service.enrich = enrich
+    report('deferred to backfill', add_users(client, 2_000_000, args.adds))
+    drained = wait_for_backfill()
+    patched = sum(service.store.get(user_id)['username'] == f'Player{user_id}'
+                  for user_id in range(2_000_000, 2_000_000 + args.adds))
+    print(f"backlog drained {drained:.2f}s after the last add; {patched}/{args.adds} names patched, "
+          f"{stub.requests} upstream requests in total")
+
+    # Roblox unreachable: adds still succeed, lookups queue up and retry
+    roblox.users_url = f"http://127.0.0.1:{free_port()}"
+    report('adds, Roblox down', add_users(client, 3_000_000, args.adds))
+    time.sleep(1.5)
+    print(f"while down: {web_server.username_backfill.stats()}")
+    roblox.users_url = stub.url
+    drained = wait_for_backfill()
+    patched = sum(service.store.get(user_id)['username'] != placeholder_username(user_id)
+                  for user_id in range(3_000_000, 3_000_000 + args.adds))
+    print(f"Roblox back: drained in {drained:.2f}s, {patched}/{args.adds} names patched, "
+          f"{web_server.username_backfill.stats()}")
+    stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Before/after cost of notifying admins on `!verify`.
+
+Before: scan every guild member for Administrator, then DM each admin in turn.
+After: AdminDirectory lookup plus concurrent, bounded DM fan-out.
+
+Uses an in-memory stand-in for a discord.py guild whose member.send() sleeps
+for --dm-latency, so no bot token is needed.
+
+Usage: python benchmarks/bench_admin_notify.py [--members 100000] [--admins 25]
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+import harness  # noqa: F401 (puts the repo root on sys.path)
+from admin_directory import AdminDirectory
+
+
+class FakeMember:
+    def __init__(self, guild, member_id, administrator, dm_latency):
+        self.guild = guild
+        self.id = member_id
+        self.bot = False
+        self.roles = []
+        self.guild_permissions = SimpleNamespace(administrator=administrator)
+        self.dm_latency = dm_latency
+
+    async def send(self, **message):
+        await asyncio.sleep(self.dm_latency)
+
+
+class FakeGuild:
+    def __init__(self, members, admins, dm_latency):
+        self.id = 1
+        step = max(1, members // admins)
+        self.members = [FakeMember(self, member_id, member_id % step == 0 and member_id // step < admins, dm_latency)
+                        for member_id in range(members)]
+        self._by_id = {member.id: member for member in self.members}
+
+    def get_member(self, member_id):
+        return self._by_id.get(member_id)
+
+
+async def scan_and_send_serially(guild):
+    """The old verify_command loop"""
+    admin_count = 0
+    for member in guild.members:
+        if member.guild_permissions.administrator and not member.bot:
+            await member.send(embed=None)
+            admin_count += 1
+    return admin_count
+
+
+async def timed(coroutine_factory, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await coroutine_factory()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--members', type=int, default=100000)
+    parser.add_argument('--admins', type=int, default=25)
+    parser.add_argument('--dm-latency', type=float, default=0.08, help='simulated DM round trip (s)')
+    parser.add_argument('--concurrency', type=int, default=5)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    guild = FakeGuild(args.members, args.admins, args.dm_latency)
+    directory = AdminDirectory(concurrency=args.concurrency)
+    started = time.perf_counter()
+    directory.rebuild(guild)
+    print(f"Index built once in {(time.perf_counter() - started) * 1000:.1f}ms "
+          f"({directory.count(guild)} admins of {args.members} members)")
+
+    before = asyncio.run(timed(lambda: scan_and_send_serially(guild), args.runs))
+    after = asyncio.run(timed(lambda: directory.notify(guild, embed=None), args.runs))
+    harness.report('before (scan + serial DMs)', before)
+    harness.report(f'after (index + {args.concurrency} in flight)', after)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Threaded (waitress + bot thread) vs single-event-loop (SERVER_MODE=async) serving.
+
+Starts `python main.py` in each mode against a stub Roblox API with injected
+latency and drives it with many concurrent clients sending a game-server mix:
+mostly /check_whitelist, some /verify lookups that miss the Roblox cache and
+some /webhook_verify adds (durable writes). Reports throughput and latency per
+request type.
+
+Usage: python benchmarks/bench_async_mode.py [--concurrency 200] [--seconds 10] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+import requests
+
+from harness import free_port, report
+from stub_roblox import StubRoblox
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (request type, share of requests)
+MIX = [('check', 0.8), ('verify', 0.1), ('add', 0.1)]
+
+
+def start_server(mode, roblox_url):
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), DATA_DIR=tempfile.mkdtemp(prefix=f'whitelist-{mode}-'),
+               SERVER_MODE=mode, ROBLOX_API_URL=roblox_url, RATE_LIMITS='off', VERIFY_MAX_IN_FLIGHT='0',
+               BOT_TOKEN='', STORE_BACKEND='wal')
+    process = subprocess.Popen([sys.executable, 'main.py'], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{url}/health", timeout=1).ok:
+                return process, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+async def drive(url, concurrency, seconds):
+    schedule = list(itertools.chain.from_iterable([kind] * int(share * 100) for kind, share in MIX))
+    counter = itertools.count()
+    samples = {kind: [] for kind, _share in MIX}
+    errors = 0
+    deadline = time.monotonic() + seconds
+
+    async def client(session):
+        nonlocal errors
+        while time.monotonic() < deadline:
+            n = next(counter)
+            kind = schedule[n % len(schedule)]
+            started = time.perf_counter()
+            try:
+                if kind == 'check':
+                    request = session.get(f"{url}/check_whitelist", params={'user_id': n % 1000})
+                elif kind == 'verify':
+                    # A fresh name each time, so every lookup goes to Roblox
+                    request = session.get(f"{url}/verify", params={'username': f'Player{n}'})
+                else:
+                    request = session.post(f"{url}/webhook_verify",
+                                           json={'user_id': 5_000_000 + n, 'action': 'add', 'username': f'bench{n}'})
+                async with request as response:
+                    await response.read()
+                    if response.status >= 400:
+                        errors += 1
+                        continue
+            except aiohttp.ClientError:
+                errors += 1
+                continue
+            samples[kind].append(time.perf_counter() - started)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=60)) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return samples, errors, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--latency', type=float, default=0.05, help='injected Roblox API latency (s)')
+    args = parser.parse_args()
+
+    stub = StubRoblox(latency=args.latency).start()
+    for mode in ('threaded', 'async'):
+        process, url = start_server(mode, stub.url)
+        try:
+            asyncio.run(drive(url, 20, 1))  # warm up
+            samples, errors, elapsed = asyncio.run(drive(url, args.concurrency, args.seconds))
+        finally:
+            process.terminate()
+            process.wait()
+        total = sum(len(kind_samples) for kind_samples in samples.values())
+        print(f"\n{mode}: {total / elapsed:.0f} req/s with {args.concurrency} clients, {errors} errors")
+        for kind, kind_samples in samples.items():
+            if kind_samples:
+                report(f"  {kind}", kind_samples)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Per-ID /check_whitelist calls vs one POST /check_whitelist/batch.
+
+Usage: python benchmarks/bench_batch_check.py [--sizes 100 10000] [--users 100000]
+"""
+import argparse
+import random
+import time
+
+from harness import disable_rate_limits, serve_app, use_temp_data_dir
+
+use_temp_data_dir()
+disable_rate_limits()
+
+import requests
+
+import web_server
+
+
+def per_id(session, base_url, user_ids):
+    started = time.perf_counter()
+    whitelisted = [uid for uid in user_ids
+                   if session.get(f"{base_url}/check_whitelist", params={'user_id': uid}).json()['whitelisted']]
+    return time.perf_counter() - started, len(whitelisted)
+
+
+def batch(session, base_url, user_ids, fmt):
+    started = time.perf_counter()
+    result = session.post(f"{base_url}/check_whitelist/batch", json={'user_ids': user_ids, 'format': fmt}).json()
+    return time.perf_counter() - started, result['whitelisted_count']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 10000])
+    parser.add_argument('--users', type=int, default=100000, help='whitelist size')
+    args = parser.parse_args()
+
+    store = web_server.store
+    store.apply([('put', uid, {'username': f'Player{uid}', 'added_by': 'Benchmark'})
+                 for uid in range(1, args.users + 1)])
+    server, base_url = serve_app(web_server.app)
+    session = requests.Session()
+    rng = random.Random(7)
+
+    for size in args.sizes:
+        # Roughly half of the requested players are whitelisted
+        user_ids = [rng.randint(1, args.users * 2) for _ in range(size)]
+        single_time, single_hits = per_id(session, base_url, user_ids)
+        list_time, list_hits = batch(session, base_url, user_ids, 'list')
+        bitmap_time, bitmap_hits = batch(session, base_url, user_ids, 'bitmap')
+        assert single_hits == list_hits == bitmap_hits
+        print(f"{size:>6} IDs: per-ID {single_time * 1000:9.1f}ms | batch list {list_time * 1000:7.1f}ms"
+              f" | batch bitmap {bitmap_time * 1000:7.1f}ms | speedup x{single_time / list_time:.0f}")
+    server.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Before/after latency of the `!whitelist check` lookup.
+
+Before: the bot called its own web server over HTTP (requests -> waitress).
+After: the bot awaits WhitelistService.check_async() in-process.
+
+Usage: python benchmarks/bench_bot_check.py [--calls 2000]
+"""
+import argparse
+import asyncio
+import time
+
+from harness import disable_rate_limits, report, serve_app, use_temp_data_dir
+
+use_temp_data_dir()
+disable_rate_limits()
+
+import requests
+
+import web_server
+
+
+async def http_loopback(base_url, calls, user_id):
+    """The old api_check_whitelist(): a blocking HTTP call inside the command handler"""
+    samples = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        response = requests.get(f"{base_url}/check_whitelist?user_id={user_id}", timeout=5)
+        response.json()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def in_process(calls, user_id):
+    samples = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        await web_server.whitelist_service.check_async(user_id)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=2000)
+    args = parser.parse_args()
+
+    server, base_url = serve_app(web_server.app)
+    user_id = 123456789
+    web_server.whitelist_service.add(user_id, username='BenchUser')
+
+    report('before (HTTP loopback)', asyncio.run(http_loopback(base_url, args.calls, user_id)))
+    report('after (in-process)', asyncio.run(in_process(args.calls, user_id)))
+    server.close()
+
+
+if __name__ == '__main__':
+    main()
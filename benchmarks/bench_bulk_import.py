@@ -0,0 +1,109 @@
+"""Bulk import throughput and memory for a large CSV/NDJSON file.
+
+Generates a file of --rows users, uploads it to /whitelist/import on a local
+waitress server (as main.py serves the app) and reports rows/s and peak RSS.
+A second pass feeds the same file through the parse/validate/batch pipeline
+into a sink that discards batches, under tracemalloc, to show the import
+itself holds only about one batch in memory however large the file is.
+
+    python benchmarks/bench_bulk_import.py --rows 1000000 --format csv
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from harness import serve_app, use_temp_data_dir
+from stub_roblox import StubRoblox
+
+
+def write_file(path, fmt, rows, missing_every):
+    with open(path, 'w', newline='') as f:
+        if fmt == 'csv':
+            f.write('user_id,username,discord_user,added_by\n')
+        for user_id in range(1, rows + 1):
+            username = '' if missing_every and user_id % missing_every == 0 else f'Player{user_id}'
+            if fmt == 'csv':
+                f.write(f'{user_id},{username},Discord#{user_id % 10000},Bench\n')
+            elif username:
+                f.write(f'{{"user_id":{user_id},"username":"{username}","discord_user":"Discord#{user_id % 10000}","added_by":"Bench"}}\n')
+            else:
+                f.write(f'{{"user_id":{user_id},"discord_user":"Discord#{user_id % 10000}","added_by":"Bench"}}\n')
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class DiscardingStore:
+    """Accepts batches like WhitelistStore.apply() and drops them"""
+
+    def __init__(self):
+        self.batches = 0
+
+    def apply(self, ops):
+        self.batches += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--format', choices=('csv', 'ndjson'), default='csv')
+    parser.add_argument('--missing-every', type=int, default=100,
+                        help='leave every Nth username blank for background resolution (0 = none)')
+    parser.add_argument('--roblox-latency', type=float, default=0.02)
+    args = parser.parse_args()
+
+    stub = StubRoblox(latency=args.roblox_latency).start()
+    os.environ['ROBLOX_API_URL'] = stub.url
+    use_temp_data_dir()
+    import requests
+    import bulk
+    import web_server
+
+    path = os.path.join(tempfile.mkdtemp(prefix='whitelist-import-'), f'users.{args.format}')
+    started = time.perf_counter()
+    write_file(path, args.format, args.rows, args.missing_every)
+    size_mb = os.path.getsize(path) / 1e6
+    print(f"📝 Wrote {args.rows} rows ({size_mb:.1f} MB) in {time.perf_counter() - started:.1f}s")
+
+    # Pipeline memory, independent of what the store keeps
+    with open(path, newline='') as f:
+        sink = DiscardingStore()
+        tracemalloc.start()
+        bulk.import_rows(sink, bulk.parse_rows(f, args.format))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(f"🧮 Pipeline peak allocation: {peak / 1e6:.1f} MB for {sink.batches} batches "
+          f"of {bulk.IMPORT_BATCH_SIZE} rows")
+
+    server, base_url = serve_app(web_server.app)
+    rss_before = max_rss_mb()
+    with open(path, 'rb') as f:
+        response = requests.post(f"{base_url}/whitelist/import", params={'format': args.format}, data=f,
+                                 headers={'Content-Type': 'text/csv' if args.format == 'csv' else 'application/x-ndjson'})
+    report = response.json()
+    print(f"📥 Imported {report['imported']}/{report['rows']} rows in {report['seconds']:.1f}s "
+          f"= {report['rows_per_second']} rows/s ({size_mb / report['seconds']:.1f} MB/s)")
+    print(f"   store size {len(web_server.store)}, peak RSS {rss_before:.0f} MB -> {max_rss_mb():.0f} MB "
+          f"(includes the {len(web_server.store)} stored users)")
+
+    if report['queued_for_username']:
+        started = time.perf_counter()
+        while web_server.username_backfill.pending():
+            time.sleep(0.1)
+        elapsed = time.perf_counter() - started
+        print(f"🔎 Backfilled {web_server.username_backfill.resolved} usernames in {elapsed:.1f}s after the import "
+              f"returned ({args.roblox_latency * 1000:.0f}ms stub latency)")
+
+    server.close()
+    stub.stop()
+    os.remove(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
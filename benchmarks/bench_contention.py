@@ -0,0 +1,84 @@
+"""Read latency under mixed read/write load, with and without the writer lock.
+
+"before" makes every read take the store's writer lock, the way every read
+route used to take data_lock; "after" reads the published snapshot with no
+lock, as the store does now.
+
+Usage: python benchmarks/bench_contention.py [--users 200000] [--readers 8] [--writers 2]
+"""
+import argparse
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from harness import report
+
+from store import WhitelistStore
+
+
+def run(store, locked_reads, readers, writers, duration, users):
+    stop = threading.Event()
+    samples = [[] for _ in range(readers)]
+    writes = [0]
+
+    def reader(bucket, seed):
+        rng = random.Random(seed)
+        while not stop.is_set():
+            user_id = rng.randint(0, users * 2)
+            started = time.perf_counter()
+            if locked_reads:
+                with store.lock:
+                    store.get(user_id)
+            else:
+                store.get(user_id)
+            bucket.append(time.perf_counter() - started)
+
+    def writer(seed):
+        rng = random.Random(seed)
+        while not stop.is_set():
+            user_id = rng.randint(0, users * 2)
+            if rng.random() < 0.7:
+                store.put(user_id, {'username': f'Player{user_id}', 'added_by': 'Benchmark'})
+            else:
+                store.delete(user_id)
+            writes[0] += 1
+
+    threads = [threading.Thread(target=reader, args=(samples[i], i)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(100 + i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    reads = [sample for bucket in samples for sample in bucket]
+    report(f"{'before (locked reads)' if locked_reads else 'after (snapshot reads)'}", reads)
+    print(f"{'':<28} {len(reads) / duration:,.0f} reads/s, {writes[0] / duration:,.0f} writes/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200000)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=5.0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='whitelist-bench-')
+    try:
+        # No fsync: keep write pressure (and so lock hold time) high, as with
+        # the old in-memory dict
+        store = WhitelistStore(directory, fsync=False)
+        store.apply([('put', user_id, {'username': f'Player{user_id}', 'added_by': 'Benchmark'})
+                     for user_id in range(0, args.users * 2, 2)])
+        for locked_reads in (True, False):
+            run(store, locked_reads, args.readers, args.writers, args.duration, args.users)
+        store.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
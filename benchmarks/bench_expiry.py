@@ -0,0 +1,73 @@
+"""How promptly time-limited entries disappear, and what the scheduler costs.
+
+Loads a whitelist of permanent users plus time-limited ones due over the
+next few seconds, starts an ExpiryScheduler and records, for every entry,
+how late its removal was committed after its expires_at. For comparison it
+times one full scan of the snapshot for due entries, which is what a
+periodic sweeper would pay on every pass regardless of how few are due.
+
+Usage: python benchmarks/bench_expiry.py [--users 500000] [--expiring 50000] [--spread 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import report
+from expiry import ExpiryScheduler
+from store import WhitelistStore, is_live
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=500000, help='permanent users')
+    parser.add_argument('--expiring', type=int, default=50000, help='time-limited users')
+    parser.add_argument('--spread', type=float, default=5, help='seconds over which they expire')
+    parser.add_argument('--lead', type=float, default=15, help='seconds from the first add to the first expiry')
+    args = parser.parse_args()
+
+    store = WhitelistStore(tempfile.mkdtemp(prefix='whitelist-bench-'), fsync=False)
+    for i in range(0, args.users, 50000):
+        store.apply([('put', 1_000_000 + j, {'username': f'user{j}'}) for j in range(i, min(i + 50000, args.users))])
+
+    scheduler = ExpiryScheduler(store).start()
+    removed_at = {}
+    store.add_listener(lambda changes: removed_at.update(
+        (user_id, time.time()) for _seq, op, user_id, _record in changes if op == 'del'))
+
+    # Time-limited adds arrive in small batches, as they would from the API
+    started = time.time() + args.lead
+    due = {}
+    add_samples = []
+    for i in range(0, args.expiring, 100):
+        ops = []
+        for j in range(i, min(i + 100, args.expiring)):
+            user_id = 50_000_000 + j
+            due[user_id] = started + args.spread * (j * 7919 % args.expiring) / args.expiring
+            ops.append(('put', user_id, {'username': f'trial{j}', 'expires_at': due[user_id]}))
+        t = time.perf_counter()
+        store.apply(ops)
+        add_samples.append((time.perf_counter() - t) / len(ops))
+    report('add with expires_at (per user)', add_samples)
+    if time.time() > started:
+        print("warning: adds were still running when entries started expiring, raise --lead")
+
+    deadline = time.time() + args.spread + 30
+    while len(removed_at) < args.expiring and time.time() < deadline:
+        time.sleep(0.05)
+    lateness = [removed_at[user_id] - expires_at for user_id, expires_at in due.items() if user_id in removed_at]
+    report('removal after expires_at', lateness)
+    print(f"{len(lateness)}/{args.expiring} removed, {len(store)} users left, scheduler {scheduler.stats()}")
+
+    t = time.perf_counter()
+    now = time.time()
+    overdue = [user_id for user_id, record in store.snapshot().records() if not is_live(record, now)]
+    print(f"one full scan of {len(store)} users for due entries: {(time.perf_counter() - t) * 1000:.1f}ms "
+          f"({len(overdue)} found)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Time-to-first-byte, total time and peak memory of /whitelist exports.
+
+Compares the legacy single JSON document with the NDJSON stream (plain and
+gzip) as the whitelist grows.
+
+Usage: python benchmarks/bench_export.py [--sizes 10000 100000 500000]
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from harness import serve_app, use_temp_data_dir
+
+use_temp_data_dir()
+
+import requests
+
+import web_server
+
+
+def fetch(url, headers):
+    # Let the previous response finish being torn down before measuring
+    time.sleep(0.2)
+    gc.collect()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    with requests.get(url, headers=headers, stream=True) as response:
+        chunks = response.raw.stream(64 * 1024, decode_content=False)
+        first = next(chunks)
+        ttfb = time.perf_counter() - started
+        size = len(first) + sum(len(chunk) for chunk in chunks)
+    total = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    return ttfb, total, size, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 500000])
+    args = parser.parse_args()
+
+    server, base_url = serve_app(web_server.app)
+    store = web_server.store
+    tracemalloc.start()
+    loaded = 0
+    variants = [
+        ('full JSON', '/whitelist', {'Accept-Encoding': 'identity'}),
+        ('ndjson', '/whitelist?format=ndjson', {'Accept-Encoding': 'identity'}),
+        ('ndjson+gzip', '/whitelist?format=ndjson', {'Accept-Encoding': 'gzip'}),
+    ]
+    for size in args.sizes:
+        store.apply([('put', uid, {'username': f'Player{uid}', 'discord_user': 'Bench',
+                                   'added_at': '2024-01-01T00:00:00', 'added_by': 'Benchmark'})
+                     for uid in range(loaded, size)])
+        loaded = size
+        for label, path, headers in variants:
+            ttfb, total, nbytes, peak = fetch(base_url + path, headers)
+            print(f"{size:>8} users  {label:<12} ttfb {ttfb * 1000:8.1f}ms  total {total * 1000:8.0f}ms  "
+                  f"{nbytes / 2**20:6.1f} MiB on the wire  peak +{peak / 2**20:6.1f} MiB")
+    server.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Memory and check throughput of the membership index at scale.
+
+Reports bytes per entry for the old dict-of-dicts layout, the store's tuple
+records and the MembershipIndex, then positive and negative checks/second.
+
+The index does not replace the record map, so the store pays for both: its
+cost per user is the tuple map plus the index. The last section times point
+lookups against the map alone and through the index first, which is why the
+store's lookups skip the index.
+
+Usage: python benchmarks/bench_membership.py [--ids 10000000] [--lookup-ids 1000000]
+"""
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from array import array
+
+from harness import use_temp_data_dir  # noqa: F401  (adds the repo to sys.path)
+
+from membership import MembershipIndex
+
+
+def bytes_per_entry(build, n=100000):
+    tracemalloc.start()
+    obj = build(n)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del obj
+    return size / n
+
+
+def dict_of_dicts(n):
+    return {10**9 + i: {'username': f'Player{i}', 'discord_user': 'Admin',
+                        'added_at': '2024-01-01T00:00:00', 'added_by': 'System'} for i in range(n)}
+
+
+def dict_of_tuples(n):
+    return {10**9 + i: (f'Player{i}', 'Admin', '2024-01-01T00:00:00', 'System') for i in range(n)}
+
+
+def sorted_ids(n, seed=3):
+    """n distinct, sorted IDs with random gaps (roughly one in three taken)"""
+    rng = random.Random(seed)
+    ids = array('q')
+    current = 10**6
+    for _ in range(n):
+        current += rng.randint(1, 5)
+        ids.append(current)
+    return ids
+
+
+def checks_per_second(index, keys):
+    started = time.perf_counter()
+    hits = sum(1 for key in keys if key in index)
+    return len(keys) / (time.perf_counter() - started), hits
+
+
+def ns_per_lookup(check, keys):
+    started = time.perf_counter()
+    for key in keys:
+        check(key)
+    return (time.perf_counter() - started) / len(keys) * 1e9
+
+
+def compare_lookups(n, checks):
+    """Point lookups in a tuple map of n users, alone and behind the index"""
+    ids = sorted_ids(n, seed=5)
+    records = {user_id: (f'Player{user_id}', 'Admin', '2024-01-01T00:00:00', 'System') for user_id in ids}
+    index = MembershipIndex.from_sorted(ids)
+    rng = random.Random(13)
+    present = [ids[rng.randrange(len(ids))] for _ in range(checks)]
+    absent = [rng.randint(ids[-1] + 1, ids[-1] * 10) for _ in range(checks)]
+
+    def map_only(user_id):
+        return records.get(user_id)
+
+    def index_then_map(user_id):
+        return records.get(user_id) if user_id in index else None
+
+    print(f"point lookups, {n:,} users:")
+    for label, keys in (('present', present), ('absent', absent)):
+        print(f"  {label:<8} map only {ns_per_lookup(map_only, keys):6.0f} ns   "
+              f"index then map {ns_per_lookup(index_then_map, keys):6.0f} ns")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ids', type=int, default=10000000)
+    parser.add_argument('--checks', type=int, default=500000)
+    parser.add_argument('--lookup-ids', type=int, default=1000000, help='users in the lookup comparison')
+    args = parser.parse_args()
+
+    print(f"dict of dicts (old whitelist_data): {bytes_per_entry(dict_of_dicts):6.1f} bytes/entry")
+    tuples = bytes_per_entry(dict_of_tuples)
+    print(f"dict of tuples (store records):     {tuples:6.1f} bytes/entry")
+
+    started = time.perf_counter()
+    ids = sorted_ids(args.ids)
+    index = MembershipIndex.from_sorted(ids)
+    print(f"Built index over {len(index):,} IDs in {time.perf_counter() - started:.1f}s: "
+          f"{index.nbytes() / len(index):.1f} bytes/entry ({index.nbytes() / 2**20:.0f} MiB)")
+    print(f"store total (records + index):      {tuples + index.nbytes() / len(index):6.1f} bytes/entry")
+    sys.stdout.flush()
+
+    rng = random.Random(11)
+    present = [ids[rng.randrange(len(ids))] for _ in range(args.checks)]
+    absent = [rng.randint(ids[-1] + 1, ids[-1] * 10) for _ in range(args.checks)]
+    rate, hits = checks_per_second(index, present)
+    print(f"positive checks: {rate:12,.0f}/s ({hits} hits)")
+    rate, hits = checks_per_second(index, absent)
+    false_positives = sum(1 for key in absent if key in index._bloom)
+    print(f"negative checks: {rate:12,.0f}/s ({hits} hits, "
+          f"{false_positives / len(absent):.2%} fell through the Bloom filter)")
+    del index, ids, present, absent
+
+    compare_lookups(args.lookup_ids, args.checks)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Read throughput of the shared SQLite store as gunicorn workers are added.
+
+For each worker count, seeds a fresh SQLite store, starts
+`gunicorn -c gunicorn.conf.py main:app` with that many workers, and drives
+GET /check_whitelist from several client processes (so the load generator
+isn't limited by one GIL either). Also checks that a write made through one
+worker becomes visible through all of them.
+
+Throughput can only scale with cores the machine actually has; the script
+prints os.cpu_count() next to the results.
+
+Usage: python benchmarks/bench_multiprocess.py [--workers 1 2 4] [--duration 10]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from harness import free_port
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def client(base_url, duration, users, seed):
+    import requests
+    rng = random.Random(seed)
+    session = requests.Session()
+    deadline = time.perf_counter() + duration
+    count = errors = 0
+    while time.perf_counter() < deadline:
+        response = session.get(f"{base_url}/check_whitelist", params={'user_id': rng.randint(1, users * 2)})
+        if response.status_code == 200:
+            count += 1
+        else:
+            errors += 1
+    return count, errors
+
+
+def seed_store(data_dir, users):
+    from shared_store import SharedWhitelistStore
+    store = SharedWhitelistStore(os.path.join(data_dir, 'whitelist.db'), synchronous='NORMAL')
+    store.apply([('put', user_id, {'username': f'Player{user_id}', 'added_by': 'Bench'})
+                 for user_id in range(1, users * 2, 2)])
+    store.close()
+
+
+def start_server(workers, data_dir, port):
+    env = dict(os.environ, DATA_DIR=data_dir, PORT=str(port), WEB_WORKERS=str(workers),
+               STORE_BACKEND='sqlite', RATE_LIMITS='off', BOT_TOKEN='')
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'main:app'],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    import requests
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 120
+    pids = set()
+    while time.time() < deadline:
+        try:
+            pids.add(requests.get(f"{base_url}/status", timeout=1).json()['worker_pid'])
+            if len(pids) >= workers:
+                return process, base_url
+        except Exception:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("gunicorn did not start")
+
+
+def check_visibility(base_url, workers):
+    """Seconds until a write via one worker is seen by every worker"""
+    import requests
+    user_id = 999999999
+    started = time.perf_counter()
+    requests.post(f"{base_url}/whitelist/add", json={'user_id': user_id, 'username': 'Visible'})
+    seen = set()
+    while len(seen) < workers and time.perf_counter() - started < 10:
+        # Fresh connections land on whichever worker accepts them
+        status = requests.get(f"{base_url}/status").json()
+        if requests.get(f"{base_url}/check_whitelist", params={'user_id': user_id}).json()['whitelisted']:
+            seen.add(status['worker_pid'])
+    return time.perf_counter() - started, len(seen)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=8, help='load generator processes')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--users', type=int, default=100000)
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    print(f"CPU cores: {os.cpu_count()}")
+    baseline = None
+    for workers in args.workers:
+        data_dir = tempfile.mkdtemp(prefix='whitelist-mp-')
+        seed_store(data_dir, args.users)
+        process, base_url = start_server(workers, data_dir, free_port())
+        try:
+            with multiprocessing.Pool(args.clients) as pool:
+                results = pool.starmap(client, [(base_url, args.duration, args.users, seed)
+                                                for seed in range(args.clients)])
+            visible_after, seen_by = check_visibility(base_url, workers)
+        finally:
+            process.terminate()
+            process.wait()
+        rps = sum(count for count, _ in results) / args.duration
+        errors = sum(errors for _, errors in results)
+        baseline = baseline or rps
+        print(f"{workers} worker(s): {rps:9.0f} req/s  ({rps / baseline:.2f}x)  errors {errors}  "
+              f"write visible in {seen_by} worker(s) after {visible_after * 1000:.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Cost of the per-client rate limiter on the /check_whitelist path.
+
+Times TokenBucketLimiter.acquire() on its own across many distinct clients,
+then GET /check_whitelist through the Flask test client with the route's
+limiter in place and removed.
+
+Usage: python benchmarks/bench_rate_limit.py [--clients 10000] [--calls 20000]
+"""
+import argparse
+import random
+import time
+
+from harness import report, use_temp_data_dir
+
+use_temp_data_dir()
+
+import web_server
+from rate_limit import TokenBucketLimiter
+
+
+def time_acquire(clients, calls):
+    limiter = TokenBucketLimiter(rate=1e9, burst=1e9)
+    keys = [f'10.0.{i // 256}.{i % 256}' for i in range(clients)]
+    rng = random.Random(1)
+    order = [rng.choice(keys) for _ in range(calls)]
+    started = time.perf_counter()
+    for key in order:
+        limiter.acquire(key)
+    elapsed = time.perf_counter() - started
+    print(f"acquire(): {elapsed / calls * 1e6:.2f}us per call over {clients} clients")
+
+
+def time_check(client, calls):
+    samples = []
+    for i in range(calls):
+        started = time.perf_counter()
+        client.get('/check_whitelist', query_string={'user_id': i % 1000},
+                   environ_base={'REMOTE_ADDR': f'10.1.{i % 200}.1'})
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=10000)
+    parser.add_argument('--calls', type=int, default=20000)
+    args = parser.parse_args()
+
+    time_acquire(args.clients, args.calls * 10)
+
+    client = web_server.app.test_client()
+    limiter = web_server.rate_limiters['check_whitelist'] = TokenBucketLimiter(rate=1e9, burst=1e9)
+    time_check(client, 1000)  # warm up
+    with_limiter = time_check(client, args.calls)
+    del web_server.rate_limiters['check_whitelist']
+    without_limiter = time_check(client, args.calls)
+    report('check without limiter', without_limiter)
+    report('check with limiter', with_limiter)
+    print(f"({len(limiter)} client buckets)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Leader/follower replication between local server processes.
+
+Starts a leader and two replicas (`python main.py` with REPLICATION_LEADER_URL
+set on the replicas) and measures:
+
+- how long a write on the leader takes to be readable on a replica;
+- a write sent to a replica (forwarded to the leader, then read back from the
+  same replica);
+- catch-up after a replica is stopped while the leader writes more changes
+  than its change ring holds (the replica reloads from a snapshot).
+
+Usage: python benchmarks/bench_replication.py [--writes 300] [--ring 1000]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from harness import free_port, report
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(data_dir, port, ring, leader_url=None):
+    env = dict(os.environ, PORT=str(port), DATA_DIR=data_dir, CHANGE_FEED_SIZE=str(ring),
+               RATE_LIMITS='off', VERIFY_MAX_IN_FLIGHT='0', BOT_TOKEN='', STORE_BACKEND='wal')
+    env.pop('REPLICATION_LEADER_URL', None)
+    if leader_url:
+        env['REPLICATION_LEADER_URL'] = leader_url
+    process = subprocess.Popen([sys.executable, 'main.py'], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    wait_until(lambda: requests.get(f"{url}/replication/status", timeout=1).ok, 30)
+    return process, url
+
+
+def wait_until(condition, timeout, interval=0.002):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if condition():
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(interval)
+    raise TimeoutError("condition not met")
+
+
+def is_whitelisted(url, user_id):
+    return requests.get(f"{url}/check_whitelist", params={'user_id': user_id}, timeout=5).json()['whitelisted']
+
+
+def add(url, user_id):
+    response = requests.post(f"{url}/whitelist/add", json={'user_id': user_id, 'username': f'user{user_id}'},
+                             timeout=10)
+    response.raise_for_status()
+
+
+def status(url):
+    return requests.get(f"{url}/replication/status", timeout=5).json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writes', type=int, default=300)
+    parser.add_argument('--ring', type=int, default=1000)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='whitelist-replication-')
+    leader, leader_url = start_server(os.path.join(root, 'leader'), free_port(), args.ring)
+    replica_ports = [free_port(), free_port()]
+    replicas = [start_server(os.path.join(root, f'replica{i}'), port, args.ring, leader_url)
+                for i, port in enumerate(replica_ports)]
+    try:
+        replica_urls = [url for _process, url in replicas]
+        for url in replica_urls:
+            wait_until(lambda: status(url)['state'] == 'streaming', 30)
+
+        # Leader write -> visible on a replica
+        samples = []
+        for i in range(args.writes):
+            user_id = 10_000_000 + i
+            url = replica_urls[i % len(replica_urls)]
+            started = time.perf_counter()
+            add(leader_url, user_id)
+            wait_until(lambda: is_whitelisted(url, user_id), 5, interval=0)
+            samples.append(time.perf_counter() - started)
+        report('leader write -> replica read', samples)
+
+        # Write through a replica; it must be readable there immediately after
+        samples = []
+        stale = 0
+        for i in range(args.writes):
+            user_id = 20_000_000 + i
+            url = replica_urls[i % len(replica_urls)]
+            started = time.perf_counter()
+            add(url, user_id)
+            samples.append(time.perf_counter() - started)
+            stale += not is_whitelisted(url, user_id)
+        report('write via replica', samples)
+        print(f"read-your-writes misses on the replica: {stale}/{args.writes}")
+
+        # Stop one replica, write past the leader's ring, then restart it
+        process, url = replicas[1]
+        process.terminate()
+        process.wait()
+        missed = args.ring * 2
+        for i in range(0, missed, 500):
+            requests.post(f"{leader_url}/whitelist/import", params={'format': 'ndjson'}, timeout=60,
+                          data=''.join(f'{{"user_id":{30_000_000 + j},"username":"bulk{j}"}}\n'
+                                       for j in range(i, min(i + 500, missed)))).raise_for_status()
+        leader_seq = status(leader_url)['seq']
+        started = time.perf_counter()
+        replicas[1] = start_server(os.path.join(root, 'replica1'), replica_ports[1], args.ring, leader_url)
+        wait_until(lambda: status(url)['seq'] >= leader_seq, 60)
+        caught_up = time.perf_counter() - started
+        final = status(url)
+        print(f"replica restart after {missed} missed changes: caught up in {caught_up:.2f}s "
+              f"(snapshots loaded: {final['snapshots_loaded']}, lag {final['lag_entries']} entries)")
+        assert is_whitelisted(url, 30_000_000 + missed - 1)
+    finally:
+        for process in [leader] + [process for process, _url in replicas]:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Cost of GET /whitelist, / and /status with and without the response cache.
+
+Loads N users, then times each route through the Flask test client:
+rebuilt on every request (cache disabled), served from the cache, and
+revalidated with If-None-Match (304).
+
+Usage: python benchmarks/bench_response_cache.py [--users 100000] [--calls 200]
+"""
+import argparse
+import time
+
+from harness import disable_rate_limits, report, use_temp_data_dir
+
+use_temp_data_dir()
+disable_rate_limits()
+
+import web_server
+
+
+def timed(client, path, calls, headers=None):
+    samples = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        response = client.get(path, headers=headers or {})
+        response.get_data()
+        samples.append(time.perf_counter() - started)
+    return samples, response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--calls', type=int, default=200)
+    args = parser.parse_args()
+
+    web_server.whitelist_service.add_many(
+        [{'user_id': 1_000_000 + i, 'username': f'user{i}', 'discord_user': 'bench'} for i in range(args.users)])
+    client = web_server.app.test_client()
+    cache = web_server.response_cache
+    max_bytes = cache.max_bytes
+
+    for path, calls in (('/whitelist', args.calls), ('/whitelist?limit=1000', args.calls * 10),
+                        ('/', args.calls * 10), ('/status', args.calls * 10)):
+        for accept in ('identity', 'gzip'):
+            headers = {'Accept-Encoding': accept}
+            cache.max_bytes = 0
+            rebuilt, _ = timed(client, path, calls, headers)
+            cache.max_bytes = max_bytes
+            cached, response = timed(client, path, calls, headers)
+            revalidated, not_modified = timed(client, path, calls,
+                                              dict(headers, **{'If-None-Match': response.headers['ETag']}))
+            assert not_modified.status_code == 304 or path == '/status'
+            print(f"\n{path} ({accept}, {len(response.get_data()) // 1024} KB)")
+            report('  rebuilt', rebuilt)
+            report('  cached', cached)
+            report('  If-None-Match', revalidated)
+    print(f"\n{cache.stats()}")
+
+
+if __name__ == '__main__':
+    main()
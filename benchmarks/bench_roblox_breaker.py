@@ -0,0 +1,104 @@
+"""Roblox lookups through an outage: plain timeouts vs request budget + circuit breaker.
+
+Callers resolve user IDs the client has seen before (cache entries already
+expired) and some it hasn't, each lookup as one "request", while the stub
+API hangs every call; then the stub recovers. Compared per setup:
+lookup latency during the outage, how many lookups still got an answer
+(stale cache fallback), upstream calls made while Roblox was down, and how
+long after recovery lookups are fresh again (half-open probing).
+
+Usage: python benchmarks/bench_roblox_breaker.py [--callers 16] [--outage 10] [--budget 1.0]
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import report
+from roblox_client import RobloxClient, budget
+from stub_roblox import StubRoblox
+
+KNOWN_USERS = 200
+
+
+def run_callers(client, callers, duration, request_budget, seed):
+    """Lookups from `callers` threads for `duration` seconds: (latencies, answered, total)"""
+    samples, answered = [], []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def caller(rng):
+        while time.monotonic() < stop_at:
+            user_id = 1_000_000 + (rng.randrange(KNOWN_USERS) if rng.random() < 0.8 else rng.randrange(10 ** 6))
+            started = time.perf_counter()
+            if request_budget:
+                with budget(request_budget):
+                    username = client.get_username(user_id)
+            else:
+                username = client.get_username(user_id)
+            with lock:
+                samples.append(time.perf_counter() - started)
+                answered.append(username is not None)
+
+    threads = [threading.Thread(target=caller, args=(random.Random(seed + i),)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, sum(answered), len(answered)
+
+
+def time_to_recover(client, timeout=60):
+    """Seconds until a lookup of a never-seen user succeeds again"""
+    started = time.perf_counter()
+    user_id = 5_000_000
+    while time.perf_counter() - started < timeout:
+        user_id += 1
+        with budget(1.0):
+            if client.get_username(user_id) is not None:
+                return time.perf_counter() - started
+        time.sleep(0.05)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--callers', type=int, default=16)
+    parser.add_argument('--outage', type=float, default=10, help='seconds of lookups while Roblox hangs')
+    parser.add_argument('--budget', type=float, default=1.0, help='per-request Roblox budget (s)')
+    parser.add_argument('--reset-timeout', type=float, default=2)
+    args = parser.parse_args()
+
+    setups = (
+        ('timeouts only', 0, 0),
+        ('budget', args.budget, 0),
+        ('budget + breaker', args.budget, 5),
+    )
+    for label, request_budget, threshold in setups:
+        stub = StubRoblox(latency=0.02).start()
+        client = RobloxClient(stub.url, ttl=1, batch_window=0.005, pool_size=args.callers,
+                              failure_threshold=threshold, reset_timeout=args.reset_timeout)
+        client.get_usernames([1_000_000 + i for i in range(KNOWN_USERS)])
+        time.sleep(1.1)  # cached names are now stale
+
+        stub.fault = 'hang'
+        before = stub.requests
+        samples, answered, total = run_callers(client, args.callers, args.outage, request_budget, seed=1)
+        upstream = stub.requests - before
+        stub.fault = None
+        recovered = time_to_recover(client)
+
+        print(f"\n{label}")
+        report('  lookup during outage', samples)
+        print(f"  {total} lookups ({total / args.outage:.0f}/s), {answered} answered from stale cache, "
+              f"{upstream} upstream calls while down, fresh again {recovered:.2f}s after recovery")
+        print(f"  circuit: {client.stats()['circuit']}")
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
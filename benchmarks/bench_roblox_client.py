@@ -0,0 +1,62 @@
+"""Exercise the cached Roblox client against the local stub API.
+
+Replays a skewed lookup mix (popular usernames repeat, some names are
+unknown) and reports latency, cache counters and upstream request count.
+
+Usage: python benchmarks/bench_roblox_client.py [--lookups 5000] [--latency 0.02]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from roblox_client import RobloxClient
+from stub_roblox import StubRoblox
+
+
+def workload(lookups, seed=1):
+    rng = random.Random(seed)
+    names = []
+    for _ in range(lookups):
+        if rng.random() < 0.1:
+            names.append(f"typo_{rng.randint(0, 50)}")
+        else:
+            names.append(f"Player{int(rng.paretovariate(1.2)) % 500}")
+    return names
+
+
+def run(client, names):
+    started = time.perf_counter()
+    for name in names:
+        user_id, _ = client.get_user_id(name)
+        if user_id:
+            client.get_username(user_id)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lookups', type=int, default=5000)
+    parser.add_argument('--latency', type=float, default=0.0, help='injected upstream latency (s)')
+    args = parser.parse_args()
+
+    stub = StubRoblox(latency=args.latency).start()
+    names = workload(args.lookups)
+    try:
+        uncached = RobloxClient(stub.url, ttl=0, negative_ttl=0)
+        elapsed = run(uncached, names)
+        print(f"🐢 uncached: {elapsed:.2f}s, {stub.requests} upstream requests")
+
+        stub.requests = 0
+        cached = RobloxClient(stub.url)
+        elapsed = run(cached, names)
+        print(f"⚡ cached:   {elapsed:.2f}s, {stub.requests} upstream requests, counters {cached.stats()}")
+    finally:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
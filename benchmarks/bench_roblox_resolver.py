@@ -0,0 +1,110 @@
+"""Throughput of concurrent Roblox lookups: one request each vs coalesced bulk batches.
+
+Many threads (like waitress threads serving /verify and adds) and many
+coroutines (like the bot or the async server) resolve usernames and user IDs
+at once against the stub API with injected latency. A share of the lookups
+repeat a name another caller is resolving at the same moment. Caches start
+cold for every run.
+
+Usage: python benchmarks/bench_roblox_resolver.py [--lookups 4000] [--callers 64] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from roblox_client import RobloxClient
+from stub_roblox import StubRoblox
+
+
+def workload(lookups, seed=1):
+    """(kind, key) pairs; ~20% repeat a recent key, ~5% are unknown names"""
+    rng = random.Random(seed)
+    work = []
+    for i in range(lookups):
+        if work and rng.random() < 0.2:
+            work.append(work[max(0, len(work) - rng.randint(1, 32))])
+        elif rng.random() < 0.05:
+            work.append(('name', f'typo_{i}'))
+        elif rng.random() < 0.5:
+            work.append(('name', f'Player{i}'))
+        else:
+            work.append(('id', 1_000_000 + i))
+    return work
+
+
+def lookup(client, kind, key):
+    return client.get_user_id(key) if kind == 'name' else client.get_username(key)
+
+
+async def lookup_async(client, kind, key):
+    return await (client.get_user_id_async(key) if kind == 'name' else client.get_username_async(key))
+
+
+def run_threads(client, work, callers):
+    queue = list(reversed(work))
+    lock = threading.Lock()
+
+    def caller():
+        while True:
+            with lock:
+                if not queue:
+                    return
+                kind, key = queue.pop()
+            lookup(client, kind, key)
+
+    threads = [threading.Thread(target=caller) for _ in range(callers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+
+def run_coroutines(client, work, callers):
+    async def main():
+        semaphore = asyncio.Semaphore(callers)
+
+        async def one(kind, key):
+            async with semaphore:
+                await lookup_async(client, kind, key)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(kind, key) for kind, key in work))
+        elapsed = time.perf_counter() - started
+        await client.aclose()
+        return elapsed
+    return asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lookups', type=int, default=4000)
+    parser.add_argument('--callers', type=int, default=64)
+    parser.add_argument('--latency', type=float, default=0.05, help='injected upstream latency (s)')
+    parser.add_argument('--window-ms', type=float, default=5)
+    args = parser.parse_args()
+
+    stub = StubRoblox(latency=args.latency).start()
+    work = workload(args.lookups)
+    try:
+        for mode, runner in (('threads', run_threads), ('asyncio', run_coroutines)):
+            for label, window in (('one request each', 0), ('coalesced batches', args.window_ms / 1000)):
+                stub.requests = 0
+                client = RobloxClient(stub.url, batch_window=window, pool_size=args.callers)
+                elapsed = runner(client, work, args.callers)
+                stats = client.stats()
+                print(f"{mode:<8} {label:<18} {len(work) / elapsed:8.0f} lookups/s  "
+                      f"{stub.requests:5d} upstream requests  errors {stats['errors']}")
+    finally:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Write latency of a quiet tenant while another tenant is hammered.
+
+The hot tenant bulk-adds users from several threads while the quiet tenant
+adds one user at a time. "one store" keeps both games in a single store
+behind one writer lock, as namespacing inside the existing whitelist would;
+"store per tenant" gives each its own store, lock and index, as
+tenants.TenantRegistry does.
+
+Usage: python benchmarks/bench_tenants.py [--hot-writers 4] [--batch 500] [--duration 5]
+"""
+import argparse
+import shutil
+import tempfile
+import threading
+import time
+
+from harness import report
+
+from store import WhitelistStore
+
+
+def run(label, hot_store, quiet_store, hot_writers, batch, duration):
+    stop = threading.Event()
+    hot_users = [0]
+    quiet_samples = []
+
+    def hot_writer(offset):
+        next_id = 10_000_000 * (offset + 1)
+        while not stop.is_set():
+            hot_store.apply([('put', next_id + i, {'username': f'Hot{next_id + i}', 'added_by': 'Benchmark'})
+                             for i in range(batch)])
+            next_id += batch
+            hot_users[0] += batch
+
+    def quiet_writer():
+        user_id = 1
+        while not stop.is_set():
+            started = time.perf_counter()
+            quiet_store.put(user_id, {'username': f'Quiet{user_id}', 'added_by': 'Benchmark'})
+            quiet_samples.append(time.perf_counter() - started)
+            user_id += 1
+            time.sleep(0.005)
+
+    threads = [threading.Thread(target=hot_writer, args=(i,)) for i in range(hot_writers)]
+    threads.append(threading.Thread(target=quiet_writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    report(f'{label}: quiet tenant add', quiet_samples)
+    print(f"{'':<28} hot tenant {hot_users[0] / duration:,.0f} users/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hot-writers', type=int, default=4)
+    parser.add_argument('--batch', type=int, default=500, help='users per hot-tenant write')
+    parser.add_argument('--duration', type=float, default=5.0)
+    args = parser.parse_args()
+
+    directories = [tempfile.mkdtemp(prefix='whitelist-bench-') for _ in range(3)]
+    try:
+        shared = WhitelistStore(directories[0])
+        run('one store', shared, shared, args.hot_writers, args.batch, args.duration)
+        shared.close()
+
+        hot, quiet = WhitelistStore(directories[1]), WhitelistStore(directories[2])
+        run('store per tenant', hot, quiet, args.hot_writers, args.batch, args.duration)
+        hot.close()
+        quiet.close()
+    finally:
+        for directory in directories:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""Webhook push latency, batching and retries against local HTTP receivers.
+
+Registers several local receivers through POST /webhooks (one of them fails
+its first few deliveries), then:
+
+- makes paced single-user writes and measures write -> delivery latency per
+  receiver, checking every signature;
+- makes a burst of writes and counts how many deliveries carried them;
+- checks every receiver, including the flaky one, ends with every change.
+
+Usage: python benchmarks/bench_webhooks.py [--receivers 3] [--writes 200] [--burst 5000]
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from harness import disable_rate_limits, report, use_temp_data_dir
+
+BENCH_API_KEY = 'bench-webhooks'
+
+use_temp_data_dir()
+disable_rate_limits()
+# Webhook routes need an API key, and the receivers here are local
+os.environ['API_KEYS'] = json.dumps([BENCH_API_KEY])
+os.environ['WEBHOOK_ALLOW_PRIVATE_URLS'] = '1'
+
+import web_server
+import webhooks
+
+
+class Receiver:
+    """Local webhook endpoint recording when each user ID arrived"""
+
+    def __init__(self, fail_first=0):
+        self.secret = None
+        self.fail_first = fail_first
+        self.arrivals = {}
+        self.removed = set()
+        self.deliveries = 0
+        self.rejected = 0
+        self.bad_signatures = 0
+        self.seq = 0
+        self._lock = threading.Lock()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                status = receiver.receive(self.headers, body)
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/hook"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def receive(self, headers, body):
+        now = time.perf_counter()
+        with self._lock:
+            if not webhooks.verify_signature(self.secret, headers[webhooks.TIMESTAMP_HEADER], body,
+                                             headers[webhooks.SIGNATURE_HEADER]):
+                self.bad_signatures += 1
+                return 401
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                self.rejected += 1
+                return 500
+            payload = json.loads(body)
+            self.deliveries += 1
+            for user_id in payload['added']:
+                self.arrivals.setdefault(user_id, now)
+            self.removed.update(payload['removed'])
+            self.seq = payload['seq']
+        return 200
+
+
+def wait_for(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--receivers', type=int, default=3)
+    parser.add_argument('--writes', type=int, default=200)
+    parser.add_argument('--burst', type=int, default=5000)
+    parser.add_argument('--interval', type=float, default=0.02, help='seconds between paced writes')
+    args = parser.parse_args()
+
+    client = web_server.app.test_client()
+    receivers = [Receiver(fail_first=3 if i == args.receivers - 1 else 0) for i in range(args.receivers)]
+    for receiver in receivers:
+        response = client.post('/webhooks', json={'url': receiver.url}, headers={'X-API-Key': BENCH_API_KEY})
+        assert response.status_code == 201, response.json
+        receiver.secret = response.json['secret']
+    time.sleep(web_server.webhook_dispatcher.poll_interval * 1.5)  # let the dispatcher pick them up
+
+    # Paced single writes
+    written = {}
+    for i in range(args.writes):
+        user_id = 7_000_000 + i
+        written[user_id] = time.perf_counter()
+        web_server.whitelist_service.add(user_id, username=f'hook{i}')
+        time.sleep(args.interval)
+    for receiver in receivers:
+        wait_for(lambda: all(user_id in receiver.arrivals for user_id in written), 60)
+    for i, receiver in enumerate(receivers):
+        samples = [receiver.arrivals[user_id] - started for user_id, started in written.items()
+                   if user_id in receiver.arrivals]
+        label = f"receiver {i}{' (flaky)' if i == args.receivers - 1 else ''}"
+        report(label, samples)
+        print(f"  {receiver.deliveries} deliveries for {args.writes} writes, "
+              f"{receiver.rejected} rejected and retried")
+
+    # Burst
+    before = [receiver.deliveries for receiver in receivers]
+    started = time.perf_counter()
+    for i in range(0, args.burst, 100):
+        web_server.whitelist_service.add_many(
+            [{'user_id': 8_000_000 + j, 'username': f'burst{j}'} for j in range(i, min(i + 100, args.burst))])
+    web_server.whitelist_service.remove(7_000_000)
+    seq = web_server.store.seq
+    for receiver in receivers:
+        wait_for(lambda: receiver.seq >= seq, 60)
+    elapsed = time.perf_counter() - started
+    print(f"\nburst of {args.burst} adds + 1 remove: every receiver at seq {seq} after {elapsed:.2f}s, "
+          f"deliveries per receiver: {[receiver.deliveries - b for receiver, b in zip(receivers, before)]}")
+
+    for i, receiver in enumerate(receivers):
+        missing = [user_id for user_id in written if user_id not in receiver.arrivals]
+        missing += [8_000_000 + j for j in range(args.burst) if 8_000_000 + j not in receiver.arrivals]
+        assert not missing, f"receiver {i} missing {len(missing)} users"
+        assert 7_000_000 in receiver.removed
+        assert receiver.bad_signatures == 0
+    print(json.dumps(client.get('/webhooks', headers={'X-API-Key': BENCH_API_KEY}).json['subscribers'][0], indent=2))
+
+
+if __name__ == '__main__':
+    main()
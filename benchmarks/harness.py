@@ -0,0 +1,55 @@
+"""Shared helpers for the benchmark scripts."""
+import os
+import socket
+import sys
+import tempfile
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def use_temp_data_dir():
+    """Point DATA_DIR at a scratch directory (call before importing web_server)"""
+    os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix='whitelist-bench-'))
+
+
+def disable_rate_limits():
+    """Single-client benchmarks measure the routes, not the per-client limits"""
+    os.environ.setdefault('RATE_LIMITS', 'off')
+    os.environ.setdefault('VERIFY_MAX_IN_FLIGHT', '0')
+
+
+def serve_app(app, threads=8):
+    """Serve a WSGI app under waitress on a free port; returns (server, base_url)"""
+    from waitress import create_server
+    port = free_port()
+    server = create_server(app, host='127.0.0.1', port=port, threads=threads)
+    threading.Thread(target=server.run, daemon=True).start()
+    return server, f"http://127.0.0.1:{port}"
+
+
+def percentile(sorted_samples, fraction):
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * fraction))]
+
+
+def summarize(samples):
+    """Latency summary in milliseconds"""
+    samples = sorted(samples)
+    return {
+        'mean': sum(samples) / len(samples) * 1000,
+        'p50': percentile(samples, 0.50) * 1000,
+        'p99': percentile(samples, 0.99) * 1000,
+        'p999': percentile(samples, 0.999) * 1000,
+    }
+
+
+def report(label, samples):
+    stats = summarize(samples)
+    print(f"{label:<28} mean {stats['mean']:8.3f}ms  p50 {stats['p50']:8.3f}ms  "
+          f"p99 {stats['p99']:8.3f}ms  p999 {stats['p999']:8.3f}ms")
@@ -0,0 +1,204 @@
+"""Load test for the whitelist API with a regression check against a baseline.
+
+Serves web_server.app under waitress (as main.py does) against a local stub
+Roblox API, drives a seeded mix of game-server and admin traffic from
+concurrent clients, and reports throughput and p50/p99/p999 per operation.
+
+    python benchmarks/load_test.py                     # run and compare to baseline.json
+    python benchmarks/load_test.py --save-baseline     # record a new baseline
+
+Exits with status 1 when any operation regresses beyond --tolerance. The
+stored baseline is machine specific; re-record it on the machine that runs
+the comparison.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+from harness import serve_app, summarize, use_temp_data_dir
+from stub_roblox import StubRoblox
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# (operation, weight): mirrors production, where game servers mostly check
+MIX = (
+    ('check_whitelist', 60),
+    ('webhook_check', 20),
+    ('batch_check', 4),
+    ('whitelist_page', 4),
+    ('whitelist_full', 1),
+    ('add', 6),
+    ('remove', 5),
+)
+
+RATE_LIMITED_ENDPOINTS = ('check_whitelist', 'check_whitelist_batch', 'webhook_verify', 'verify_username')
+
+
+def make_operation(name, session, base_url, rng, users):
+    user_id = rng.randint(1, users * 2)
+    if name == 'check_whitelist':
+        return lambda: session.get(f"{base_url}/check_whitelist", params={'user_id': user_id})
+    if name == 'webhook_check':
+        return lambda: session.post(f"{base_url}/webhook_verify", json={'user_id': user_id, 'action': 'check'})
+    if name == 'batch_check':
+        user_ids = [rng.randint(1, users * 2) for _ in range(100)]
+        return lambda: session.post(f"{base_url}/check_whitelist/batch", json={'user_ids': user_ids})
+    if name == 'whitelist_page':
+        return lambda: session.get(f"{base_url}/whitelist", params={'limit': 100, 'cursor': user_id})
+    if name == 'whitelist_full':
+        return lambda: session.get(f"{base_url}/whitelist")
+    if name == 'add':
+        # No username: stored under a placeholder at once, the real name is backfilled from the (stub) Roblox API
+        return lambda: session.post(f"{base_url}/webhook_verify", json={'user_id': user_id, 'action': 'add'})
+    if name == 'remove':
+        return lambda: session.post(f"{base_url}/whitelist/remove", json={'user_id': user_id})
+    raise ValueError(name)
+
+
+def run_load(base_url, clients, duration, users, seed):
+    import requests
+
+    names = [name for name, _ in MIX]
+    weights = [weight for _, weight in MIX]
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(client_seed):
+        rng = random.Random(client_seed)
+        session = requests.Session()
+        session.headers['X-API-Key'] = f'load-test-{client_seed - seed}'
+        local = {name: [] for name in names}
+        local_errors = {name: 0 for name in names}
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            operation = make_operation(name, session, base_url, rng, users)
+            started = time.perf_counter()
+            try:
+                response = operation()
+                # 404 is a normal answer for removing someone not whitelisted
+                if response.status_code >= 500:
+                    local_errors[name] += 1
+            except Exception:
+                local_errors[name] += 1
+                continue
+            local[name].append(time.perf_counter() - started)
+        with lock:
+            for name in names:
+                samples[name].extend(local[name])
+                errors[name] += local_errors[name]
+
+    threads = [threading.Thread(target=client, args=(seed + i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    results = {}
+    for name in names:
+        if samples[name]:
+            results[name] = dict(summarize(samples[name]), rps=len(samples[name]) / duration, errors=errors[name])
+    all_samples = [sample for name in names for sample in samples[name]]
+    results['total'] = dict(summarize(all_samples), rps=len(all_samples) / duration, errors=sum(errors.values()))
+    return results
+
+
+def print_report(results, baseline=None):
+    print(f"{'operation':<16} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'p999 ms':>9} {'errors':>7}")
+    for name, stats in results.items():
+        line = (f"{name:<16} {stats['rps']:9.1f} {stats['p50']:9.2f} {stats['p99']:9.2f} "
+                f"{stats['p999']:9.2f} {stats['errors']:7d}")
+        if baseline and name in baseline:
+            line += f"   (baseline p99 {baseline[name]['p99']:.2f}ms, {baseline[name]['rps']:.1f} req/s)"
+        print(line)
+
+
+def find_regressions(results, baseline, tolerance):
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if stats['p99'] > base['p99'] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {stats['p99']:.2f}ms vs baseline {base['p99']:.2f}ms")
+        if stats['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append(f"{name}: {stats['rps']:.1f} req/s vs baseline {base['rps']:.1f} req/s")
+        if stats['errors'] > base.get('errors', 0):
+            regressions.append(f"{name}: {stats['errors']} errors vs baseline {base.get('errors', 0)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--users', type=int, default=50000, help='initial whitelist size')
+    parser.add_argument('--threads', type=int, default=8, help='waitress worker threads')
+    parser.add_argument('--roblox-latency', type=float, default=0.02, help='stub Roblox API latency (s)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative regression')
+    parser.add_argument('--output', help='also write the results as JSON here')
+    args = parser.parse_args()
+
+    stub = StubRoblox(latency=args.roblox_latency).start()
+    os.environ['ROBLOX_API_URL'] = stub.url
+    use_temp_data_dir()
+    # Each client has its own API key and quotas far above what it can send,
+    # so the rate limiter is on the request path without throttling the run
+    os.environ['API_KEYS'] = json.dumps([f'load-test-{i}' for i in range(args.clients)])
+    os.environ['RATE_LIMITS'] = json.dumps({endpoint: [1e6, 1e6] for endpoint in RATE_LIMITED_ENDPOINTS})
+    import web_server
+
+    web_server.store.apply([('put', user_id, {'username': f'Player{user_id}', 'discord_user': 'LoadTest',
+                                              'added_at': '2024-01-01T00:00:00', 'added_by': 'LoadTest'})
+                            for user_id in range(1, args.users * 2, 2)])
+    server, base_url = serve_app(web_server.app, threads=args.threads)
+
+    results = run_load(base_url, args.clients, args.duration, args.users, args.seed)
+    server.close()
+    stub.stop()
+
+    config = {key: getattr(args, key) for key in ('clients', 'duration', 'users', 'threads', 'roblox_latency', 'seed')}
+    report = {'config': config, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print_report(results)
+        print(f"💾 Baseline saved to {args.baseline}")
+        return 0
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        baseline = stored['results']
+        if stored['config'] != config:
+            print(f"⚠️  Baseline was recorded with different settings: {stored['config']}")
+    print_report(results, baseline)
+    if baseline is None:
+        print("⚠️  No baseline found; run with --save-baseline to record one")
+        return 0
+
+    regressions = find_regressions(results, baseline, args.tolerance)
+    if regressions:
+        print("❌ Regressions against baseline:")
+        for regression in regressions:
+            print(f"   {regression}")
+        return 1
+    print("✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""Local stand-in for the Roblox users API, for benchmarks.
+
+Every user ID N exists with username "Player{N}"; any other username is
+unknown (404). Upstream latency can be injected to mimic the real API. Both
+the single-user routes and the bulk POST /v1/usernames/users and /v1/users
+routes are served; `requests` counts upstream requests of either kind.
+
+Faults can be injected (and changed while running) to exercise the client's
+timeouts and circuit breaker:
+
+- fault='error': every request answers 503
+- fault='hang': every request stalls for hang_seconds before answering
+- fault='reset': the connection is closed without an answer
+- error_rate=0.3: that share of requests answers 503 at random
+"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+NAME_PATTERN = re.compile(r'^player(\d+)$', re.IGNORECASE)
+
+
+class StubRoblox:
+    """Threaded HTTP server answering the Roblox user lookup routes"""
+
+    def __init__(self, latency=0.0, host='127.0.0.1', port=0, fault=None, error_rate=0.0, hang_seconds=30):
+        self.latency = latency
+        self.fault = fault
+        self.error_rate = error_rate
+        self.hang_seconds = hang_seconds
+        self.requests = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub._count()
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if not self._faulted():
+                    status, body = stub.handle_get(urlparse(self.path))
+                    self._reply(status, body)
+
+            def do_POST(self):
+                stub._count()
+                data = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if not self._faulted():
+                    status, body = stub.handle_post(urlparse(self.path), data)
+                    self._reply(status, body)
+
+            def _faulted(self):
+                """Apply the injected fault, if any; True if the request has been dealt with"""
+                fault = stub.fault
+                if fault == 'hang':
+                    time.sleep(stub.hang_seconds)
+                elif fault == 'reset':
+                    self.close_connection = True
+                    return True
+                if fault == 'error' or (stub.error_rate and random.random() < stub.error_rate):
+                    self._reply(503, {'errors': [{'message': 'Service unavailable'}]})
+                    return True
+                return False
+
+            def _reply(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                try:
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client gave up (e.g. timed out during a 'hang')
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+
+    def _count(self):
+        with self._lock:
+            self.requests += 1
+
+    def handle_get(self, url):
+        if url.path == '/users/get-by-username':
+            username = parse_qs(url.query).get('username', [''])[0]
+            match = NAME_PATTERN.match(username)
+            if not match:
+                return 404, {'errorMessage': 'User not found'}
+            user_id = int(match.group(1))
+            return 200, {'Id': user_id, 'Username': f'Player{user_id}'}
+        if url.path.startswith('/users/'):
+            try:
+                user_id = int(url.path.rsplit('/', 1)[1])
+            except ValueError:
+                return 400, {'errors': [{'message': 'Invalid user id'}]}
+            return 200, {'Id': user_id, 'Username': f'Player{user_id}'}
+        return 404, {'errors': [{'message': 'Not found'}]}
+
+    def handle_post(self, url, data):
+        if url.path == '/v1/usernames/users':
+            users = []
+            for username in data.get('usernames', []):
+                match = NAME_PATTERN.match(username)
+                if match:
+                    user_id = int(match.group(1))
+                    users.append({'requestedUsername': username, 'id': user_id,
+                                  'name': f'Player{user_id}', 'displayName': f'Player{user_id}'})
+            return 200, {'data': users}
+        if url.path == '/v1/users':
+            return 200, {'data': [{'id': user_id, 'name': f'Player{user_id}', 'displayName': f'Player{user_id}'}
+                                  for user_id in data.get('userIds', []) if isinstance(user_id, int) and user_id > 0]}
+        return 404, {'errors': [{'message': 'Not found'}]}
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == '__main__':
+    stub = StubRoblox().start()
+    print(f"Stub Roblox API listening on {stub.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,364 @@
+"""Bulk import and export of the whitelist as CSV or NDJSON.
+
+Imports are streamed: rows are parsed and validated one at a time and written
+in batches through WhitelistStore.apply(), so a batch costs one log write and
+one fsync however many rows it holds, and memory is bounded by the batch size
+rather than the file size. Rows without a username are stored with the usual
+User_<id> placeholder and handed to a UsernameBackfill, which looks them up
+on Roblox in the background instead of stalling the import (single adds
+without a username go through the same queue).
+
+Command line, against a running server:
+
+    python bulk.py import users.csv [--url http://localhost:8080]
+    python bulk.py export users.ndjson [--url http://localhost:8080]
+"""
+import argparse
+import csv
+import heapq
+import io
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from array import array
+from collections import deque
+
+from expiry import parse_expires_at
+from store import FIELDS
+
+FORMATS = ('csv', 'ndjson')
+COLUMNS = ('user_id',) + FIELDS
+
+# Rows written per store transaction
+IMPORT_BATCH_SIZE = 5000
+# Longest value accepted for any text column
+MAX_FIELD_LENGTH = 200
+# Per-row validation errors included in an import report
+MAX_REPORTED_ERRORS = 20
+# Bytes buffered before each export chunk is sent
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+def placeholder_username(user_id):
+    """Name stored until the real Roblox username is known"""
+    return f"User_{user_id}"
+
+
+# === PARSING ===
+def csv_rows(lines):
+    """Yield (line_number, row dict) from CSV text lines with a header row"""
+    reader = csv.DictReader(lines)
+    if not reader.fieldnames or 'user_id' not in reader.fieldnames:
+        raise ValueError("CSV header must include a user_id column")
+    for row in reader:
+        yield reader.line_num, row
+
+
+def ndjson_rows(lines):
+    """Yield (line_number, row dict) from NDJSON lines.
+
+    A leading {"seq": ..., "total_count": ...} line, as written by the
+    NDJSON export, is skipped so exports can be re-imported as-is.
+    """
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None
+            continue
+        if line_number == 1 and isinstance(row, dict) and 'seq' in row and 'user_id' not in row:
+            continue
+        yield line_number, row
+
+
+def parse_rows(lines, fmt):
+    if fmt == 'csv':
+        return csv_rows(lines)
+    if fmt == 'ndjson':
+        return ndjson_rows(lines)
+    raise ValueError(f"Unknown format: {fmt}")
+
+
+def validate_row(row):
+    """Return (user_id, user dict) for a parsed row, or raise ValueError"""
+    if not isinstance(row, dict):
+        raise ValueError("Row is not an object")
+    try:
+        user_id = int(row.get('user_id'))
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid user_id: {row.get('user_id')!r}")
+    if user_id <= 0:
+        raise ValueError(f"Invalid user_id: {user_id}")
+    user_data = {}
+    for field in FIELDS:
+        value = row.get(field)
+        if value is None or value == '':
+            continue
+        if field == 'expires_at':
+            user_data[field] = parse_expires_at(value)
+            continue
+        if not isinstance(value, str):
+            raise ValueError(f"{field} must be a string")
+        if len(value) > MAX_FIELD_LENGTH:
+            raise ValueError(f"{field} is longer than {MAX_FIELD_LENGTH} characters")
+        user_data[field] = value
+    return user_id, user_data
+
+
+# === IMPORT ===
+def import_rows(store, rows, backfill=None, discord_user='Import', added_by='Import',
+                batch_size=IMPORT_BATCH_SIZE):
+    """Validate and write rows in batched transactions; returns a report dict.
+
+    Invalid rows are skipped and counted. Rows without a username get a
+    placeholder and, if a backfill is given, are queued for resolution.
+    """
+    started = time.perf_counter()
+    added_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+    report = {'rows': 0, 'imported': 0, 'invalid': 0, 'errors': [], 'queued_for_username': 0}
+    ops = []
+    missing = array('q')
+
+    def flush():
+        store.apply(ops)
+        report['imported'] += len(ops)
+        if backfill is not None and missing:
+            backfill.submit(missing)
+            report['queued_for_username'] += len(missing)
+        ops.clear()
+        del missing[:]
+
+    for line_number, row in rows:
+        report['rows'] += 1
+        try:
+            user_id, user_data = validate_row(row)
+        except ValueError as e:
+            report['invalid'] += 1
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append({'line': line_number, 'error': str(e)})
+            continue
+        if 'username' not in user_data:
+            user_data['username'] = placeholder_username(user_id)
+            missing.append(user_id)
+        user_data.setdefault('discord_user', discord_user)
+        user_data.setdefault('added_at', added_at)
+        user_data.setdefault('added_by', added_by)
+        ops.append(('put', user_id, user_data))
+        if len(ops) >= batch_size:
+            flush()
+    if ops:
+        flush()
+
+    seconds = time.perf_counter() - started
+    report['seconds'] = round(seconds, 3)
+    report['rows_per_second'] = round(report['rows'] / seconds) if seconds else report['rows']
+    return report
+
+
+class UsernameBackfill:
+    """Worker threads replacing placeholder usernames with real Roblox names.
+
+    Fed by bulk imports and by single adds that arrive without a username, so
+    neither waits on Roblox. Workers take up to chunk_size queued IDs at a
+    time and resolve them with one resolve_usernames(ids) call, which returns
+    {user_id: username or None} and raises if Roblox can't be reached. A
+    failed chunk is retried with exponential backoff up to max_attempts
+    times; IDs Roblox doesn't know keep their placeholder.
+    """
+
+    def __init__(self, store, resolve_usernames, workers=4, chunk_size=100, max_attempts=5, retry_delay=1.0):
+        self.store = store
+        self.resolve_usernames = resolve_usernames
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._chunks = deque()  # array('q') chunks of user IDs
+        self._retries = []      # heap of (due, tiebreak, attempt, chunk)
+        self._tiebreak = itertools.count()
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._threads = []
+        self.resolved = 0
+        self.unresolved = 0
+        self.retried = 0
+        self.failed = 0
+
+    def submit(self, user_ids):
+        """Queue user IDs whose stored username is still a placeholder"""
+        with self._cond:
+            for i in range(0, len(user_ids), self.chunk_size):
+                chunk = array('q', user_ids[i:i + self.chunk_size])
+                self._chunks.append(chunk)
+                self._pending += len(chunk)
+            if not self._threads:
+                for _ in range(self.workers):
+                    thread = threading.Thread(target=self._work, daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+            self._cond.notify_all()
+
+    def resume(self, snapshot):
+        """Queue every user in a snapshot still carrying a placeholder (e.g. after a restart)"""
+        user_ids = [user_id for user_id, user_data in snapshot.items()
+                    if user_data.get('username') == placeholder_username(user_id)]
+        if user_ids:
+            self.submit(user_ids)
+            print(f"🔎 Resuming username lookups for {len(user_ids)} users")
+        return len(user_ids)
+
+    def pending(self):
+        """User IDs still waiting for a username (including ones waiting to retry)"""
+        return self._pending
+
+    def _next(self):
+        """Next chunk to resolve as (attempt, chunk); call with _cond held"""
+        while True:
+            now = time.monotonic()
+            if self._retries and self._retries[0][0] <= now:
+                _due, _tiebreak, attempt, chunk = heapq.heappop(self._retries)
+                return attempt, chunk
+            if self._chunks:
+                # Merge small chunks (single adds) so they share a lookup
+                chunk = self._chunks.popleft()
+                while self._chunks and len(chunk) + len(self._chunks[0]) <= self.chunk_size:
+                    chunk.extend(self._chunks.popleft())
+                return 0, chunk
+            self._cond.wait(self._retries[0][0] - now if self._retries else None)
+
+    def _work(self):
+        while True:
+            with self._cond:
+                attempt, chunk = self._next()
+            try:
+                self._resolve_chunk(chunk)
+            except Exception as e:
+                with self._cond:
+                    if attempt + 1 < self.max_attempts:
+                        delay = self.retry_delay * 2 ** attempt
+                        heapq.heappush(self._retries, (time.monotonic() + delay, next(self._tiebreak),
+                                                       attempt + 1, chunk))
+                        self.retried += len(chunk)
+                        self._cond.notify()
+                        print(f"⚠️  Username lookup for {len(chunk)} users failed ({e}); retrying in {delay:.0f}s")
+                        continue
+                    self.failed += len(chunk)
+                print(f"❌ Username backfill gave up on {len(chunk)} users: {e}")
+            with self._cond:
+                self._pending -= len(chunk)
+
+    def _resolve_chunk(self, chunk):
+        usernames = self.resolve_usernames(list(chunk))
+        ops = []
+        unresolved = 0
+        for user_id in chunk:
+            username = usernames.get(user_id)
+            if not username:
+                unresolved += 1
+                continue
+            # Checked under the writer lock: users removed or renamed since
+            # they were queued are skipped, and renewals are kept
+            ops.append(('rename', user_id, username, placeholder_username(user_id)))
+        renamed = sum(result is not None for result in self.store.apply(ops)) if ops else 0
+        with self._cond:
+            self.resolved += renamed
+            self.unresolved += unresolved
+
+    def stats(self):
+        with self._cond:
+            return {'pending': self._pending, 'retrying': sum(len(chunk) for *_, chunk in self._retries),
+                    'resolved': self.resolved, 'unresolved': self.unresolved,
+                    'retried': self.retried, 'failed': self.failed}
+
+
+# === EXPORT ===
+def csv_chunks(snapshot):
+    """CSV of a snapshot (header row first), grouped into ~64KB chunks"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for user_id, user_data in snapshot.items():
+        writer.writerow([user_id] + [user_data.get(field, '') for field in FIELDS])
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+# === COMMAND LINE ===
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    name = path.lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    return 'csv' if name.endswith('.csv') else 'ndjson'
+
+
+def cli_import(args):
+    import requests
+
+    fmt = detect_format(args.file, args.format)
+    headers = {'Content-Type': 'text/csv' if fmt == 'csv' else 'application/x-ndjson'}
+    if args.file.endswith('.gz'):
+        headers['Content-Encoding'] = 'gzip'
+    params = {'format': fmt}
+    if args.added_by:
+        params['added_by'] = args.added_by
+    with open(args.file, 'rb') as f:
+        # requests streams file objects instead of reading them into memory
+        response = requests.post(f"{args.url.rstrip('/')}/whitelist/import", params=params,
+                                 data=f, headers=headers, timeout=args.timeout)
+    report = response.json()
+    print(json.dumps(report, indent=2))
+    if response.status_code != 200:
+        return 1
+    print(f"✅ Imported {report['imported']}/{report['rows']} rows "
+          f"({report['rows_per_second']} rows/s, {report['invalid']} invalid)")
+    return 0
+
+
+def cli_export(args):
+    import requests
+
+    fmt = detect_format(args.file, args.format)
+    with requests.get(f"{args.url.rstrip('/')}/whitelist/export", params={'format': fmt},
+                      stream=True, timeout=args.timeout) as response:
+        if response.status_code != 200:
+            print(f"❌ Export failed: {response.status_code} {response.text}")
+            return 1
+        size = 0
+        with open(args.file, 'wb') as f:
+            for chunk in response.iter_content(EXPORT_CHUNK_SIZE):
+                f.write(chunk)
+                size += len(chunk)
+    print(f"✅ Exported whitelist to {args.file} ({size} bytes)")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import/export for the whitelist API")
+    parser.add_argument('--url', default=f"http://localhost:{os.environ.get('PORT', '8080')}")
+    parser.add_argument('--timeout', type=float, default=3600)
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_parser = commands.add_parser('import', help='upload a CSV or NDJSON file (optionally .gz)')
+    import_parser.add_argument('file')
+    import_parser.add_argument('--format', choices=FORMATS)
+    import_parser.add_argument('--added-by')
+    export_parser = commands.add_parser('export', help='download the whitelist')
+    export_parser.add_argument('file')
+    export_parser.add_argument('--format', choices=FORMATS)
+    args = parser.parse_args(argv)
+    return cli_import(args) if args.command == 'import' else cli_export(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""Pick exactly one of several server processes to run a singleton task.
+
+Used for the Discord bot when more than one process serves the same DATA_DIR
+(e.g. gunicorn workers on the shared SQLite store). The winner holds an
+exclusive flock on a lock file for as long as it lives; the OS releases the
+lock when the process exits, and the other processes, which keep retrying,
+take over.
+"""
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, so every process is the leader
+    fcntl = None
+
+
+class LeaderLock:
+    """Non-blocking exclusive lock on a file, held until the process exits"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def try_acquire(self):
+        if self._file is not None:
+            return True
+        f = open(self.path, 'a+')
+        if fcntl is not None:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                return False
+        # Record who holds it, for whoever is debugging a deployment
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        self._file = f
+        return True
+
+    @property
+    def held(self):
+        return self._file is not None
+
+
+def run_when_elected(path, start, retry_interval=10):
+    """Call start() in this process once it wins the lock at `path`.
+
+    Tries immediately, then every retry_interval seconds in a daemon thread.
+    Returns the LeaderLock.
+    """
+    lock = LeaderLock(path)
+    if lock.try_acquire():
+        start()
+        return lock
+
+    def campaign():
+        while not lock.try_acquire():
+            threading.Event().wait(retry_interval)
+        print(f"👑 Process {os.getpid()} elected to run {getattr(start, '__name__', 'task')}")
+        start()
+
+    threading.Thread(target=campaign, daemon=True).start()
+    return lock
@@ -0,0 +1,164 @@
+"""Time-limited whitelist entries.
+
+parse_expires_at() turns what users type (Unix seconds, an ISO 8601 date or
+a duration such as "7d") into the Unix timestamp stored in a record's
+expires_at field.
+
+ExpiryScheduler keeps a min-heap of (expires_at, user_id) fed by a store
+listener, so scheduling and removing an entry are O(log n) and nothing ever
+scans the whole whitelist. One thread sleeps until the earliest deadline and
+then commits the due entries as ('expire', id, now) ops: ordinary deletes in
+the log and change feed (so replicas, webhooks and /whitelist/changes see
+them like any removal), skipped by the store if the user was renewed in the
+meantime. Heap entries made stale by a renewal or removal are dropped when
+they surface; the heap is rebuilt if they pile up.
+"""
+import heapq
+import math
+import re
+import threading
+import time
+from datetime import datetime
+
+from metrics import Counter
+from store import record_expires_at
+
+WHITELIST_EXPIRATIONS = Counter('whitelist_expirations_total', 'Whitelist entries removed because they expired')
+
+DURATION_PATTERN = re.compile(r'^(\d+)\s*([smhdw])$', re.IGNORECASE)
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def parse_expires_at(value, now=None):
+    """Unix timestamp for an expires_at given as seconds, ISO 8601 or a duration ("30m", "12h", "7d").
+
+    Empty values mean "never" and return None. Raises ValueError for
+    anything unparseable or not in the future. Dates without a timezone are
+    read as server local time, like added_at.
+    """
+    if value is None or value == '':
+        return None
+    now = time.time() if now is None else now
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid expires_at: {value!r}")
+    if isinstance(value, (int, float)):
+        expires_at = value
+    elif isinstance(value, str):
+        text = value.strip()
+        match = DURATION_PATTERN.match(text)
+        try:
+            if match:
+                expires_at = math.ceil(now) + int(match.group(1)) * DURATION_UNITS[match.group(2).lower()]
+            elif re.fullmatch(r'\d+(\.\d+)?', text):
+                expires_at = float(text)
+            else:
+                expires_at = datetime.fromisoformat(text.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            raise ValueError(f"Invalid expires_at: {value!r} (use Unix seconds, ISO 8601 or e.g. 7d)")
+    else:
+        raise ValueError(f"Invalid expires_at: {value!r}")
+    if expires_at <= now:
+        raise ValueError("expires_at is in the past")
+    return int(expires_at) if expires_at == int(expires_at) else expires_at
+
+
+class ExpiryScheduler:
+    """Removes whitelist entries when their expires_at passes"""
+
+    def __init__(self, store, batch_size=1000):
+        self.store = store
+        self.batch_size = batch_size
+        self._heap = []   # (expires_at, user_id), possibly stale
+        self._due = {}    # user_id -> current expires_at
+        self._cond = threading.Condition()
+        self._running = False
+        self.expired = 0
+
+    def start(self):
+        if self._running:
+            return self
+        self._running = True
+        self.store.add_listener(self._changed, sync=self._load)
+        threading.Thread(target=self._run, daemon=True).start()
+        print(f"⏳ Expiry scheduler started ({len(self._due)} time-limited entries)")
+        return self
+
+    # === SCHEDULE (store listener, under the writer lock) ===
+    def _load(self, snapshot):
+        due = {}
+        for user_id, record in snapshot.records():
+            expires_at = record_expires_at(record)
+            if expires_at is not None:
+                due[user_id] = expires_at
+        with self._cond:
+            self._due = due
+            self._heap = [(expires_at, user_id) for user_id, expires_at in due.items()]
+            heapq.heapify(self._heap)
+            self._cond.notify()
+
+    def _changed(self, changes):
+        with self._cond:
+            earliest = self._heap[0][0] if self._heap else None
+            for _seq, op, user_id, record in changes:
+                expires_at = record_expires_at(record) if op == 'put' else None
+                if expires_at is None:
+                    self._due.pop(user_id, None)
+                elif self._due.get(user_id) != expires_at:
+                    self._due[user_id] = expires_at
+                    heapq.heappush(self._heap, (expires_at, user_id))
+            if len(self._heap) > 2 * len(self._due) + 1024:
+                self._heap = [(expires_at, user_id) for user_id, expires_at in self._due.items()]
+                heapq.heapify(self._heap)
+            if self._heap and (earliest is None or self._heap[0][0] < earliest):
+                self._cond.notify()
+
+    # === SWEEP ===
+    def _take_due(self, now):
+        """Pop up to batch_size due entries that are still current (under _cond)"""
+        heap = self._heap
+        taken = []
+        while heap and heap[0][0] <= now and len(taken) < self.batch_size:
+            expires_at, user_id = heapq.heappop(heap)
+            if self._due.get(user_id) == expires_at:
+                taken.append(user_id)
+        return taken
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.time()
+                    taken = self._take_due(now)
+                    if taken:
+                        break
+                    self._cond.wait(min(60.0, self._heap[0][0] - now) if self._heap else None)
+            try:
+                results = self.store.apply([('expire', user_id, now) for user_id in taken])
+                removed = sum(result is not None for result in results)
+                self.expired += removed
+                WHITELIST_EXPIRATIONS.inc(amount=removed)
+                if removed:
+                    print(f"⏳ Expired {removed} whitelist entr{'y' if removed == 1 else 'ies'}")
+            except Exception as e:
+                print(f"❌ Expiry sweep failed: {e}")
+                with self._cond:
+                    # Put them back and try again shortly
+                    for user_id in taken:
+                        expires_at = self._due.get(user_id)
+                        if expires_at is not None:
+                            heapq.heappush(self._heap, (expires_at, user_id))
+                time.sleep(1)
+
+    # === STATUS ===
+    def pending(self):
+        return len(self._due)
+
+    def next_expiry(self):
+        with self._cond:
+            while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def stats(self):
+        return {'running': self._running, 'scheduled': self.pending(), 'expired': self.expired,
+                'next_expiry': self.next_expiry()}
@@ -0,0 +1,23 @@
+# Multi-process deployment: gunicorn -c gunicorn.conf.py main:app
+#
+# Workers share the whitelist through the SQLite store, so reads scale across
+# cores; the Discord bot runs in whichever worker wins the election (and moves
+# to another one if that worker exits). `python main.py` still runs the
+# single-process waitress server.
+import os
+
+os.environ.setdefault('STORE_BACKEND', 'sqlite')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get('WEB_WORKERS', os.cpu_count() or 2))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', '8'))
+timeout = 120
+
+if os.environ['STORE_BACKEND'] != 'sqlite' and workers > 1:
+    raise RuntimeError("STORE_BACKEND=wal keeps the whitelist in one process; use sqlite with several workers")
+
+
+def post_worker_init(worker):
+    from web_server import start_discord_bot_when_elected
+    start_discord_bot_when_elected()
@@ -22,7 +22,7 @@ for key, value in env_vars.items():
     print(f"   {key}: {status}")
 
 try:
-    from web_server import app, start_discord_bot
+    from web_server import app, start_discord_bot_when_elected
     
     print("✅ Successfully imported web_server module")
     
@@ -49,15 +49,22 @@ if __name__ == '__main__':
     print(f"📊 Health check: {web_url}/health")
     print(f"⚙️  Admin panel: {web_url}/admin")
     
-    # Start Discord bot in background thread
-    try:
-        start_discord_bot()
-        print("🤖 Discord bot startup initiated")
-    except Exception as e:
-        print(f"⚠️  Discord bot startup warning: {e}")
-    
-    # Start web server in main thread
     port = int(os.environ.get('PORT', 8080))
-    print(f"🔄 Starting web server on port {port}...")
     
-    serve(app, host='0.0.0.0', port=port, threads=8)
+    # SERVER_MODE=async: HTTP API and Discord bot on one asyncio loop
+    if os.environ.get('SERVER_MODE', 'threaded') == 'async':
+        from async_server import run
+        print(f"🔄 Starting async web server on port {port}...")
+        run(port=port)
+    else:
+        # Start Discord bot in background thread
+        try:
+            start_discord_bot_when_elected()
+            print("🤖 Discord bot startup initiated")
+        except Exception as e:
+            print(f"⚠️  Discord bot startup warning: {e}")
+        
+        # Start web server in main thread
+        print(f"🔄 Starting web server on port {port}...")
+        
+        serve(app, host='0.0.0.0', port=port, threads=8)
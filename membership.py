@@ -0,0 +1,207 @@
+"""Compact membership index for whitelisted Roblox user IDs.
+
+IDs live in a sorted array of 64-bit ints (8 bytes each) plus small add and
+remove sets for recent changes, which are merged back into the array once
+they grow. A Bloom filter in front answers most negative checks without
+touching the array at all.
+
+WhitelistStore keeps one next to its record map to page through users in ID
+order. Point lookups go straight to the map: it has to be consulted for
+present IDs anyway, so checking the index first only adds work.
+"""
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+
+MASK64 = (1 << 64) - 1
+GOLDEN = 0x9E3779B97F4A7C15
+
+
+class BloomFilter:
+    """Bit-array Bloom filter for integer keys"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1024)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(self.size // 8 + 1)
+
+    def add(self, key):
+        bits, size = self.bits, self.size
+        h = (key * GOLDEN) & MASK64
+        position = h % size
+        step = (h >> 17) | 1
+        for _ in range(self.hashes):
+            bits[position >> 3] |= 1 << (position & 7)
+            position = (position + step) % size
+
+    def __contains__(self, key):
+        bits, size = self.bits, self.size
+        h = (key * GOLDEN) & MASK64
+        position = h % size
+        step = (h >> 17) | 1
+        for _ in range(self.hashes):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+            position = (position + step) % size
+        return True
+
+    def nbytes(self):
+        return len(self.bits)
+
+
+class MembershipIndex:
+    """Set of user IDs backed by a sorted array with a Bloom filter front.
+
+    Not thread-safe for writers; WhitelistStore serialises mutations under its
+    lock. Readers may call contains() concurrently.
+    """
+
+    def __init__(self, ids=(), error_rate=0.01):
+        self.error_rate = error_rate
+        self._base = array('q', sorted(set(ids)))
+        self._added = set()
+        self._removed = set()
+        self._stale_bits = 0
+        self._build_bloom()
+
+    @classmethod
+    def from_sorted(cls, ids, error_rate=0.01):
+        """Build from an already sorted, duplicate-free array('q') of IDs"""
+        index = cls.__new__(cls)
+        index.error_rate = error_rate
+        index._base = ids
+        index._added = set()
+        index._removed = set()
+        index._build_bloom()
+        return index
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild an index from state(); skips the O(n) sort and Bloom build"""
+        index = cls.__new__(cls)
+        index.error_rate = state['error_rate']
+        index._base = state['ids']
+        index._added = set()
+        index._removed = set()
+        index._stale_bits = 0
+        index._bloom = state['bloom']
+        return index
+
+    def state(self):
+        """Merged, picklable copy of the index for snapshots"""
+        self.merge()
+        bloom = BloomFilter.__new__(BloomFilter)
+        bloom.__dict__.update(self._bloom.__dict__)
+        bloom.bits = bytearray(self._bloom.bits)
+        return {'ids': self._base, 'bloom': bloom, 'error_rate': self.error_rate}
+
+    def _build_bloom(self):
+        bloom = BloomFilter(2 * len(self), self.error_rate)
+        for user_id in self._base:
+            bloom.add(user_id)
+        for user_id in self._added:
+            bloom.add(user_id)
+        self._bloom = bloom
+        self._stale_bits = 0
+
+    def __len__(self):
+        return len(self._base) + len(self._added) - len(self._removed)
+
+    def __contains__(self, user_id):
+        if user_id not in self._bloom:
+            return False
+        if user_id in self._added:
+            return True
+        if user_id in self._removed:
+            return False
+        base = self._base
+        i = bisect_left(base, user_id)
+        return i < len(base) and base[i] == user_id
+
+    def ids_after(self, after, limit):
+        """Up to `limit` member IDs greater than `after`, in ascending order"""
+        base, removed = self._base, self._removed
+        i = bisect_right(base, after) if after is not None else 0
+        pending = sorted(user_id for user_id in self._added if after is None or user_id > after)
+        j = 0
+        result = []
+        while len(result) < limit:
+            if i < len(base) and (j >= len(pending) or base[i] < pending[j]):
+                if base[i] not in removed:
+                    result.append(base[i])
+                i += 1
+            elif j < len(pending):
+                result.append(pending[j])
+                j += 1
+            else:
+                break
+        return result
+
+    def _in_base(self, user_id):
+        base = self._base
+        i = bisect_left(base, user_id)
+        return i < len(base) and base[i] == user_id
+
+    def add(self, user_id):
+        if self._in_base(user_id):
+            self._removed.discard(user_id)
+        else:
+            self._added.add(user_id)
+        self._bloom.add(user_id)
+        if len(self) > self._bloom.capacity:
+            self.merge()
+            self._build_bloom()
+        self._maybe_merge()
+
+    def update(self, user_ids):
+        """add() for many IDs, checking for merges and resizes once at the end"""
+        base, added, removed, bloom = self._base, self._added, self._removed, self._bloom
+        for user_id in user_ids:
+            i = bisect_left(base, user_id)
+            if i < len(base) and base[i] == user_id:
+                removed.discard(user_id)
+            else:
+                added.add(user_id)
+            bloom.add(user_id)
+        if len(self) > self._bloom.capacity:
+            self.merge()
+            self._build_bloom()
+        self._maybe_merge()
+
+    def discard(self, user_id):
+        if user_id in self._added:
+            self._added.discard(user_id)
+        elif self._in_base(user_id):
+            self._removed.add(user_id)
+        else:
+            return
+        # Bloom filters can't delete; removed IDs leave stale bits behind that
+        # only cost false positives, so rebuild once there are enough of them.
+        self._stale_bits += 1
+        if self._stale_bits > max(1024, len(self) // 4):
+            self.merge()
+            self._build_bloom()
+        self._maybe_merge()
+
+    def _maybe_merge(self):
+        if len(self._added) + len(self._removed) > max(1024, len(self._base) // 64):
+            self.merge()
+
+    def merge(self):
+        """Fold pending adds/removes into a new sorted base array"""
+        if not self._added and not self._removed:
+            return
+        removed = self._removed
+        merged = sorted([user_id for user_id in self._base if user_id not in removed] + list(self._added))
+        # Publish the new array before clearing the deltas so concurrent
+        # readers always see every member in one place or the other.
+        self._base = array('q', merged)
+        self._added = set()
+        self._removed = set()
+
+    def nbytes(self):
+        """Approximate memory used by the array and Bloom filter"""
+        return self._base.itemsize * len(self._base) + self._bloom.nbytes()
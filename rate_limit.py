@@ -0,0 +1,67 @@
+"""Per-client token buckets and in-flight caps for the public API routes.
+
+Each limited route has its own TokenBucketLimiter keyed by client (API key,
+or IP address). A bucket is two floats in a dict, refilled lazily when the
+client next calls, so an allowed request costs one dict lookup and a little
+arithmetic under a lock. Idle buckets that have refilled completely carry no
+information and are swept out once the table grows.
+
+ConcurrencyLimit caps how many requests to a route may run at once, so slow
+upstream calls (Roblox lookups in /verify) can't occupy every server thread.
+"""
+import threading
+import time
+
+
+class TokenBucketLimiter:
+    """Token bucket per client: `rate` requests/s sustained, bursts up to `burst`"""
+
+    def __init__(self, rate, burst, max_clients=100000):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_clients = max_clients
+        self._buckets = {}  # client -> [tokens, last refill time]
+        self._lock = threading.Lock()
+
+    def acquire(self, client, cost=1.0):
+        """Take `cost` tokens; returns 0.0 if allowed, else seconds until it would be"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                if len(self._buckets) >= self.max_clients:
+                    self._sweep(now)
+                bucket = self._buckets[client] = [self.burst, now]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0.0
+            return (cost - bucket[0]) / self.rate
+
+    def _sweep(self, now):
+        """Drop buckets that have refilled to full (equivalent to a new client)"""
+        full_after = self.burst / self.rate
+        self._buckets = {client: bucket for client, bucket in self._buckets.items()
+                         if now - bucket[1] < full_after}
+        if len(self._buckets) >= self.max_clients:
+            # Still full of active clients: forget everyone rather than grow unbounded
+            self._buckets = {}
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class ConcurrencyLimit:
+    """Non-blocking cap on requests in flight"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._semaphore = threading.BoundedSemaphore(limit)
+
+    def try_acquire(self):
+        return self._semaphore.acquire(blocking=False)
+
+    def release(self):
+        self._semaphore.release()
@@ -0,0 +1,175 @@
+"""Leader/follower replication of the whitelist between server instances.
+
+The leader needs nothing special: it serves its change ring as raw log
+entries on /replication/log (long-polling until there is something new) and
+a consistent snapshot on /whitelist?format=ndjson. A node started with
+REPLICATION_LEADER_URL runs a Follower, which
+
+- tails the leader's log into its own store, keeping the leader's sequence
+  numbers, so `seq` means the same thing on every node;
+- starts over from a snapshot when it is too far behind for the leader's
+  change ring (or has diverged), then resumes tailing;
+- forwards writes it receives to the leader and waits briefly for them to
+  come back through the log, so a client sees its own write on the replica.
+
+Reads are always served from the local store.
+"""
+import json
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from store import pack_record
+
+
+class ChangeNotifier:
+    """Lets request threads block until a store passes a sequence number"""
+
+    def __init__(self, store):
+        self.store = store
+        self._cond = threading.Condition()
+        store.add_listener(self._changed, sync=self._reset)
+
+    def _changed(self, changes):
+        with self._cond:
+            self._cond.notify_all()
+
+    def _reset(self, snapshot):
+        self._changed(None)
+
+    def wait_for(self, seq, timeout):
+        """Wait until store.seq >= seq; returns False on timeout"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.store.seq < seq:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+
+class Follower:
+    """Keeps a local store in step with a leader's and forwards writes to it"""
+
+    def __init__(self, store, leader_url, poll_wait=10, batch_limit=5000, timeout=30):
+        self.store = store
+        self.leader_url = leader_url.rstrip('/')
+        self.poll_wait = poll_wait
+        self.batch_limit = batch_limit
+        self.timeout = timeout
+        self.notifier = ChangeNotifier(store)
+        # Polling and forwarding run on different threads; give each its own session
+        self._poll_session = requests.Session()
+        self._forward_session = requests.Session()
+        self._forward_session.mount('http://', HTTPAdapter(pool_maxsize=16))
+        self._forward_session.mount('https://', HTTPAdapter(pool_maxsize=16))
+        self._stopped = threading.Event()
+        self._needs_snapshot = False
+        self.state = 'starting'
+        self.leader_seq = None
+        self.last_contact = None
+        self.caught_up_at = None
+        self.snapshots_loaded = 0
+        self.errors = 0
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    # === TAILING ===
+    def _run(self):
+        backoff = 1
+        while not self._stopped.is_set():
+            try:
+                if self._needs_snapshot:
+                    self._load_snapshot()
+                self._poll()
+                backoff = 1
+            except Exception as e:
+                self.state = 'disconnected'
+                self.errors += 1
+                print(f"❌ Replication from {self.leader_url} failed: {e}")
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def _poll(self):
+        response = self._poll_session.get(
+            f"{self.leader_url}/replication/log",
+            params={'after': self.store.seq, 'limit': self.batch_limit, 'wait': self.poll_wait},
+            timeout=self.poll_wait + self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        self.last_contact = time.time()
+        self.leader_seq = data['seq']
+        if data['resync']:
+            self._needs_snapshot = True
+            return
+        try:
+            self.store.apply_replicated(data['entries'])
+        except ValueError as e:
+            print(f"⚠️  {e}; reloading from a snapshot")
+            self._needs_snapshot = True
+            return
+        if self.store.seq >= self.leader_seq:
+            self.state = 'streaming'
+            self.caught_up_at = time.time()
+        else:
+            self.state = 'catching_up'
+
+    def _load_snapshot(self):
+        self.state = 'loading_snapshot'
+        started = time.perf_counter()
+        with self._poll_session.get(f"{self.leader_url}/whitelist", params={'format': 'ndjson'},
+                                    stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            lines = response.iter_lines()
+            header = json.loads(next(lines))
+            records = {}
+            for line in lines:
+                if line:
+                    user = json.loads(line)
+                    records[user.pop('user_id')] = pack_record(user)
+        self.store.reset(header['seq'], records)
+        self.leader_seq = max(self.leader_seq or 0, header['seq'])
+        self._needs_snapshot = False
+        self.snapshots_loaded += 1
+        print(f"📥 Loaded snapshot of {len(records)} users at seq {header['seq']} from leader "
+              f"in {time.perf_counter() - started:.2f}s")
+
+    # === WRITES ===
+    def forward(self, method, path, headers, data):
+        """Send a write to the leader; returns the leader's requests.Response"""
+        return self._forward_session.request(method, self.leader_url + path, headers=headers, data=data,
+                                             timeout=self.timeout, allow_redirects=False)
+
+    def wait_for(self, seq, timeout=2.0):
+        """Wait for the local store to reach the leader's seq after a forwarded write"""
+        return self.notifier.wait_for(seq, timeout)
+
+    # === STATUS ===
+    def status(self):
+        leader_seq = self.leader_seq if self.leader_seq is not None else self.store.seq
+        now = time.time()
+        lag_entries = max(0, leader_seq - self.store.seq)
+        if lag_entries == 0 and self.state == 'streaming':
+            lag_seconds = 0.0
+        else:
+            lag_seconds = now - self.caught_up_at if self.caught_up_at else None
+        return {
+            'role': 'follower',
+            'leader': self.leader_url,
+            'state': self.state,
+            'seq': self.store.seq,
+            'leader_seq': leader_seq,
+            'lag_entries': lag_entries,
+            'lag_seconds': lag_seconds,
+            'seconds_since_contact': now - self.last_contact if self.last_contact else None,
+            'snapshots_loaded': self.snapshots_loaded,
+            'errors': self.errors
+        }
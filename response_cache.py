@@ -0,0 +1,106 @@
+"""Pre-serialised responses for the read-heavy routes, keyed by store version.
+
+A cached entry holds the exact bytes (and headers) a route produced at one
+store sequence number, plus a strong ETag built from that number and the
+request variant (path, query, gzip or not). Any mutation of the store drops
+every entry through a store listener, so a hit is always current.
+
+Because the ETag is a pure function of (seq, variant), a conditional request
+whose If-None-Match still names the current seq is answered 304 without
+looking anything up or building anything. Entries with a `ttl` (routes
+that also report live counters) carry a build number in their ETag instead
+and are only ever revalidated against the stored entry.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class CachedResponse:
+    __slots__ = ('seq', 'etag', 'body', 'headers', 'expires_at')
+
+    def __init__(self, seq, etag, body, headers, expires_at):
+        self.seq = seq
+        self.etag = etag
+        self.body = body
+        self.headers = headers
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """Bounded LRU of encoded responses, emptied whenever the store changes"""
+
+    def __init__(self, store, max_entries=256, max_bytes=256 * 1024 ** 2):
+        self.store = store
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._builds = 0
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'not_modified': 0, 'invalidations': 0}
+        store.add_listener(self._invalidate, sync=self._invalidate)
+
+    def _invalidate(self, _changes):
+        with self._lock:
+            if self._entries:
+                self._entries.clear()
+                self._bytes = 0
+                self.counters['invalidations'] += 1
+
+    @staticmethod
+    def etag(seq, key):
+        """Strong ETag (unquoted) for a variant at a store sequence number"""
+        return f"{seq}-{hashlib.blake2b(repr(key).encode(), digest_size=6).hexdigest()}"
+
+    def get(self, key):
+        """The current entry for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry.seq != self.store.seq or
+                                      (entry.expires_at is not None and entry.expires_at < time.monotonic())):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return entry
+
+    def put(self, key, seq, body, headers, ttl=None):
+        """Store a response built at `seq`; returns its entry.
+
+        Returns None if the store changed while the response was being
+        built, since the body may then reflect a later version than `seq`.
+        """
+        with self._lock:
+            if seq != self.store.seq:
+                return None
+            self._builds += 1
+            etag = self.etag(seq, key) if ttl is None else f"{self.etag(seq, key)}-{self._builds}"
+            entry = CachedResponse(seq, etag, body, headers, None if ttl is None else time.monotonic() + ttl)
+            if len(body) > self.max_bytes:
+                return entry
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+            return entry
+
+    def count_not_modified(self):
+        with self._lock:
+            self.counters['not_modified'] += 1
+
+    def _remove(self, key):
+        self._bytes -= len(self._entries.pop(key).body)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+        return stats
@@ -0,0 +1,644 @@
+"""Roblox identity lookups with a pooled HTTP session and TTL/LRU caches.
+
+Both directions (id -> name and name -> id) share what they learn, and
+usernames Roblox doesn't know are cached negatively for a shorter time so a
+typo spammed through `!verify` only costs one upstream call.
+
+The *_async variants share the same caches but call Roblox through aiohttp,
+so code on an event loop (the Discord bot, the async server) never needs a
+thread for a lookup.
+
+With a batch_window, cache misses go through a CoalescingBatcher instead:
+concurrent lookups of the same user share one upstream request, and distinct
+ones arriving within the window go out together through Roblox's bulk
+users-by-name / users-by-id endpoints.
+
+Every upstream call goes through a CircuitBreaker: after enough consecutive
+failures (errors, 5xx, timeouts) calls fail fast for reset_timeout seconds,
+then a single probe call decides whether to close again. Calls made inside
+`with budget(seconds)` are cut to the time the caller has left. A lookup that
+fails for any of these reasons answers from the cache even if the entry has
+expired, so known users keep resolving while Roblox is down.
+"""
+import asyncio
+import contextvars
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import Counter, Gauge, Histogram
+
+ROBLOX_REQUEST_SECONDS = Histogram('roblox_api_request_seconds', 'Latency of Roblox API requests', ('endpoint',))
+ROBLOX_ERRORS = Counter('roblox_api_errors_total', 'Roblox API requests that failed or returned 5xx', ('endpoint',))
+ROBLOX_CIRCUIT_STATE = Gauge('roblox_circuit_state', 'Roblox API circuit breaker state (0 closed, 1 half-open, 2 open)')
+ROBLOX_CIRCUIT_TRANSITIONS = Counter('roblox_circuit_transitions_total',
+                                     'Roblox API circuit breaker state changes by new state', ('state',))
+ROBLOX_CIRCUIT_REJECTED = Counter('roblox_circuit_rejected_total', 'Roblox API calls not made because the circuit was open')
+
+# Cached "Roblox says this doesn't exist" marker
+MISSING = object()
+# Most users the bulk endpoints accept per request
+BULK_LOOKUP_MAX = 100
+
+# time.monotonic() by which the current request (thread / task) needs its answer
+_deadline = contextvars.ContextVar('roblox_deadline', default=None)
+
+
+class CircuitOpenError(Exception):
+    """Roblox calls are being short-circuited"""
+
+
+class DeadlineExceeded(Exception):
+    """The caller's budget ran out before the call could be made"""
+
+
+def set_budget(seconds):
+    """Start a budget for Roblox calls in this context; returns a token for reset_budget()"""
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    return _deadline.set(deadline if current is None else min(current, deadline))
+
+
+def reset_budget(token):
+    _deadline.reset(token)
+
+
+@contextmanager
+def budget(seconds):
+    """Limit the Roblox calls made inside the block to `seconds` in total (nests, keeping the tightest)"""
+    token = set_budget(seconds)
+    try:
+        yield
+    finally:
+        reset_budget(token)
+
+
+def remaining_budget():
+    """Seconds left in the current budget, or None if there is none"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a per-entry TTL"""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value, or None if absent or expired"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                # Kept (until LRU eviction) for get_stale()
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def get_stale(self, key):
+        """Return the cached value even if it has expired, or None if absent"""
+        with self._lock:
+            item = self._data.get(key)
+            return None if item is None else item[0]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures; open ->
+    half-open after `reset_timeout` seconds, letting one probe call through;
+    the probe's result closes the circuit or opens it again.
+    failure_threshold=0 disables the breaker.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+        self.counters = {'rejected': 0, 'opened': 0}
+        ROBLOX_CIRCUIT_STATE.set(0)
+
+    def _transition(self, state):
+        self.state = state
+        ROBLOX_CIRCUIT_STATE.set(self.STATE_VALUES[state])
+        ROBLOX_CIRCUIT_TRANSITIONS.inc(state)
+        if state == self.OPEN:
+            self.opened_at = time.monotonic()
+            self.counters['opened'] += 1
+            print(f"⚡ Roblox API circuit open after {self.failures} failures, "
+                  f"retrying in {self.reset_timeout}s")
+        elif state == self.CLOSED:
+            print("✅ Roblox API circuit closed")
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go out now"""
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._transition(self.HALF_OPEN)
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self.counters['rejected'] += 1
+        ROBLOX_CIRCUIT_REJECTED.inc()
+        raise CircuitOpenError('Roblox API circuit is open')
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self.state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def release(self):
+        """A call ended without an outcome (e.g. cancelled): free the probe slot, count nothing"""
+        with self._lock:
+            self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or (
+                    self.state == self.CLOSED and self.failure_threshold
+                    and self.failures >= self.failure_threshold):
+                self._transition(self.OPEN)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters, state=self.state, consecutive_failures=self.failures)
+            if self.state != self.CLOSED:
+                stats['retry_in'] = round(max(0.0, self.opened_at + self.reset_timeout - time.monotonic()), 1)
+        return stats
+
+
+class CoalescingBatcher:
+    """Singleflight plus micro-batching for one kind of lookup.
+
+    submit(key) returns a concurrent.futures.Future. A key already waiting or
+    in flight gets the existing future. Distinct keys arriving within
+    `window` seconds of the first are sent together as one fetch(keys) call
+    returning {key: value}; at most max_batch keys per call, with up to
+    `concurrency` calls in flight. A batch gets the latest budget deadline of
+    its callers (none if any caller has none).
+    """
+
+    def __init__(self, fetch, window=0.005, max_batch=BULK_LOOKUP_MAX, concurrency=4):
+        self.fetch = fetch
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = {}    # key -> Future, not sent yet
+        self._in_flight = {}  # key -> Future, sent
+        self._deadlines = {}  # key -> budget deadline of its callers, not sent yet
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(concurrency)
+        self._thread = None
+        self.counters = {'batches': 0, 'keys': 0, 'coalesced': 0}
+
+    def submit(self, key):
+        deadline = _deadline.get()
+        with self._cond:
+            future = self._pending.get(key)
+            if future is not None:
+                known = self._deadlines[key]
+                self._deadlines[key] = None if known is None or deadline is None else max(known, deadline)
+            else:
+                future = self._in_flight.get(key)
+            if future is not None:
+                self.counters['coalesced'] += 1
+                return future
+            future = self._pending[key] = Future()
+            self._deadlines[key] = deadline
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+            return future
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                full = len(self._pending) >= self.max_batch
+            if not full:
+                # Give concurrent callers a moment to join this batch
+                time.sleep(self.window)
+            with self._cond:
+                batch = dict(itertools.islice(self._pending.items(), self.max_batch))
+                deadlines = [self._deadlines.pop(key) for key in batch]
+                for key in batch:
+                    del self._pending[key]
+                self._in_flight.update(batch)
+                self.counters['batches'] += 1
+                self.counters['keys'] += len(batch)
+            deadline = None if None in deadlines else max(deadlines)
+            self._executor.submit(self._send, batch, deadline)
+
+    def _send(self, batch, deadline=None):
+        token = _deadline.set(deadline)
+        try:
+            results = self.fetch(list(batch))
+        except Exception as e:
+            results, error = None, e
+        finally:
+            _deadline.reset(token)
+        with self._cond:
+            for key in batch:
+                del self._in_flight[key]
+        for key, future in batch.items():
+            if results is None:
+                future.set_exception(error)
+            else:
+                future.set_result(results.get(key))
+
+
+class RobloxClient:
+    """Cached client for the Roblox users API"""
+
+    def __init__(self, base_url='https://api.roblox.com', timeout=10, ttl=3600,
+                 negative_ttl=300, maxsize=10000, pool_size=16, users_url=None, batch_window=0,
+                 failure_threshold=5, reset_timeout=30):
+        self.base_url = base_url.rstrip('/')
+        # Bulk lookups live on users.roblox.com; batch_window=0 sends one request per lookup
+        self.users_url = (users_url or base_url).rstrip('/')
+        self.timeout = timeout
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._names = TTLCache(maxsize)  # user_id -> username
+        self._ids = TTLCache(maxsize)    # lowercase username -> (user_id, username)
+        self.pool_size = pool_size
+        self._aio_sessions = {}  # event loop -> aiohttp session, created on its first async call
+        self._counter_lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'negative_hits': 0, 'stale_hits': 0, 'errors': 0}
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        if batch_window:
+            self._id_batcher = CoalescingBatcher(self._fetch_user_ids, batch_window)
+            self._name_batcher = CoalescingBatcher(self._fetch_usernames, batch_window)
+        else:
+            self._id_batcher = self._name_batcher = None
+
+    def _count(self, name):
+        with self._counter_lock:
+            self.counters[name] += 1
+
+    def _remember(self, user_id, username):
+        self._names.set(user_id, username, self.ttl)
+        self._ids.set(username.lower(), (user_id, username), self.ttl)
+
+    # === CIRCUIT BREAKER / BUDGET ===
+    def _call_timeout(self):
+        """Timeout for the next upstream call: the client's, cut to the caller's budget"""
+        remaining = remaining_budget()
+        if remaining is None:
+            return self.timeout
+        if remaining <= 0:
+            raise DeadlineExceeded('No time left for a Roblox call')
+        return min(self.timeout, remaining)
+
+    def _wait_timeout(self):
+        """How long to wait on a batched lookup"""
+        remaining = remaining_budget()
+        if remaining is None:
+            return self.timeout * 2
+        if remaining <= 0:
+            raise DeadlineExceeded('No time left for a Roblox call')
+        return min(self.timeout * 2, remaining)
+
+    def _call_answered(self, endpoint, status):
+        """Feed an upstream status to the breaker; True if it counts as a Roblox failure"""
+        if status >= 500 or status == 429:
+            ROBLOX_ERRORS.inc(endpoint)
+            self.breaker.failure()
+            return True
+        self.breaker.success()
+        return False
+
+    # === UPSTREAM CALLS ===
+    def _get(self, endpoint, url, **kwargs):
+        """session.get() with latency and error metrics"""
+        timeout = self._call_timeout()
+        self.breaker.before_call()
+        started = time.perf_counter()
+        try:
+            response = self.session.get(url, timeout=timeout, **kwargs)
+        except Exception:
+            ROBLOX_ERRORS.inc(endpoint)
+            self.breaker.failure()
+            raise
+        except BaseException:
+            # Cancelled or interrupted: a half-open probe must not stay taken
+            self.breaker.release()
+            raise
+        finally:
+            ROBLOX_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint)
+        self._call_answered(endpoint, response.status_code)
+        return response
+
+    def _post(self, endpoint, url, **kwargs):
+        """session.post() with latency and error metrics; raises unless 200"""
+        timeout = self._call_timeout()
+        self.breaker.before_call()
+        started = time.perf_counter()
+        try:
+            response = self.session.post(url, timeout=timeout, **kwargs)
+        except Exception:
+            ROBLOX_ERRORS.inc(endpoint)
+            self.breaker.failure()
+            raise
+        except BaseException:
+            # Cancelled or interrupted: a half-open probe must not stay taken
+            self.breaker.release()
+            raise
+        finally:
+            ROBLOX_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint)
+        if not self._call_answered(endpoint, response.status_code) and response.status_code != 200:
+            ROBLOX_ERRORS.inc(endpoint)
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code} from {endpoint}")
+        return response.json()
+
+    def _fetch_user_ids(self, keys):
+        """Bulk users-by-name for lowercase usernames; {key: (user_id, username)}"""
+        data = self._post('usernames-bulk', f"{self.users_url}/v1/usernames/users",
+                          json={'usernames': keys, 'excludeBannedUsers': False})
+        results = {}
+        for user in data.get('data', []):
+            if user.get('id') and user.get('name'):
+                self._remember(user['id'], user['name'])
+                results[user.get('requestedUsername', user['name']).lower()] = (user['id'], user['name'])
+        for key in keys:
+            if key not in results:
+                self._ids.set(key, MISSING, self.negative_ttl)
+                results[key] = (None, None)
+        return results
+
+    def _fetch_usernames(self, user_ids):
+        """Bulk users-by-id; {user_id: username or None}"""
+        data = self._post('users-bulk', f"{self.users_url}/v1/users",
+                          json={'userIds': user_ids, 'excludeBannedUsers': False})
+        results = {}
+        for user in data.get('data', []):
+            if user.get('id') and user.get('name'):
+                self._remember(user['id'], user['name'])
+                results[user['id']] = user['name']
+        for user_id in user_ids:
+            if user_id not in results:
+                self._names.set(user_id, MISSING, self.negative_ttl)
+                results[user_id] = None
+        return results
+
+    async def _get_async(self, endpoint, url, **kwargs):
+        """_get() over aiohttp; returns (status, parsed JSON body or None)"""
+        timeout = self._call_timeout()
+        session = self._aio_session()
+        self.breaker.before_call()
+        started = time.perf_counter()
+        try:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout),
+                                   **kwargs) as response:
+                data = await response.json(content_type=None) if response.status == 200 else None
+                status = response.status
+        except Exception:
+            ROBLOX_ERRORS.inc(endpoint)
+            self.breaker.failure()
+            raise
+        except BaseException:
+            # Cancelled or interrupted: a half-open probe must not stay taken
+            self.breaker.release()
+            raise
+        finally:
+            ROBLOX_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint)
+        self._call_answered(endpoint, status)
+        return status, data
+
+    async def _batched_async(self, batcher, key):
+        # shield: the batcher's future is shared with other callers, a timeout here must not cancel it
+        return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(batcher.submit(key))),
+                                      self._wait_timeout())
+
+    # === LOOKUPS ===
+    def _failed(self, error):
+        self._count('errors')
+        if not isinstance(error, CircuitOpenError):
+            print(f"Roblox API error: {error or type(error).__name__}")
+
+    def _user_id_fallback(self, key, error):
+        """Answer a failed get_user_id() from the cache, expired entries included"""
+        self._failed(error)
+        cached = self._ids.get_stale(key)
+        if cached is None or cached is MISSING:
+            return None, None
+        self._count('stale_hits')
+        return cached
+
+    def _username_fallback(self, user_id, error):
+        """Answer a failed get_username() from the cache, expired entries included"""
+        self._failed(error)
+        cached = self._names.get_stale(user_id)
+        if cached is None or cached is MISSING:
+            return None
+        self._count('stale_hits')
+        return cached
+
+    def _cached_user_id(self, key):
+        """Cache lookup for get_user_id(); returns the result, or None on a miss"""
+        cached = self._ids.get(key)
+        if cached is MISSING:
+            self._count('negative_hits')
+            return None, None
+        if cached is not None:
+            self._count('hits')
+            return cached
+        self._count('misses')
+        return None
+
+    def _user_id_result(self, key, status, data):
+        if status == 200:
+            user_id, verified_username = data.get('Id'), data.get('Username')
+            if user_id and verified_username:
+                self._remember(user_id, verified_username)
+                return user_id, verified_username
+        if status in (200, 400, 404):
+            self._ids.set(key, MISSING, self.negative_ttl)
+        return None, None
+
+    def _cached_username(self, user_id):
+        """Cache lookup for get_username(); returns (hit, username)"""
+        cached = self._names.get(user_id)
+        if cached is MISSING:
+            self._count('negative_hits')
+            return True, None
+        if cached is not None:
+            self._count('hits')
+            return True, cached
+        self._count('misses')
+        return False, None
+
+    def _username_result(self, user_id, status, data):
+        if status == 200:
+            username = data.get('Username')
+            if username:
+                self._remember(user_id, username)
+                return username
+        if status in (200, 400, 404):
+            self._names.set(user_id, MISSING, self.negative_ttl)
+        return None
+
+    def get_user_id(self, username):
+        """Return (user_id, username) for a Roblox username, or (None, None)"""
+        key = username.lower()
+        cached = self._cached_user_id(key)
+        if cached is not None:
+            return cached
+
+        try:
+            if self._id_batcher is not None:
+                return self._id_batcher.submit(key).result(self._wait_timeout())
+            response = self._get('get-by-username', f"{self.base_url}/users/get-by-username",
+                                 params={'username': username})
+            return self._user_id_result(key, response.status_code,
+                                        response.json() if response.status_code == 200 else None)
+        except Exception as e:
+            return self._user_id_fallback(key, e)
+
+    async def get_user_id_async(self, username):
+        key = username.lower()
+        cached = self._cached_user_id(key)
+        if cached is not None:
+            return cached
+
+        try:
+            if self._id_batcher is not None:
+                return await self._batched_async(self._id_batcher, key)
+            status, data = await self._get_async('get-by-username', f"{self.base_url}/users/get-by-username",
+                                                 params={'username': username})
+            return self._user_id_result(key, status, data)
+        except Exception as e:
+            return self._user_id_fallback(key, e)
+
+    def get_username(self, user_id):
+        """Return the Roblox username for a user ID, or None"""
+        hit, username = self._cached_username(user_id)
+        if hit:
+            return username
+
+        try:
+            if self._name_batcher is not None:
+                return self._name_batcher.submit(int(user_id)).result(self._wait_timeout())
+            response = self._get('users', f"{self.base_url}/users/{user_id}")
+            return self._username_result(user_id, response.status_code,
+                                         response.json() if response.status_code == 200 else None)
+        except Exception as e:
+            return self._username_fallback(user_id, e)
+
+    def get_usernames(self, user_ids):
+        """Usernames for many IDs: {user_id: username or None}; raises if Roblox can't be reached"""
+        results = {}
+        missing = []
+        for user_id in user_ids:
+            hit, username = self._cached_username(user_id)
+            if hit:
+                results[user_id] = username
+            else:
+                missing.append(user_id)
+        try:
+            if self._name_batcher is not None:
+                futures = [(user_id, self._name_batcher.submit(user_id)) for user_id in missing]
+                for user_id, future in futures:
+                    results[user_id] = future.result(self._wait_timeout())
+            else:
+                for i in range(0, len(missing), BULK_LOOKUP_MAX):
+                    results.update(self._fetch_usernames(missing[i:i + BULK_LOOKUP_MAX]))
+        except Exception:
+            self._count('errors')
+            raise
+        return results
+
+    async def get_username_async(self, user_id):
+        hit, username = self._cached_username(user_id)
+        if hit:
+            return username
+
+        try:
+            if self._name_batcher is not None:
+                return await self._batched_async(self._name_batcher, int(user_id))
+            status, data = await self._get_async('users', f"{self.base_url}/users/{user_id}")
+            return self._username_result(user_id, status, data)
+        except Exception as e:
+            return self._username_fallback(user_id, e)
+
+    def _aio_session(self):
+        """The running loop's aiohttp session (a session only works on the loop that made it)"""
+        loop = asyncio.get_running_loop()
+        session = self._aio_sessions.get(loop)
+        if session is None:
+            for other in [other for other in self._aio_sessions if other.is_closed()]:
+                # Its connections went with its loop; nothing is left to close
+                self._aio_sessions.pop(other).detach()
+            session = self._aio_sessions[loop] = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit=self.pool_size))
+        return session
+
+    async def aclose(self):
+        """Close the aiohttp sessions, each on its own loop (call at shutdown)"""
+        current = asyncio.get_running_loop()
+        for loop, session in list(self._aio_sessions.items()):
+            del self._aio_sessions[loop]
+            if loop is current:
+                await session.close()
+            elif loop.is_running():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(session.close(), loop))
+            else:
+                session.detach()
+
+    def stats(self):
+        """Cache counters and sizes plus the circuit breaker state, for /status"""
+        with self._counter_lock:
+            stats = dict(self.counters)
+        stats['circuit'] = self.breaker.stats()
+        stats['cached_names'] = len(self._names)
+        stats['cached_ids'] = len(self._ids)
+        for name, batcher in (('by_name', self._id_batcher), ('by_id', self._name_batcher)):
+            if batcher is not None:
+                stats[f'batched_{name}'] = dict(batcher.counters)
+        return stats
@@ -0,0 +1,114 @@
+"""Prefix search over whitelist fields for the admin panel.
+
+Each indexed field keeps a sorted list of (lowercased value, user_id), so a
+prefix query is two bisections plus a slice instead of a scan over every
+user. The index follows the store through a change listener.
+"""
+import threading
+from bisect import bisect_left, insort
+
+from store import unpack_record
+
+SEARCH_FIELDS = ('username', 'discord_user', 'added_by')
+
+# Sorts after any character that can appear in a value
+_PREFIX_END = '\U0010ffff'
+
+
+class SearchIndex:
+    """Sorted per-field indexes supporting paginated prefix search"""
+
+    def __init__(self, fields=SEARCH_FIELDS):
+        self.fields = fields
+        self._sorted = {field: [] for field in fields}
+        self._keys = {}  # user_id -> tuple of indexed (lowercased) values
+        self._pending = []  # changes not merged into the sorted columns yet
+        self._lock = threading.Lock()
+
+    def attach(self, store):
+        """Build from the store's current state and follow its changes"""
+        store.add_listener(self.apply_changes, sync=self.rebuild)
+
+    def _keys_for(self, record):
+        user_data = unpack_record(record)
+        return tuple(str(user_data.get(field, '')).lower() for field in self.fields)
+
+    def rebuild(self, snapshot):
+        keys = {user_id: self._keys_for(record) for user_id, record in snapshot.records()}
+        columns = {field: sorted((values[i], user_id) for user_id, values in keys.items())
+                   for i, field in enumerate(self.fields)}
+        with self._lock:
+            self._keys = keys
+            self._sorted = columns
+            self._pending = []
+
+    def apply_changes(self, changes):
+        with self._lock:
+            if len(changes) <= 64 and not self._pending:
+                self._apply_each(changes)
+                return
+            # Bulk writes (imports) are merged in later as one re-sort per
+            # column instead of paying an O(n) insort per row
+            self._pending.extend(changes)
+            if len(self._pending) > max(4096, len(self._keys) // 8):
+                self._flush()
+
+    def _flush(self):
+        if len(self._pending) <= 64:
+            self._apply_each(self._pending)
+        else:
+            self._apply_bulk(self._pending)
+        self._pending = []
+
+    def _apply_each(self, changes):
+        for _seq, op, user_id, record in changes:
+            old = self._keys.pop(user_id, None)
+            if old is not None:
+                for field, value in zip(self.fields, old):
+                    column = self._sorted[field]
+                    i = bisect_left(column, (value, user_id))
+                    if i < len(column) and column[i] == (value, user_id):
+                        del column[i]
+            if op == 'put':
+                values = self._keys_for(record)
+                self._keys[user_id] = values
+                for field, value in zip(self.fields, values):
+                    insort(self._sorted[field], (value, user_id))
+
+    def _apply_bulk(self, changes):
+        touched = set()
+        for _seq, op, user_id, record in changes:
+            touched.add(user_id)
+            if op == 'put':
+                self._keys[user_id] = self._keys_for(record)
+            else:
+                self._keys.pop(user_id, None)
+        for i, field in enumerate(self.fields):
+            column = [entry for entry in self._sorted[field] if entry[1] not in touched]
+            # Two sorted runs, which timsort merges in linear time
+            column.extend(sorted((self._keys[user_id][i], user_id) for user_id in touched if user_id in self._keys))
+            column.sort()
+            self._sorted[field] = column
+
+    def search(self, query, field='username', offset=0, limit=25):
+        """Return (total, user_ids) for values of `field` starting with query.
+
+        An empty query matches everyone, ordered by that field.
+        """
+        if field not in self._sorted:
+            raise ValueError(f"Unknown search field: {field}")
+        prefix = query.lower()
+        with self._lock:
+            if self._pending:
+                self._flush()
+            column = self._sorted[field]
+            lo = bisect_left(column, (prefix,))
+            hi = bisect_left(column, (prefix + _PREFIX_END,))
+            page = column[lo + offset:min(hi, lo + offset + limit)]
+        return hi - lo, [user_id for _value, user_id in page]
+
+    def __len__(self):
+        with self._lock:
+            if self._pending:
+                self._flush()
+            return len(self._keys)
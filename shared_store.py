@@ -0,0 +1,212 @@
+"""Whitelist storage shared by several server processes through SQLite.
+
+SharedWhitelistStore keeps the same in-memory snapshot, index and change feed
+as WhitelistStore, so reads stay lock-free and never touch the database. The
+database (in WAL mode, so readers and the single writer don't block each
+other) is the source of truth that keeps the processes in step:
+
+- a write takes SQLite's write lock (BEGIN IMMEDIATE), first pulls any
+  changes other processes committed, then appends its own to the `changes`
+  table and updates `users` in the same transaction;
+- a follower thread notices other processes' commits via PRAGMA data_version
+  every poll_interval and applies the new `changes` rows locally, so a write
+  in one process is visible to reads in all of them within that interval.
+
+Old `changes` rows are pruned; a process that falls further behind than the
+retained history reloads the `users` table instead.
+"""
+import asyncio
+import gc
+import os
+import sqlite3
+import threading
+import time
+
+from membership import MembershipIndex
+from store import EXPIRES_AT, FIELDS, StoreSnapshot, WhitelistStore
+
+_COLUMNS = ', '.join(FIELDS)
+_PLACEHOLDERS = ', '.join('?' for _ in FIELDS)
+# expires_at is a Unix timestamp; everything else is text
+_COLUMN_TYPES = {'expires_at': 'INTEGER'}
+_COLUMN_DEFS = ', '.join(f"{field} {_COLUMN_TYPES.get(field, 'TEXT')}" for field in FIELDS)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, {_COLUMN_DEFS});
+CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY, op TEXT NOT NULL, id INTEGER NOT NULL,
+                                    {_COLUMN_DEFS});
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('seq', 0);
+"""
+
+
+def _row(record):
+    """Column values for an internal tuple (short or missing records padded with NULLs)"""
+    record = record or ()
+    return tuple(record) + (None,) * (len(FIELDS) - len(record))
+
+
+def _record(row):
+    """Internal tuple for a row's column values (a NULL expires_at left off, as pack_record does)"""
+    row = tuple(row)
+    return row if row[EXPIRES_AT] is not None else row[:EXPIRES_AT]
+
+
+class SharedWhitelistStore(WhitelistStore):
+    """WhitelistStore backed by a SQLite database that other processes also use"""
+
+    def __init__(self, path, poll_interval=0.05, synchronous='FULL', retain_changes=100000,
+                 compact_every=10000, change_feed_size=10000, lock=None):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retain_changes = retain_changes
+        self.compact_every = compact_every
+        self._init_state(change_feed_size, lock)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # One connection, only ever used under self.lock
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute(f'PRAGMA synchronous={synchronous}')
+        self.db.executescript(SCHEMA)
+        self._migrate()
+        self._data_version = None
+        self._closed = threading.Event()
+        self._recover()
+        self._follower = threading.Thread(target=self._follow, daemon=True)
+        self._follower.start()
+
+    def _migrate(self):
+        """Add columns for fields introduced after the database was created"""
+        for table in ('users', 'changes'):
+            existing = {row[1] for row in self.db.execute(f'PRAGMA table_info({table})')}
+            for field in FIELDS:
+                if field not in existing:
+                    self.db.execute(f"ALTER TABLE {table} ADD COLUMN {field} {_COLUMN_TYPES.get(field, 'TEXT')}")
+
+    # === RECOVERY ===
+    def _recover(self):
+        started = time.perf_counter()
+        self.db.execute('BEGIN')
+        try:
+            self._load()
+        finally:
+            self.db.execute('COMMIT')
+        self.recovery_time = time.perf_counter() - started
+
+    def _load(self):
+        """Replace the in-memory state with the full users table (inside a transaction)"""
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            seq = self.db.execute("SELECT value FROM meta WHERE key = 'seq'").fetchone()[0]
+            records = {row[0]: _record(row[1:]) for row in self.db.execute(f'SELECT id, {_COLUMNS} FROM users')}
+        finally:
+            if gc_enabled:
+                gc.enable()
+        self._feed_floor = seq
+        self.changes.clear()
+        self.index = MembershipIndex(records)
+        self._snapshot = StoreSnapshot(seq, records)
+        self.seq = seq
+        self._data_version = self.db.execute('PRAGMA data_version').fetchone()[0]
+
+    # === FOLLOWING OTHER PROCESSES ===
+    def _pull(self):
+        """Apply changes committed by other processes (under lock, inside a transaction)"""
+        seq = self.db.execute("SELECT value FROM meta WHERE key = 'seq'").fetchone()[0]
+        if seq == self.seq:
+            return
+        rows = self.db.execute(f'SELECT seq, op, id, {_COLUMNS} FROM changes WHERE seq > ? ORDER BY seq',
+                               (self.seq,)).fetchall()
+        if not rows or rows[0][0] != self.seq + 1:
+            # The changes we missed were pruned; start over from the table
+            self._load()
+            for _listener, sync in self._listeners:
+                if sync is not None:
+                    sync(self._snapshot)
+            return
+        self._publish([(row[0], row[1], row[2], _record(row[3:]) if row[1] == 'put' else None) for row in rows])
+
+    def _follow(self):
+        while not self._closed.wait(self.poll_interval):
+            try:
+                with self.lock:
+                    if self._closed.is_set():
+                        return
+                    version = self.db.execute('PRAGMA data_version').fetchone()[0]
+                    if version == self._data_version:
+                        continue
+                    self._data_version = version
+                    self.db.execute('BEGIN')
+                    try:
+                        self._pull()
+                    finally:
+                        self.db.execute('COMMIT')
+            except Exception as e:
+                print(f"❌ Shared store follower error: {e}")
+
+    def sync(self):
+        """Catch up with other processes now instead of waiting for the follower"""
+        with self.lock:
+            self.db.execute('BEGIN')
+            try:
+                self._pull()
+            finally:
+                self.db.execute('COMMIT')
+
+    # === WRITES ===
+    def apply(self, ops):
+        """Apply ops as one SQLite transaction, after catching up with other processes"""
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                self._pull()
+                changes, results = self._sequence(ops)
+                if changes:
+                    self._write(changes)
+                self.db.execute('COMMIT')
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+            if changes:
+                self._publish(changes)
+                self._since_snapshot += len(changes)
+                if self._since_snapshot >= self.compact_every:
+                    self._prune()
+        return results
+
+    async def apply_async(self, ops):
+        # SQLite commits block, so they run on a worker thread
+        return await asyncio.to_thread(self.apply, ops)
+
+    def apply_replicated(self, entries):
+        raise NotImplementedError("Replication followers use the WAL backend")
+
+    def reset(self, seq, records):
+        raise NotImplementedError("Replication followers use the WAL backend")
+
+    def _write(self, changes):
+        self.db.executemany(f'INSERT INTO changes (seq, op, id, {_COLUMNS}) VALUES (?, ?, ?, {_PLACEHOLDERS})',
+                            [(seq, op, user_id) + _row(record) for seq, op, user_id, record in changes])
+        final = {user_id: record for _seq, _op, user_id, record in changes}
+        self.db.executemany(f'INSERT OR REPLACE INTO users (id, {_COLUMNS}) VALUES (?, {_PLACEHOLDERS})',
+                            [(user_id,) + _row(record) for user_id, record in final.items() if record is not None])
+        self.db.executemany('DELETE FROM users WHERE id = ?',
+                            [(user_id,) for user_id, record in final.items() if record is None])
+        self.db.execute("UPDATE meta SET value = ? WHERE key = 'seq'", (changes[-1][0],))
+
+    # === COMPACTION ===
+    def compact(self):
+        """Prune change history older than retain_changes sequence numbers"""
+        with self.lock:
+            self._prune()
+
+    def _prune(self):
+        self.db.execute('DELETE FROM changes WHERE seq <= ?', (self.seq - self.retain_changes,))
+        self._since_snapshot = 0
+        self._last_snapshot = time.time()
+
+    def close(self):
+        self._closed.set()
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,791 @@
+"""Durable whitelist storage.
+
+Every mutation is appended to a write-ahead log (one JSON line per change)
+and fsynced with group commit, so concurrent writers share one fsync. The log
+is periodically compacted into a pickle snapshot; startup loads the latest
+snapshot and replays only the log tail written after it.
+
+Point reads (membership, get) are a single lookup in the snapshot's record
+map. A compact MembershipIndex (sorted ID array with a Bloom filter front)
+is kept next to it for paging through users in ID order; it is an extra
+~10 bytes per user on top of the map, not a replacement for it.
+
+Every mutation gets a monotonically increasing sequence number, and the most
+recent ones are kept in a bounded ring so pollers can fetch just the delta
+since the last sequence number they saw.
+
+Readers never take the lock: writers publish a new immutable StoreSnapshot
+per transaction and readers just grab the current reference.
+
+Records may carry an expires_at (Unix seconds). Point reads (membership,
+get) treat a record past its expiry as absent straight away; listings show
+it until the ExpiryScheduler (expiry.py) removes it with an 'expire' op,
+which is logged as an ordinary delete.
+"""
+import asyncio
+import gc
+import glob
+import itertools
+import json
+import math
+import os
+import pickle
+import threading
+import time
+from collections import deque
+
+from membership import MembershipIndex
+
+# Records are kept as plain tuples in this field order; dicts are only built
+# when a caller asks for one. Tuples load from a snapshot far faster than
+# dicts and take a fraction of the memory.
+FIELDS = ('username', 'discord_user', 'added_at', 'added_by', 'expires_at')
+# Position of expires_at; permanent records leave it off (and records written
+# before it existed never had it), so they stay 4-tuples
+EXPIRES_AT = FIELDS.index('expires_at')
+USERNAME = FIELDS.index('username')
+
+SNAPSHOT_NAME = 'snapshot.pkl'
+
+
+def pack_record(data):
+    """Convert a user dict into the internal tuple form"""
+    record = tuple(data.get(field) for field in FIELDS)
+    return record if record[EXPIRES_AT] is not None else record[:EXPIRES_AT]
+
+
+def record_expires_at(record):
+    """expires_at of an internal tuple, or None if it never expires"""
+    return record[EXPIRES_AT] if len(record) > EXPIRES_AT else None
+
+
+def is_live(record, now=None):
+    """True unless the record is absent or past its expiry"""
+    if record is None:
+        return False
+    if len(record) <= EXPIRES_AT or record[EXPIRES_AT] is None:
+        return True
+    return record[EXPIRES_AT] > (time.time() if now is None else now)
+
+
+def unpack_record(record):
+    """Convert an internal tuple back into a user dict"""
+    return {field: value for field, value in zip(FIELDS, record) if value is not None}
+
+
+class WriteAheadLog:
+    """Append-only change log split into segments, with group-commit fsync"""
+
+    def __init__(self, directory, fsync=True):
+        self.directory = directory
+        self.fsync = fsync
+        self._cond = threading.Condition()
+        self._file = None
+        self._written = 0
+        self._synced = 0
+        self._syncing = False
+        self._async_waiters = []
+        self._syncer = None
+        # First failed write or fsync. What reached the disk is unknown after
+        # that (a retried fsync can report success for lost pages), so the
+        # log refuses further writes until the process restarts and recovers.
+        self._error = None
+
+    def segments(self):
+        """Return segment paths ordered by the first sequence number they hold"""
+        return sorted(glob.glob(os.path.join(self.directory, 'wal-*.log')))
+
+    @staticmethod
+    def _first_seq(path):
+        return int(os.path.basename(path)[4:-4])
+
+    def replay(self, after_seq):
+        """Yield logged entries with a sequence number greater than after_seq"""
+        for path in self.segments():
+            with open(path, 'rb') as f:
+                for line in f:
+                    entry = self._parse(line)
+                    if entry is None:
+                        # Torn write from a crash mid-append; nothing after
+                        # it in this segment was acknowledged.
+                        break
+                    if entry['seq'] > after_seq:
+                        yield entry
+
+    @staticmethod
+    def _parse(line):
+        """Entry for one complete log line, or None if the line is torn"""
+        if not line.endswith(b'\n'):
+            return None
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    def repair_tail(self):
+        """Cut a torn write off the end of the newest segment.
+
+        Appends after recovery go to that segment when the torn entry was its
+        first; left in place, the fragment would swallow the next entry and
+        replay would stop there, losing every acknowledged write after it.
+        """
+        paths = self.segments()
+        if not paths:
+            return
+        valid = 0
+        with open(paths[-1], 'rb') as f:
+            for line in f:
+                if self._parse(line) is None:
+                    break
+                valid += len(line)
+            size = f.seek(0, os.SEEK_END)
+        if valid < size:
+            with open(paths[-1], 'r+b') as f:
+                f.truncate(valid)
+                if self.fsync:
+                    os.fsync(f.fileno())
+            print(f"🩹 Dropped a torn {size - valid}-byte write from {os.path.basename(paths[-1])}")
+
+    def open_segment(self, first_seq):
+        """Close the current segment (if any) and start a new one"""
+        with self._cond:
+            while self._syncing:
+                self._cond.wait()
+            if self._file is not None:
+                self._file.flush()
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+                self._file.close()
+                self._synced = self._written
+            path = os.path.join(self.directory, f'wal-{first_seq:020d}.log')
+            self._file = open(path, 'ab')
+
+    def restart(self, first_seq):
+        """Discard every segment and start an empty log at first_seq"""
+        with self._cond:
+            while self._syncing:
+                self._cond.wait()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._synced = self._written
+            for path in self.segments():
+                os.remove(path)
+        self.open_segment(first_seq)
+
+    def drop_segments(self, upto_seq):
+        """Delete segments whose entries are all covered by a snapshot at upto_seq"""
+        paths = self.segments()
+        for path, following in zip(paths, paths[1:]):
+            if self._first_seq(following) - 1 <= upto_seq:
+                os.remove(path)
+
+    def write(self, entries):
+        """Buffer entries and return a ticket to pass to wait_durable()"""
+        data = b''.join(json.dumps(entry, separators=(',', ':')).encode() + b'\n' for entry in entries)
+        with self._cond:
+            self._check()
+            try:
+                self._file.write(data)
+            except Exception as e:
+                self._error = e
+                raise
+            self._written += 1
+            return self._written
+
+    def _check(self):
+        if self._error is not None:
+            raise OSError(f"Whitelist log unavailable after a failed write: {self._error}")
+
+    def wait_durable(self, ticket):
+        """Block until the write identified by ticket has reached disk.
+
+        The first waiter to find no fsync in progress becomes the leader and
+        syncs everything written so far; writers arriving meanwhile pile up in
+        the buffer and are covered by the next leader's single fsync.
+        """
+        with self._cond:
+            while self._synced < ticket:
+                self._check()
+                if self._syncing:
+                    self._cond.wait()
+                    continue
+                self._syncing = True
+                target = self._written
+                try:
+                    self._file.flush()
+                    fd = self._file.fileno()
+                    self._cond.release()
+                    try:
+                        if self.fsync:
+                            os.fsync(fd)
+                    finally:
+                        self._cond.acquire()
+                    self._synced = max(self._synced, target)
+                except Exception as e:
+                    self._error = e
+                    raise
+                finally:
+                    self._syncing = False
+                    self._cond.notify_all()
+
+    def wait_durable_async(self, ticket):
+        """Future that resolves once ticket has reached disk, for event-loop callers.
+
+        Waiting coroutines are handed to one syncer thread that covers all of
+        them with a single wait_durable(), so the loop never blocks on fsync.
+        """
+        future = asyncio.get_running_loop().create_future()
+        with self._cond:
+            if self._synced >= ticket:
+                future.set_result(None)
+                return future
+            self._async_waiters.append((ticket, future))
+            if self._syncer is None:
+                self._syncer = threading.Thread(target=self._sync_async_waiters, daemon=True)
+                self._syncer.start()
+            self._cond.notify_all()
+        return future
+
+    def _sync_async_waiters(self):
+        while True:
+            with self._cond:
+                while not self._async_waiters:
+                    self._cond.wait()
+                waiters, self._async_waiters = self._async_waiters, []
+            error = None
+            try:
+                self.wait_durable(max(ticket for ticket, _future in waiters))
+            except Exception as e:
+                error = e
+            for _ticket, future in waiters:
+                future.get_loop().call_soon_threadsafe(_resolve, future, error)
+
+    def close(self):
+        with self._cond:
+            while self._syncing:
+                self._cond.wait()
+            if self._file is not None:
+                self._file.flush()
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+
+
+def _resolve(future, error):
+    if future.done():
+        return
+    if error is None:
+        future.set_result(None)
+    else:
+        future.set_exception(error)
+
+
+class StoreSnapshot:
+    """Immutable view of the store at one sequence number.
+
+    Versions share one large base dict and each carry a small overlay of the
+    changes made since the base was last rebuilt (None marks a delete).
+    Neither dict is mutated once the snapshot is published, so readers can
+    use it without any locking. Publishing a write copies only the overlay;
+    the base is rebuilt once the overlay outgrows sqrt(n), which keeps the
+    amortised cost per write at O(sqrt(n)).
+    """
+
+    __slots__ = ('seq', 'count', '_base', '_overlay')
+
+    def __init__(self, seq, base, overlay=None, count=None):
+        self.seq = seq
+        self._base = base
+        self._overlay = overlay or {}
+        self.count = len(base) if count is None else count
+
+    def __len__(self):
+        return self.count
+
+    def record(self, user_id):
+        """Internal tuple for user_id, or None (expired records included)"""
+        overlay = self._overlay
+        if user_id in overlay:
+            return overlay[user_id]
+        return self._base.get(user_id)
+
+    def live_record(self, user_id, now=None):
+        """Internal tuple for user_id, or None if absent or expired"""
+        record = self.record(user_id)
+        return record if is_live(record, now) else None
+
+    def __contains__(self, user_id):
+        return self.live_record(user_id) is not None
+
+    def get(self, user_id):
+        record = self.live_record(user_id)
+        return unpack_record(record) if record is not None else None
+
+    def ids(self):
+        overlay = self._overlay
+        for user_id in self._base:
+            if user_id not in overlay:
+                yield user_id
+        for user_id, record in overlay.items():
+            if record is not None:
+                yield user_id
+
+    def records(self):
+        """Yield (user_id, internal tuple) pairs"""
+        overlay = self._overlay
+        for user_id, record in self._base.items():
+            if user_id not in overlay:
+                yield user_id, record
+        for user_id, record in overlay.items():
+            if record is not None:
+                yield user_id, record
+
+    def items(self):
+        """Yield (user_id, user dict) pairs, building each dict on demand"""
+        for user_id, record in self.records():
+            yield user_id, unpack_record(record)
+
+    def with_changes(self, seq, changes):
+        """New snapshot with {user_id: record or None} applied on top of this one"""
+        overlay = dict(self._overlay)
+        count = self.count
+        for user_id, record in changes.items():
+            count += (record is not None) - (self.record(user_id) is not None)
+            overlay[user_id] = record
+        base = self._base
+        if len(overlay) > max(256, math.isqrt(len(base))):
+            base = dict(base)
+            for user_id, record in overlay.items():
+                if record is None:
+                    base.pop(user_id, None)
+                else:
+                    base[user_id] = record
+            overlay = {}
+        return StoreSnapshot(seq, base, overlay, count)
+
+
+class WhitelistStore:
+    """Whitelist records keyed by Roblox user ID, persisted to a WAL + snapshots"""
+
+    def __init__(self, directory, compact_every=50000, snapshot_interval=300, fsync=True,
+                 change_feed_size=10000, lock=None):
+        self.directory = directory
+        self.compact_every = compact_every
+        self.snapshot_interval = snapshot_interval
+        self._init_state(change_feed_size, lock)
+        self._compacting = False
+        self._snapshot_file_lock = threading.Lock()
+        self._snapshot_file_seq = 0
+        os.makedirs(directory, exist_ok=True)
+        self.wal = WriteAheadLog(directory, fsync=fsync)
+        self._recover()
+
+    def _init_state(self, change_feed_size, lock):
+        # Serialises writers (and change-feed reads); readers use _snapshot
+        self.lock = lock or threading.Lock()
+        self._snapshot = StoreSnapshot(0, {})
+        self.index = None
+        self.seq = 0
+        # Recent (seq, op, user_id, record) changes; deltas can be served for
+        # any since >= _feed_floor
+        self.changes = deque(maxlen=change_feed_size)
+        self._feed_floor = 0
+        self._listeners = []  # (listener, sync) pairs
+        # Batches written to the log but not yet durable, in log order:
+        # (ticket, changes, snapshot with them applied). Published by
+        # _publish_logged() once the fsync covering them returns.
+        self._unpublished = deque()
+        self.recovery_time = 0.0
+        self._since_snapshot = 0
+        self._last_snapshot = time.time()
+
+    # === RECOVERY ===
+    def _recover(self):
+        started = time.perf_counter()
+        records = {}
+        path = os.path.join(self.directory, SNAPSHOT_NAME)
+        if os.path.exists(path):
+            # The snapshot is one big dict of tuples; the cyclic GC has
+            # nothing to find in it and only slows the load down.
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                with open(path, 'rb') as f:
+                    snapshot = pickle.load(f)
+            finally:
+                if gc_enabled:
+                    gc.enable()
+            records = snapshot['records']
+            self.seq = self._snapshot_file_seq = snapshot['seq']
+            if 'index' in snapshot:
+                self.index = MembershipIndex.from_state(snapshot['index'])
+        if self.index is None:
+            self.index = MembershipIndex(records)
+        self._feed_floor = self.seq
+
+        # Nothing is published yet, so replay can mutate the dict in place
+        self.wal.repair_tail()
+        replayed = 0
+        for entry in self.wal.replay(self.seq):
+            if entry['op'] == 'put':
+                records[entry['id']] = tuple(entry['rec'])
+                self.index.add(entry['id'])
+            else:
+                records.pop(entry['id'], None)
+                self.index.discard(entry['id'])
+            self.seq = entry['seq']
+            self._record_change(entry['seq'], entry['op'], entry['id'], entry.get('rec'))
+            replayed += 1
+        self._since_snapshot = replayed
+        self._snapshot = StoreSnapshot(self.seq, records)
+        self.wal.open_segment(self.seq + 1)
+        self.recovery_time = time.perf_counter() - started
+
+    def _record_change(self, seq, op, user_id, record):
+        if len(self.changes) == self.changes.maxlen:
+            self._feed_floor = self.changes[0][0]
+        self.changes.append((seq, op, user_id, tuple(record) if record is not None else None))
+
+    # === READS (lock-free) ===
+    def __len__(self):
+        return len(self._snapshot)
+
+    def __contains__(self, user_id):
+        # One dict lookup; checking the index first only adds a second one
+        return user_id in self._snapshot
+
+    def get(self, user_id):
+        """Return the user dict for user_id, or None if not whitelisted"""
+        return self._snapshot.get(user_id)
+
+    def whitelisted_among(self, user_ids):
+        """Return the subset of user_ids that are whitelisted, in input order.
+
+        All IDs are answered against the same published snapshot.
+        """
+        snapshot = self._snapshot
+        now = time.time()
+        return [user_id for user_id in user_ids if snapshot.live_record(user_id, now) is not None]
+
+    def snapshot(self):
+        """Current immutable snapshot; O(1), iterate it at leisure"""
+        return self._snapshot
+
+    def items_with_seq(self):
+        """Return (seq, [(user_id, user dict), ...]) from one consistent read"""
+        snapshot = self._snapshot
+        return snapshot.seq, list(snapshot.items())
+
+    def ids(self):
+        """Return a list of all whitelisted user IDs"""
+        return list(self._snapshot.ids())
+
+    def items(self):
+        """Return a list of (user_id, user dict) pairs"""
+        return list(self._snapshot.items())
+
+    def page(self, after, limit):
+        """Return (seq, users) for up to `limit` users with IDs above `after`"""
+        # The index's delta sets are rewritten by merges, so walking them in
+        # order needs the writer lock; the lookups themselves don't.
+        with self.lock:
+            snapshot = self._snapshot
+            user_ids = self.index.ids_after(after, limit)
+        return snapshot.seq, [(user_id, unpack_record(snapshot.record(user_id))) for user_id in user_ids]
+
+    def changes_since(self, since):
+        """Net changes after sequence number `since`.
+
+        Returns (seq, added, removed) where added is a list of (user_id, user
+        dict) and removed a list of user IDs; only the last change per user
+        counts. Returns None when `since` is older than the change ring (or
+        ahead of this store) and the caller has to resync in full.
+        """
+        with self.lock:
+            if since < self._feed_floor or since > self.seq:
+                return None
+            latest = {}
+            for seq, op, user_id, record in reversed(self.changes):
+                if seq <= since:
+                    break
+                latest.setdefault(user_id, (op, record))
+            seq = self.seq
+        added = [(user_id, unpack_record(record)) for user_id, (op, record) in latest.items() if op == 'put']
+        removed = [user_id for user_id, (op, record) in latest.items() if op == 'del']
+        return seq, added, removed
+
+    def log_after(self, after, limit):
+        """Raw log entries after sequence number `after`, for replicas.
+
+        Returns (seq, entries) with up to `limit` entries in the WAL entry
+        format, or None when `after` is outside the change ring and the
+        replica has to start over from a snapshot.
+        """
+        with self.lock:
+            if after < self._feed_floor or after > self.seq:
+                return None
+            # The ring holds consecutive sequence numbers starting at floor + 1
+            start = after - self._feed_floor
+            changes = list(itertools.islice(self.changes, start, start + limit))
+            seq = self.seq
+        return seq, [self._log_entry(change) for change in changes]
+
+    def add_listener(self, listener, sync=None):
+        """Call listener(changes) for every committed batch, in commit order.
+
+        `changes` is a list of (seq, op, user_id, record) with op 'put' or
+        'del' and record None for deletes. Listeners run under the writer
+        lock, so they must be quick and must not write to the store. If given,
+        sync(snapshot) runs first under the same lock so the listener starts
+        from exactly the state its first batch of changes applies to.
+        """
+        with self.lock:
+            if sync is not None:
+                sync(self._snapshot)
+            self._listeners.append((listener, sync))
+
+    # === WRITES ===
+    def put(self, user_id, data):
+        """Insert or replace a user; returns once the change is durable"""
+        return self.apply([('put', user_id, data)])[0]
+
+    def delete(self, user_id):
+        """Remove a user; returns the removed user dict, or None if absent"""
+        return self.apply([('delete', user_id)])[0]
+
+    def apply(self, ops):
+        """Apply ('put', id, data) / ('delete', id) ops as one durable log write.
+
+        ('expire', id, now) deletes the user only if their record has an
+        expires_at at or before `now`, so an expiry racing a renewal is a no-op.
+        ('rename', id, username, expected) sets the username only if it is
+        still `expected`, leaving the rest of the record as it is now, so a
+        late lookup can't undo a removal, renewal or rename.
+
+        The whole batch becomes visible to readers at once, as one new
+        snapshot. Returns one result per op: the stored dict for puts (or
+        None for a skipped rename), the removed dict (or None) for deletes.
+        """
+        with self.lock:
+            changes, results = self._sequence(ops)
+            if not changes:
+                return results
+            ticket, due = self._commit(changes)
+        self._finish(ticket, due)
+        return results
+
+    async def apply_async(self, ops):
+        """apply() for callers on an event loop: awaits durability instead of blocking on it"""
+        with self.lock:
+            changes, results = self._sequence(ops)
+            if not changes:
+                return results
+            ticket, due = self._commit(changes)
+        await self.wal.wait_durable_async(ticket)
+        with self.lock:
+            self._publish_logged(ticket)
+        self._compact_if_due(due)
+        return results
+
+    async def put_async(self, user_id, data):
+        return (await self.apply_async([('put', user_id, data)]))[0]
+
+    async def delete_async(self, user_id):
+        return (await self.apply_async([('delete', user_id)]))[0]
+
+    def apply_replicated(self, entries):
+        """Apply log entries copied from a leader, keeping its sequence numbers.
+
+        Entries at or below the current seq are skipped; a gap raises
+        ValueError (the replica has missed changes and needs a snapshot).
+        """
+        with self.lock:
+            changes = [(entry['seq'], entry['op'], entry['id'], tuple(entry['rec']) if entry['op'] == 'put' else None)
+                       for entry in entries if entry['seq'] > self._tip().seq]
+            if not changes:
+                return
+            if changes[0][0] != self._tip().seq + 1:
+                raise ValueError(f"Replication gap: have {self._tip().seq}, got {changes[0][0]}")
+            ticket, due = self._commit(changes)
+        self._finish(ticket, due)
+
+    def reset(self, seq, records):
+        """Replace the whole state with a copy taken at `seq` (replica catch-up).
+
+        The copy is saved as the snapshot and the old log discarded before it
+        is published, so the store recovers to the new state after a crash.
+        """
+        index = MembershipIndex(records)
+        with self.lock:
+            self._write_snapshot(seq, records, index.state(), force=True)
+            self.wal.restart(seq + 1)
+            self._unpublished.clear()
+            self._feed_floor = seq
+            self.changes.clear()
+            self.index = index
+            self._snapshot = StoreSnapshot(seq, records)
+            self.seq = seq
+            self._since_snapshot = 0
+            self._last_snapshot = time.time()
+            for _listener, sync in self._listeners:
+                if sync is not None:
+                    sync(self._snapshot)
+
+    def _commit(self, changes):
+        """Log sequenced changes (under lock); returns (ticket, compaction due).
+
+        Nothing is published here: readers, the change feed and listeners
+        only see the batch once its log write is durable (see _finish).
+        """
+        ticket = self.wal.write([self._log_entry(change) for change in changes])
+        self._unpublished.append((ticket, changes, self._tip().with_changes(changes[-1][0], self._net(changes))))
+        self._since_snapshot += len(changes)
+        due = (self._since_snapshot >= self.compact_every or
+               time.time() - self._last_snapshot >= self.snapshot_interval)
+        return ticket, due
+
+    def _finish(self, ticket, due):
+        """Wait for durability outside the lock, publish, and kick off compaction if due"""
+        self.wal.wait_durable(ticket)
+        with self.lock:
+            self._publish_logged(ticket)
+        self._compact_if_due(due)
+
+    def _tip(self):
+        """Snapshot including logged but unpublished batches, which new writes build on (under lock)"""
+        return self._unpublished[-1][2] if self._unpublished else self._snapshot
+
+    def _publish_logged(self, ticket):
+        """Publish logged batches up to ticket, which must be durable, in log order (under lock)"""
+        while self._unpublished and self._unpublished[0][0] <= ticket:
+            _ticket, changes, snapshot = self._unpublished.popleft()
+            self._publish(changes, snapshot)
+
+    def _compact_if_due(self, due):
+        if due and not self._compacting:
+            threading.Thread(target=self.compact, daemon=True).start()
+
+    def _sequence(self, ops):
+        """Number ops as (seq, op, user_id, record) changes; returns (changes, results).
+
+        Validates the whole batch before anything is published. Deletes of
+        absent users produce no change.
+        """
+        current = self._tip()
+        pending = {}
+        changes = []
+        results = []
+        seq = current.seq
+        for op in ops:
+            user_id = int(op[1])
+            if op[0] == 'put':
+                record = pack_record(op[2])
+                seq += 1
+                changes.append((seq, 'put', user_id, record))
+                pending[user_id] = record
+                results.append(unpack_record(record))
+            elif op[0] in ('delete', 'expire'):
+                removed = pending[user_id] if user_id in pending else current.record(user_id)
+                if removed is None or (op[0] == 'expire' and is_live(removed, op[2])):
+                    results.append(None)
+                    continue
+                seq += 1
+                changes.append((seq, 'del', user_id, None))
+                pending[user_id] = None
+                results.append(unpack_record(removed))
+            elif op[0] == 'rename':
+                record = pending[user_id] if user_id in pending else current.record(user_id)
+                if record is None or record[USERNAME] != op[3]:
+                    results.append(None)
+                    continue
+                record = record[:USERNAME] + (op[2],) + record[USERNAME + 1:]
+                seq += 1
+                changes.append((seq, 'put', user_id, record))
+                pending[user_id] = record
+                results.append(unpack_record(record))
+            else:
+                raise ValueError(f"Unknown store operation: {op[0]}")
+        return changes, results
+
+    @staticmethod
+    def _log_entry(change):
+        seq, op, user_id, record = change
+        if op == 'put':
+            return {'seq': seq, 'op': 'put', 'id': user_id, 'rec': record}
+        return {'seq': seq, 'op': 'del', 'id': user_id}
+
+    @staticmethod
+    def _net(changes):
+        """{user_id: final record or None} for a batch of changes"""
+        return {user_id: record for _seq, _op, user_id, record in changes}
+
+    def _publish(self, changes, snapshot=None):
+        """Make durable sequenced changes visible to readers as one new snapshot (under lock)"""
+        for seq, op, user_id, record in changes:
+            self._record_change(seq, op, user_id, record)
+        pending = self._net(changes)
+        seq = changes[-1][0]
+        self.index.update([user_id for _seq, op, user_id, _record in changes if op == 'put'])
+        self._snapshot = snapshot if snapshot is not None else self._snapshot.with_changes(seq, pending)
+        # Only after the swap: anyone who sees the new seq can read what it names
+        self.seq = seq
+        for user_id, record in pending.items():
+            if record is None:
+                self.index.discard(user_id)
+        for listener, _sync in self._listeners:
+            try:
+                listener(changes)
+            except Exception as e:
+                print(f"❌ Store listener error: {e}")
+
+    # === COMPACTION ===
+    def compact(self):
+        """Write a snapshot of the current state and drop the log it covers"""
+        with self.lock:
+            if self._compacting:
+                return
+            if self._unpublished:
+                # The log about to be dropped must not hold anything the
+                # snapshot lacks
+                ticket = self._unpublished[-1][0]
+                try:
+                    self.wal.wait_durable(ticket)
+                except Exception as e:
+                    print(f"❌ Snapshot failed: {e}")
+                    return
+                self._publish_logged(ticket)
+            self._compacting = True
+            snapshot = self._snapshot
+            index_state = self.index.state()
+            self.wal.open_segment(snapshot.seq + 1)
+            self._since_snapshot = 0
+            self._last_snapshot = time.time()
+
+        try:
+            if self._write_snapshot(snapshot.seq, dict(snapshot.records()), index_state):
+                self.wal.drop_segments(snapshot.seq)
+        except Exception as e:
+            print(f"❌ Snapshot failed: {e}")
+        finally:
+            self._compacting = False
+
+    def _write_snapshot(self, seq, records, index_state, force=False):
+        """Atomically replace the snapshot file; never with an older one unless forced"""
+        with self._snapshot_file_lock:
+            if seq < self._snapshot_file_seq and not force:
+                return False
+            path = os.path.join(self.directory, SNAPSHOT_NAME)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'seq': seq, 'records': records, 'index': index_state}, f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            self._snapshot_file_seq = seq
+            return True
+
+    def close(self):
+        self.wal.close()
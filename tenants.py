@@ -0,0 +1,101 @@
+"""Several independent whitelists (e.g. one per game) in one deployment.
+
+The original whitelist is the `default` tenant and keeps its data where it
+always was, so single-tenant setups see no change. Extra tenants come from
+TENANTS, a JSON object of tenant id -> {"guild_id": ..., "universe_id": ...}
+(both optional). Each gets its own store under DATA_DIR/tenants/<id>, and
+with it its own writer lock, membership index, change feed, expiry scheduler,
+username backfill and !verify queue, so a busy tenant never waits on another's lock.
+
+HTTP clients address a tenant by id or by Roblox universe id under
+/t/<tenant>/...; bot commands use the tenant whose guild_id is the Discord
+server they were sent from (the default tenant otherwise).
+"""
+import json
+import re
+
+DEFAULT_TENANT = 'default'
+TENANT_ID_PATTERN = re.compile(r'^[a-z0-9][a-z0-9_-]{0,62}$')
+
+
+class Tenant:
+    """One namespaced whitelist and the services built on its store"""
+
+    def __init__(self, tenant_id, store, service, guild_id=None, universe_id=None, expiry=None, backfill=None,
+                 verification_queue=None):
+        self.id = tenant_id
+        self.store = store
+        self.service = service
+        self.guild_id = guild_id
+        self.universe_id = universe_id
+        self.expiry = expiry
+        self.backfill = backfill
+        self.verification_queue = verification_queue
+
+    def stats(self):
+        return {
+            'users': len(self.store),
+            'seq': self.store.seq,
+            'guild_id': self.guild_id,
+            'universe_id': self.universe_id,
+        }
+
+
+class TenantRegistry:
+    """Tenants by id, Roblox universe id and Discord guild id"""
+
+    def __init__(self, default):
+        self.default = default
+        self._by_id = {}
+        self._by_universe = {}
+        self._by_guild = {}
+        self.add(default)
+
+    def add(self, tenant):
+        if tenant.id in self._by_id:
+            raise ValueError(f"Duplicate tenant {tenant.id!r}")
+        for index, key, kind in ((self._by_universe, tenant.universe_id, 'universe_id'),
+                                 (self._by_guild, tenant.guild_id, 'guild_id')):
+            if key is not None and key in index:
+                raise ValueError(f"Tenants {index[key].id!r} and {tenant.id!r} share {kind} {key}")
+        self._by_id[tenant.id] = tenant
+        if tenant.universe_id is not None:
+            self._by_universe[tenant.universe_id] = tenant
+        if tenant.guild_id is not None:
+            self._by_guild[tenant.guild_id] = tenant
+
+    def get(self, key):
+        """Tenant for a tenant id or (all digits) universe id, or None"""
+        tenant = self._by_id.get(key)
+        if tenant is None and key.isdigit():
+            tenant = self._by_universe.get(int(key))
+        return tenant
+
+    def for_guild(self, guild_id):
+        """Tenant a Discord server manages; the default tenant if none claims it"""
+        return self._by_guild.get(guild_id, self.default)
+
+    def __iter__(self):
+        return iter(list(self._by_id.values()))
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def stats(self):
+        return {tenant.id: tenant.stats() for tenant in self}
+
+
+def load_tenant_configs(setting):
+    """Parse TENANTS into {tenant id: {'guild_id': int or None, 'universe_id': int or None}}"""
+    if not setting or not setting.strip():
+        return {}
+    configs = {}
+    for tenant_id, config in json.loads(setting).items():
+        if not TENANT_ID_PATTERN.match(tenant_id) or tenant_id == DEFAULT_TENANT:
+            raise ValueError(f"Invalid tenant id {tenant_id!r} (lowercase letters, digits, - and _)")
+        config = config or {}
+        configs[tenant_id] = {
+            'guild_id': int(config['guild_id']) if config.get('guild_id') else None,
+            'universe_id': int(config['universe_id']) if config.get('universe_id') else None,
+        }
+    return configs
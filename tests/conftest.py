@@ -0,0 +1,24 @@
+"""Shared setup: a scratch DATA_DIR and two extra tenants, configured before web_server is imported."""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from harness import disable_rate_limits, use_temp_data_dir
+
+use_temp_data_dir()
+disable_rate_limits()
+os.environ.setdefault('TENANTS', '{"game-a": {"guild_id": 111, "universe_id": 555}, "game-b": {"guild_id": 222}}')
+
+import pytest
+
+
+@pytest.fixture(scope='session')
+def web():
+    import web_server
+    return web_server
+
+
+@pytest.fixture
+def client(web):
+    return web.app.test_client()
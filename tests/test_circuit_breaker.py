@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+import pytest
+from stub_roblox import StubRoblox
+
+from roblox_client import CircuitBreaker, CircuitOpenError, RobloxClient, budget
+
+
+@pytest.fixture
+def stub():
+    stub = StubRoblox(hang_seconds=1).start()
+    yield stub
+    stub.stop()
+
+
+def open_circuit(client, stub, threshold):
+    stub.fault = 'error'
+    for user_id in range(threshold):
+        assert client.get_username(user_id + 1) is None
+
+
+def test_opens_after_threshold_and_fails_fast(stub):
+    client = RobloxClient(base_url=stub.url, timeout=2, failure_threshold=3, reset_timeout=60)
+    stub.fault = 'error'
+    client.get_username(1)
+    client.get_username(2)
+    assert client.breaker.state == CircuitBreaker.CLOSED
+    client.get_username(3)
+    assert client.breaker.state == CircuitBreaker.OPEN
+    assert stub.requests == 3
+
+    # While open, lookups are answered without calling Roblox
+    started = time.monotonic()
+    assert client.get_username(4) is None
+    assert time.monotonic() - started < 0.1
+    assert stub.requests == 3
+    stats = client.stats()
+    assert stats['circuit']['rejected'] == 1
+    # 503s are answers (they only count against the breaker); the rejection is an error
+    assert stats['errors'] == 1
+
+
+def test_half_open_lets_a_single_probe_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    time.sleep(0.1)
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_successful_probe_closes_the_circuit(stub):
+    client = RobloxClient(base_url=stub.url, timeout=2, failure_threshold=2, reset_timeout=0.05)
+    open_circuit(client, stub, 2)
+    assert client.breaker.state == CircuitBreaker.OPEN
+    stub.fault = None
+    time.sleep(0.1)
+    assert client.get_username(10) == 'Player10'
+    assert client.breaker.state == CircuitBreaker.CLOSED
+    assert client.get_username(11) == 'Player11'
+
+
+def test_failed_probe_opens_the_circuit_again(stub):
+    client = RobloxClient(base_url=stub.url, timeout=2, failure_threshold=2, reset_timeout=0.05)
+    open_circuit(client, stub, 2)
+    time.sleep(0.1)
+    requests_before = stub.requests
+    assert client.get_username(10) is None
+    assert stub.requests == requests_before + 1
+    assert client.breaker.state == CircuitBreaker.OPEN
+    assert client.stats()['circuit']['opened'] == 2
+
+
+def test_cancelled_probe_releases_its_slot(stub):
+    client = RobloxClient(base_url=stub.url, timeout=5, failure_threshold=1, reset_timeout=0.05)
+    open_circuit(client, stub, 1)
+    time.sleep(0.1)
+    stub.fault = 'hang'
+
+    async def scenario():
+        probe = asyncio.create_task(client.get_username_async(10))
+        await asyncio.sleep(0.2)
+        assert client.breaker.state == CircuitBreaker.HALF_OPEN
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        await client.aclose()
+
+    asyncio.run(scenario())
+    assert client.breaker.state == CircuitBreaker.HALF_OPEN
+    # The next call gets to be the probe instead of being rejected forever
+    client.breaker.before_call()
+
+
+def test_budget_cuts_calls_short(stub):
+    client = RobloxClient(base_url=stub.url, timeout=10, failure_threshold=0)
+    stub.fault = 'hang'
+    started = time.monotonic()
+    with budget(0.2):
+        assert client.get_username(1) is None
+    assert time.monotonic() - started < 0.8
+
+    # An exhausted budget makes no call at all
+    requests_before = stub.requests
+    with budget(0):
+        assert client.get_username(2) is None
+    assert stub.requests == requests_before
+    assert client.stats()['errors'] == 2
@@ -0,0 +1,32 @@
+import threading
+
+
+def test_etag_never_names_a_newer_seq_than_the_body(web, client, monkeypatch):
+    """A reader racing a write must not cache the old body under the new seq's ETag"""
+    store = web.store
+    client.get('/whitelist')
+    entered, release = threading.Event(), threading.Event()
+    update = store.index.update
+
+    def slow_update(user_ids):
+        entered.set()
+        release.wait(5)
+        update(user_ids)
+
+    monkeypatch.setattr(store.index, 'update', slow_update)
+    writer = threading.Thread(target=store.put, args=(424242, {'username': 'Racer', 'added_by': 'Test'}))
+    writer.start()
+    try:
+        assert entered.wait(5)
+        during = client.get('/whitelist')
+        etag = during.headers['ETag'].strip('"')
+        assert etag.split('-')[0] == str(during.get_json()['seq'])
+        assert '424242' not in during.get_json()['whitelisted_users']
+    finally:
+        release.set()
+        writer.join()
+
+    after = client.get('/whitelist', headers={'If-None-Match': f'"{etag}"'})
+    assert after.status_code == 200
+    assert '424242' in after.get_json()['whitelisted_users']
+    assert after.headers['ETag'].strip('"').split('-')[0] == str(after.get_json()['seq'])
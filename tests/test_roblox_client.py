@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+from stub_roblox import StubRoblox
+
+from roblox_client import RobloxClient
+
+
+@pytest.fixture
+def stub():
+    stub = StubRoblox().start()
+    yield stub
+    stub.stop()
+
+
+def client_for(stub, **kwargs):
+    return RobloxClient(base_url=stub.url, timeout=2, **kwargs)
+
+
+def test_hits_and_misses_are_counted(stub):
+    client = client_for(stub)
+    assert client.get_username(5) == 'Player5'
+    assert client.get_username(5) == 'Player5'
+    # A name lookup also teaches the reverse direction
+    assert client.get_user_id('player5') == (5, 'Player5')
+    assert stub.requests == 1
+    stats = client.stats()
+    assert (stats['hits'], stats['misses'], stats['errors']) == (2, 1, 0)
+
+
+def test_entries_expire_after_ttl(stub):
+    client = client_for(stub, ttl=0.05)
+    client.get_username(7)
+    client.get_username(7)
+    assert stub.requests == 1
+    time.sleep(0.1)
+    assert client.get_username(7) == 'Player7'
+    assert stub.requests == 2
+
+
+def test_least_recently_used_entry_is_evicted(stub):
+    client = client_for(stub, maxsize=2)
+    client.get_username(1)
+    client.get_username(2)
+    client.get_username(1)  # 1 is now the most recently used
+    client.get_username(3)  # evicts 2
+    assert client.stats()['cached_names'] == 2
+    requests_before = stub.requests
+    client.get_username(1)
+    assert stub.requests == requests_before
+    client.get_username(2)
+    assert stub.requests == requests_before + 1
+
+
+def test_unknown_usernames_are_cached_negatively(stub):
+    client = client_for(stub, negative_ttl=0.05)
+    assert client.get_user_id('NoSuchUser') == (None, None)
+    assert client.get_user_id('nosuchuser') == (None, None)
+    assert stub.requests == 1
+    assert client.stats()['negative_hits'] == 1
+    time.sleep(0.1)
+    client.get_user_id('NoSuchUser')
+    assert stub.requests == 2
+
+
+def test_concurrent_identical_lookups_share_one_request(stub):
+    stub.latency = 0.05
+    client = client_for(stub, batch_window=0.02)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def lookup():
+        barrier.wait()
+        results.append(client.get_username(42))
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ['Player42'] * 8
+    assert stub.requests == 1
+    stats = client.stats()
+    assert stats['hits'] + stats['misses'] == 8
+
+
+def test_distinct_lookups_within_the_window_go_out_together(stub):
+    client = client_for(stub, batch_window=0.05)
+    assert client.get_usernames([11, 12, 13]) == {11: 'Player11', 12: 'Player12', 13: 'Player13'}
+    assert stub.requests == 1
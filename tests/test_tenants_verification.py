@@ -0,0 +1,75 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+ROBLOX_IDS = {'alice': (1001, 'Alice'), 'bob': (1002, 'Bob')}
+
+
+class FakeContext:
+    def __init__(self, guild_id, author_id):
+        self.guild = SimpleNamespace(id=guild_id)
+        self.author = SimpleNamespace(id=author_id, name=f'member{author_id}')
+        self.sent = []
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append(content)
+
+
+@pytest.fixture
+def games(web, monkeypatch):
+    async def resolve_user_id(username):
+        return ROBLOX_IDS.get(username.lower(), (None, None))
+
+    async def post(tenant, guild, request):
+        return "sent to 0 admins"
+
+    game_a, game_b = web.tenants.get('game-a'), web.tenants.get('game-b')
+    for tenant in (game_a, game_b):
+        monkeypatch.setattr(tenant.service, 'resolve_user_id_async', resolve_user_id)
+    monkeypatch.setattr(web, 'post_verification_request', post)
+    return game_a, game_b
+
+
+def test_each_guild_verifies_into_its_own_tenant(web, games):
+    game_a, game_b = games
+
+    async def scenario():
+        await web.verify_command.callback(FakeContext(111, 1), 'Alice')
+        await web.verify_command.callback(FakeContext(222, 2), 'alice')
+        await web.verify_command.callback(FakeContext(222, 3), 'Bob')
+        assert [r['user_id'] for r in game_a.verification_queue.pending()] == [1001]
+        assert sorted(r['user_id'] for r in game_b.verification_queue.pending()) == [1001, 1002]
+        assert len(web.verification_queue) == 0
+
+        admin_a = FakeContext(111, 10)
+        await web.queue_command.callback(admin_a, 'approve', 'all')
+        assert 'Approved and whitelisted 1' in admin_a.sent[-1]
+        assert 1001 in game_a.store and 1001 not in game_b.store
+        assert len(game_b.verification_queue) == 2
+
+        admin_b = FakeContext(222, 20)
+        await web.queue_command.callback(admin_b, 'deny', '1001')
+        await web.queue_command.callback(admin_b, 'approve', '1002')
+        assert 1002 in game_b.store and 1001 not in game_b.store
+        assert 1002 not in game_a.store and 1002 not in web.store
+        assert len(game_b.verification_queue) == 0
+
+        # Already whitelisted in game-a, still a new request for game-b
+        again_a, again_b = FakeContext(111, 1), FakeContext(222, 2)
+        await web.verify_command.callback(again_a, 'Alice')
+        await web.verify_command.callback(again_b, 'Alice')
+        assert again_a.sent[-1] is None and len(game_a.verification_queue) == 0
+        assert 'Verification request' in again_b.sent[-1]
+
+    asyncio.run(scenario())
+
+
+def test_review_buttons_name_their_tenant(web, games):
+    game_a, _ = games
+
+    async def custom_ids():
+        view = web.verification_buttons(game_a, 1001)
+        return [item.custom_id for item in view.children]
+
+    assert asyncio.run(custom_ids()) == ['verify:approve:1001:game-a', 'verify:deny:1001:game-a']
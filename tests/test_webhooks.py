@@ -0,0 +1,82 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from store import WhitelistStore
+from webhooks import WebhookDispatcher, WebhookRegistry
+
+
+class Receiver:
+    """Local endpoint that either accepts deliveries or redirects them to /elsewhere"""
+
+    def __init__(self, redirect=False):
+        hits = self.hits = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers['Content-Length']))
+                hits.append(self.path)
+                if redirect and self.path != '/elsewhere':
+                    self.send_response(307)
+                    self.send_header('Location', '/elsewhere')
+                else:
+                    self.send_response(204)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/hook"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def setup(tmp_path):
+    store = WhitelistStore(str(tmp_path / 'store'))
+    registry = WebhookRegistry(str(tmp_path / 'subscribers.json'))
+    store.put(1, {'username': 'One', 'added_by': 'Test'})
+    receivers = []
+    yield store, registry, receivers
+    for receiver in receivers:
+        receiver.close()
+    store.close()
+
+
+def state():
+    return {'failures': 0, 'last_error': None, 'last_delivery': None, 'next_attempt': None, 'delivered': 0}
+
+
+def test_delivers_and_advances_cursor(setup):
+    store, registry, receivers = setup
+    receivers.append(Receiver())
+    subscriber = registry.add(receivers[0].url)
+    WebhookDispatcher(store, registry, allow_private=True)._deliver(subscriber, state())
+    assert receivers[0].hits == ['/hook']
+    assert registry.get(subscriber['id'])['cursor'] == store.seq
+
+
+def test_redirects_are_failed_deliveries(setup):
+    store, registry, receivers = setup
+    receivers.append(Receiver(redirect=True))
+    subscriber = registry.add(receivers[0].url)
+    with pytest.raises(RuntimeError, match='HTTP 307'):
+        WebhookDispatcher(store, registry, allow_private=True)._deliver(subscriber, state())
+    assert receivers[0].hits == ['/hook']
+    assert registry.get(subscriber['id'])['cursor'] == 0
+
+
+def test_url_is_rechecked_on_every_delivery(setup):
+    """A subscriber whose host now resolves to a private address gets nothing"""
+    store, registry, receivers = setup
+    receivers.append(Receiver())
+    subscriber = registry.add(receivers[0].url)
+    with pytest.raises(ValueError, match='non-public'):
+        WebhookDispatcher(store, registry)._deliver(subscriber, state())
+    assert receivers[0].hits == []
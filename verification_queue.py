@@ -0,0 +1,113 @@
+"""Pending `!verify` requests, deduplicated by Roblox user ID.
+
+A request is queued once per Roblox account however many times (or by how
+many Discord users) `!verify` is run for it, so admins are notified once and
+repeat requests cost neither Discord messages nor Roblox lookups. The queue is
+small and written whole to a JSON file on every change (temp file + rename),
+so pending requests and their review messages survive restarts.
+"""
+import json
+import os
+import threading
+import time
+
+
+class VerificationQueue:
+    """Persistent map of Roblox user ID -> pending verification request"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._by_username = {}  # lowercase Roblox username -> user ID
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                requests = json.load(f)
+        except Exception as e:
+            print(f"❌ Could not load verification queue: {e}")
+            return
+        for request in requests:
+            self._requests[request['user_id']] = request
+            self._by_username[request['username'].lower()] = request['user_id']
+        print(f"📨 Loaded {len(self._requests)} pending verification requests")
+
+    def _save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(list(self._requests.values()), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        return len(self._requests)
+
+    def __contains__(self, user_id):
+        return user_id in self._requests
+
+    def find_username(self, username):
+        """Pending request for a Roblox username, without asking Roblox"""
+        user_id = self._by_username.get(username.lower())
+        return self._requests.get(user_id) if user_id is not None else None
+
+    def get(self, user_id):
+        return self._requests.get(user_id)
+
+    def pending(self):
+        """Pending requests, oldest first"""
+        with self._lock:
+            return sorted(self._requests.values(), key=lambda request: request['requested_at'])
+
+    def add(self, user_id, username, discord_user_id, discord_user):
+        """Queue a request; returns (request, created).
+
+        A repeat request for a queued Roblox ID only records the extra
+        requester, and created is False so the caller doesn't notify again.
+        """
+        with self._lock:
+            request = self._requests.get(user_id)
+            if request is not None:
+                if discord_user_id not in request['requester_ids']:
+                    request['requester_ids'].append(discord_user_id)
+                    self._save()
+                return request, False
+            request = {
+                'user_id': user_id,
+                'username': username,
+                'discord_user': discord_user,
+                'requester_ids': [discord_user_id],
+                'requested_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'channel_id': None,
+                'message_id': None
+            }
+            self._requests[user_id] = request
+            self._by_username[username.lower()] = user_id
+            self._save()
+            return request, True
+
+    def set_message(self, user_id, channel_id, message_id):
+        """Remember the review channel message posted for a request"""
+        with self._lock:
+            request = self._requests.get(user_id)
+            if request is not None:
+                request['channel_id'] = channel_id
+                request['message_id'] = message_id
+                self._save()
+
+    def pop_many(self, user_ids):
+        """Remove and return the requests for user_ids that are still pending"""
+        with self._lock:
+            popped = []
+            for user_id in user_ids:
+                request = self._requests.pop(user_id, None)
+                if request is not None:
+                    self._by_username.pop(request['username'].lower(), None)
+                    popped.append(request)
+            if popped:
+                self._save()
+            return popped
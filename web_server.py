@@ -1,19 +1,70 @@
-from flask import Flask, request, jsonify, render_template_string, redirect
-import requests
+from flask import Flask, Response, abort, g, has_request_context, request, jsonify, redirect, stream_with_context
+import functools
+import gzip
+import io
 import os
 import json
-from threading import Lock
+import math
+import base64
+import zlib
 import time
 import threading
 import discord
 from discord.ext import commands
 import asyncio
+import metrics
+from metrics import CallbackCounter, Counter, Gauge, Histogram, InstrumentedLock
+from rate_limit import ConcurrencyLimit, TokenBucketLimiter
+from response_cache import ResponseCache
+import bulk
+from admin_directory import AdminDirectory
+from verification_queue import VerificationQueue
+from webhooks import WebhookDispatcher, WebhookRegistry, check_url
+from roblox_client import RobloxClient, reset_budget, set_budget
+from search_index import SearchIndex
+from election import run_when_elected
+from expiry import ExpiryScheduler, parse_expires_at
+from replication import ChangeNotifier, Follower
+from shared_store import SharedWhitelistStore
+from store import WhitelistStore
+from tenants import DEFAULT_TENANT, Tenant, TenantRegistry, load_tenant_configs
+from whitelist_service import WhitelistService
 
 app = Flask(__name__)
 
-# In-memory storage (replace with database in production)
-whitelist_data = {}
-data_lock = Lock()
+# === METRICS ===
+HTTP_REQUESTS = Counter('http_requests_total', 'HTTP requests by route, method and status', ('route', 'method', 'status'))
+HTTP_REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'HTTP request latency (to first byte for streams)', ('route', 'method'))
+LOCK_WAIT_SECONDS = Histogram('whitelist_lock_wait_seconds', 'Time spent waiting for the whitelist writer lock')
+LOCK_HOLD_SECONDS = Histogram('whitelist_lock_hold_seconds', 'Time the whitelist writer lock was held')
+BOT_COMMAND_SECONDS = Histogram('discord_command_duration_seconds', 'Discord bot command latency', ('command',))
+RATE_LIMITED = Counter('http_requests_rejected_total', 'Requests rejected by rate limiting or admission control', ('route', 'reason'))
+BOT_COMMAND_ERRORS = Counter('discord_command_errors_total', 'Discord bot commands that raised', ('command',))
+
+# Durable storage under DATA_DIR. On Railway, point DATA_DIR at a mounted
+# volume so the whitelist survives restarts.
+#   STORE_BACKEND=wal     write-ahead log + snapshots, one server process
+#   STORE_BACKEND=sqlite  SQLite database shared by several server processes
+DATA_DIR = os.environ.get('DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+STORE_BACKEND = os.environ.get('STORE_BACKEND', 'wal')
+
+def open_store(directory):
+    """Whitelist store in `directory` for STORE_BACKEND, with its own writer lock"""
+    if STORE_BACKEND == 'sqlite':
+        return SharedWhitelistStore(os.path.join(directory, 'whitelist.db'),
+                                    poll_interval=float(os.environ.get('STORE_POLL_INTERVAL', '0.05')),
+                                    change_feed_size=int(os.environ.get('CHANGE_FEED_SIZE', '10000')),
+                                    lock=InstrumentedLock(LOCK_WAIT_SECONDS, LOCK_HOLD_SECONDS))
+    return WhitelistStore(directory, change_feed_size=int(os.environ.get('CHANGE_FEED_SIZE', '10000')),
+                          lock=InstrumentedLock(LOCK_WAIT_SECONDS, LOCK_HOLD_SECONDS))
+
+store = open_store(DATA_DIR)
+print(f"💾 Loaded {len(store)} whitelisted users from {DATA_DIR} ({STORE_BACKEND}) in {store.recovery_time * 1000:.1f}ms")
+
+# Set on read replicas: tail this leader's change log and forward writes to it
+REPLICATION_LEADER_URL = os.environ.get('REPLICATION_LEADER_URL', '').rstrip('/')
+if REPLICATION_LEADER_URL and STORE_BACKEND != 'wal':
+    raise RuntimeError("Replication followers use the WAL backend (STORE_BACKEND=wal)")
 
 # Pre-whitelisted users (your friends)
 PRE_WHITELISTED_USERS = {
@@ -29,6 +80,8 @@ PRE_WHITELISTED_USERS = {
 BOT_TOKEN = os.environ.get('BOT_TOKEN')
 GUILD_ID = int(os.environ.get('GUILD_ID', '0'))
 ADMIN_ROLE_IDS_STR = os.environ.get('ADMIN_ROLE_IDS', '[]')
+# Channel where !verify requests are posted with approve/deny buttons (0 = DM admins instead)
+REVIEW_CHANNEL_ID = int(os.environ.get('REVIEW_CHANNEL_ID', '0'))
 WEB_API_URL = os.environ.get('WEB_API_URL', 'https://discordbotv2-production-28c4.up.railway.app')
 
 # Parse ADMIN_ROLE_IDS from JSON string
@@ -43,6 +96,7 @@ print("=== ENVIRONMENT CONFIG ===")
 print(f"🔑 BOT_TOKEN: {'✅ Set' if BOT_TOKEN else '❌ Missing'}")
 print(f"🏠 GUILD_ID: {GUILD_ID}")
 print(f"👑 ADMIN_ROLE_IDS: {ADMIN_ROLE_IDS}")
+print(f"📨 REVIEW_CHANNEL_ID: {REVIEW_CHANNEL_ID or 'not set (DM admins)'}")
 print(f"🌐 WEB_API_URL: {WEB_API_URL}")
 
 # Validate critical configuration
@@ -64,36 +118,41 @@ if os.environ.get('RAILWAY_ENVIRONMENT'):
     print("🚄 Running on Railway Platform")
     print(f"🔗 Using configured URL: {WEB_API_URL}")
         
-# Roblox API functions
+# Roblox API functions (pooled connections + TTL/LRU cache in both directions)
+ROBLOX_API_URL = os.environ.get('ROBLOX_API_URL', 'https://api.roblox.com')
+# Bulk users-by-name/id endpoints (same host as ROBLOX_API_URL when that is overridden, e.g. a stub)
+ROBLOX_USERS_API_URL = os.environ.get('ROBLOX_USERS_API_URL', 'https://users.roblox.com'
+                                      if 'ROBLOX_API_URL' not in os.environ else ROBLOX_API_URL)
+# Concurrent lookup misses within this window share one bulk request (0 = one request each)
+ROBLOX_BATCH_WINDOW_MS = float(os.environ.get('ROBLOX_BATCH_WINDOW_MS', '5'))
+# Consecutive failures that open the circuit (0 = never) and seconds before probing again
+ROBLOX_FAILURE_THRESHOLD = int(os.environ.get('ROBLOX_FAILURE_THRESHOLD', '5'))
+ROBLOX_RESET_TIMEOUT = float(os.environ.get('ROBLOX_RESET_TIMEOUT', '30'))
+# Total time an HTTP request may spend waiting on Roblox (0 = only the client timeout)
+ROBLOX_REQUEST_BUDGET = float(os.environ.get('ROBLOX_REQUEST_BUDGET', '3'))
+roblox_client = RobloxClient(ROBLOX_API_URL, users_url=ROBLOX_USERS_API_URL,
+                             batch_window=ROBLOX_BATCH_WINDOW_MS / 1000,
+                             failure_threshold=ROBLOX_FAILURE_THRESHOLD, reset_timeout=ROBLOX_RESET_TIMEOUT)
+
+Gauge('whitelist_users', 'Number of whitelisted users', function=lambda: len(store))
+Gauge('whitelist_seq', 'Sequence number of the latest whitelist change', function=lambda: store.seq)
+CallbackCounter('roblox_cache_lookups_total', 'Roblox client cache lookups by result', ('result',),
+                function=lambda: {(name,): value for name, value in roblox_client.stats().items()
+                                  if name in ('hits', 'misses', 'negative_hits', 'stale_hits')})
+
 def get_roblox_user_id(username):
     """Get Roblox UserID from username"""
-    try:
-        url = f"https://api.roblox.com/users/get-by-username?username={username}"
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            return data.get('Id'), data.get('Username')
-        return None, None
-    except Exception as e:
-        print(f"Roblox API error: {e}")
-        return None, None
+    return roblox_client.get_user_id(username)
 
 def get_roblox_username(user_id):
     """Get Roblox username from UserID"""
-    try:
-        url = f"https://api.roblox.com/users/{user_id}"
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            return data.get('Username')
-        return None
-    except Exception as e:
-        print(f"Roblox API error: {e}")
-        return None
+    return roblox_client.get_username(user_id)
 
 # Initialize with some test data for demonstration
 def initialize_sample_data():
-    """Add some sample data for testing"""
+    """Add some sample data for testing (only into a brand new store)"""
+    if store.seq:
+        return
     sample_users = {
         123456789: {
             "username": "TestUser1",
@@ -108,11 +167,112 @@ def initialize_sample_data():
             "added_by": "System"
         }
     }
-    with data_lock:
-        whitelist_data.update(sample_users)
+    store.apply([('put', user_id, user_data) for user_id, user_data in sample_users.items()])
 
 # Initialize sample data
-initialize_sample_data()
+# Replicas get their data (sample users included) from the leader
+if not REPLICATION_LEADER_URL:
+    initialize_sample_data()
+
+# Resolves placeholder usernames left by bulk imports and by adds without a
+# username, so writes never wait on Roblox
+username_backfill = bulk.UsernameBackfill(store, roblox_client.get_usernames,
+                                          workers=int(os.environ.get('USERNAME_BACKFILL_WORKERS', '4')))
+Gauge('username_backfill_pending', 'Users still waiting for their Roblox username',
+      function=lambda: username_backfill.pending())
+CallbackCounter('username_backfill_users_total', 'Users handled by the username backfill by outcome', ('outcome',),
+                function=lambda: {(name,): value for name, value in username_backfill.stats().items()
+                                  if name in ('resolved', 'unresolved', 'retried', 'failed')})
+if not REPLICATION_LEADER_URL:
+    # Pick up placeholders whose lookups were still queued when the server stopped
+    run_when_elected(os.path.join(DATA_DIR, 'username_backfill.lock'),
+                     lambda: threading.Thread(target=username_backfill.resume, args=(store.snapshot(),),
+                                              daemon=True).start())
+
+# Shared by the Flask routes and the Discord bot (no HTTP loopback)
+whitelist_service = WhitelistService(store, get_roblox_username, get_roblox_user_id,
+                                     roblox_client.get_username_async, roblox_client.get_user_id_async,
+                                     enrich=username_backfill.submit)
+
+# Prefix search over username / discord_user / added_by for the admin panel
+search_index = SearchIndex()
+search_index.attach(store)
+
+# Pending !verify requests, one per Roblox ID, persisted next to the store
+verification_queue = VerificationQueue(os.path.join(DATA_DIR, 'verification_queue.json'))
+
+# Replication: leaders long-poll /replication/log on change_notifier;
+# followers keep their store in step with the leader's
+replica = Follower(store, REPLICATION_LEADER_URL).start() if REPLICATION_LEADER_URL else None
+change_notifier = replica.notifier if replica else ChangeNotifier(store)
+if replica:
+    print(f"🔁 Read replica of {REPLICATION_LEADER_URL}")
+    Gauge('replication_lag_entries', 'Changes the leader has that this replica has not applied yet',
+          function=lambda: replica.status()['lag_entries'])
+    Gauge('replication_lag_seconds', 'Seconds since this replica was last fully caught up',
+          function=lambda: replica.status()['lag_seconds'] or 0.0)
+
+# Outbound change pushes to registered game servers. Delivered by one process
+# per DATA_DIR (elected like the bot), and only by the replication leader.
+WEBHOOK_BATCH_WINDOW = float(os.environ.get('WEBHOOK_BATCH_WINDOW', '0.25'))
+# Webhook subscribers may point at private addresses (local game servers, tests)
+WEBHOOK_ALLOW_PRIVATE_URLS = os.environ.get('WEBHOOK_ALLOW_PRIVATE_URLS', '').lower() in ('1', 'true', 'yes')
+webhook_registry = WebhookRegistry(os.path.join(DATA_DIR, 'webhook_subscribers.json'))
+webhook_dispatcher = WebhookDispatcher(store, webhook_registry, window=WEBHOOK_BATCH_WINDOW,
+                                       allow_private=WEBHOOK_ALLOW_PRIVATE_URLS)
+Gauge('webhook_subscribers', 'Registered webhook subscribers', function=lambda: len(webhook_registry))
+if not replica:
+    run_when_elected(os.path.join(DATA_DIR, 'webhooks.lock'), webhook_dispatcher.start)
+
+# Removes time-limited entries when they expire. One process per DATA_DIR;
+# replicas get the removals through replication (and hide expired entries
+# from lookups meanwhile, like every store does)
+expiry_scheduler = ExpiryScheduler(store)
+Gauge('whitelist_expiring_users', 'Time-limited whitelist entries waiting to expire',
+      function=lambda: expiry_scheduler.pending())
+if not replica:
+    run_when_elected(os.path.join(DATA_DIR, 'expiry.lock'), expiry_scheduler.start)
+
+# === TENANTS ===
+# The whitelist above is the default tenant. TENANTS adds more, e.g.
+#   TENANTS='{"game-a": {"guild_id": 123, "universe_id": 456}}'
+# each with its own store (and so its own lock and indexes) under
+# DATA_DIR/tenants/<id>, served under /t/<id or universe id>/... and by the
+# bot in its guild. Replicas forward tenant requests to the leader.
+tenants = TenantRegistry(Tenant(DEFAULT_TENANT, store, whitelist_service, guild_id=GUILD_ID or None,
+                                expiry=expiry_scheduler, backfill=username_backfill,
+                                verification_queue=verification_queue))
+
+def open_tenant(tenant_id, config):
+    directory = os.path.join(DATA_DIR, 'tenants', tenant_id)
+    tenant_store = open_store(directory)
+    backfill = bulk.UsernameBackfill(tenant_store, roblox_client.get_usernames, workers=1)
+    service = WhitelistService(tenant_store, get_roblox_username, get_roblox_user_id,
+                               roblox_client.get_username_async, roblox_client.get_user_id_async,
+                               enrich=backfill.submit)
+    expiry = ExpiryScheduler(tenant_store)
+    queue = VerificationQueue(os.path.join(directory, 'verification_queue.json'))
+    if not replica:
+        run_when_elected(os.path.join(directory, 'expiry.lock'), expiry.start)
+        run_when_elected(os.path.join(directory, 'username_backfill.lock'),
+                         lambda: threading.Thread(target=backfill.resume, args=(tenant_store.snapshot(),),
+                                                  daemon=True).start())
+    print(f"🏷️ Tenant {tenant_id}: {len(tenant_store)} whitelisted users "
+          f"(guild {config['guild_id']}, universe {config['universe_id']})")
+    return Tenant(tenant_id, tenant_store, service, expiry=expiry, backfill=backfill, verification_queue=queue,
+                  **config)
+
+for tenant_id, tenant_config in load_tenant_configs(os.environ.get('TENANTS', '')).items():
+    tenants.add(open_tenant(tenant_id, tenant_config))
+Gauge('whitelist_tenant_users', 'Whitelisted users per tenant', ('tenant',),
+      function=lambda: {(tenant.id,): len(tenant.store) for tenant in tenants})
+
+def current_tenant():
+    """Tenant of the request being served (the default outside /t/<tenant>/ routes)"""
+    return (g.get('tenant') or tenants.default) if has_request_context() else tenants.default
+
+def current_service():
+    return current_tenant().service
 
 # === DISCORD BOT SETUP ===
 intents = discord.Intents.default()
@@ -122,84 +282,9 @@ intents.members = True
 
 bot = commands.Bot(command_prefix='!', intents=intents, help_command=None)
 
-# Web API functions for Discord bot - USE LOCALHOST FOR SELF-REQUESTS
-def api_check_whitelist(user_id):
-    try:
-        # Use local server instead of external URL when calling ourselves
-        port = os.environ.get('PORT', '8080')
-        local_url = f"http://localhost:{port}/check_whitelist?user_id={user_id}"
-        response = requests.get(local_url, timeout=5)
-        if response.status_code == 200:
-            return response.json()
-        return None
-    except Exception as e:
-        print(f"API check error: {e}")
-        return None
-
-def api_verify_username(username):
-    try:
-        # Use local server
-        port = os.environ.get('PORT', '8080')
-        local_url = f"http://localhost:{port}/verify?username={username}"
-        response = requests.get(local_url, timeout=5)
-        if response.status_code == 200:
-            return response.json()
-        return None
-    except Exception as e:
-        print(f"API verify error: {e}")
-        return None
-
-def api_add_whitelist(user_id, username, discord_user):
-    try:
-        payload = {
-            'user_id': user_id,
-            'username': username,
-            'discord_user': discord_user,
-            'action': 'add'
-        }
-        # Use local server
-        port = os.environ.get('PORT', '8080')
-        local_url = f"http://localhost:{port}/webhook_verify"
-        response = requests.post(local_url, json=payload, timeout=5)
-        return response.status_code == 200
-    except Exception as e:
-        print(f"API add error: {e}")
-        return False
-
-def api_remove_whitelist(user_id):
-    """Remove user from whitelist via API"""
-    try:
-        # Use local server
-        port = os.environ.get('PORT', '8080')
-        local_url = f"http://localhost:{port}/whitelist/remove"
-        payload = {'user_id': user_id}
-        response = requests.post(local_url, json=payload, timeout=5)
-        
-        if response.status_code == 200:
-            return True
-        
-        # If POST fails, try DELETE method
-        delete_url = f"http://localhost:{port}/whitelist/{user_id}"
-        response = requests.delete(delete_url, timeout=5)
-        return response.status_code == 200
-        
-    except Exception as e:
-        print(f"API remove error: {e}")
-        return False
-
-def api_get_whitelist():
-    """Get all whitelisted users"""
-    try:
-        # Use local server
-        port = os.environ.get('PORT', '8080')
-        local_url = f"http://localhost:{port}/whitelist"
-        response = requests.get(local_url, timeout=5)
-        if response.status_code == 200:
-            return response.json()
-        return None
-    except Exception as e:
-        print(f"API get whitelist error: {e}")
-        return None
+# Who gets !verify DMs, kept current from member/role events
+ADMIN_DM_CONCURRENCY = int(os.environ.get('ADMIN_DM_CONCURRENCY', '5'))
+admin_directory = AdminDirectory(ADMIN_ROLE_IDS, concurrency=ADMIN_DM_CONCURRENCY)
 
 # Admin check function
 def is_admin():
@@ -216,6 +301,18 @@ def is_admin():
         return False
     return commands.check(predicate)
 
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.started_at = time.perf_counter()
+
+@bot.after_invoke
+async def record_command_latency(ctx):
+    # after_invoke runs whether or not the command raised
+    name = ctx.command.qualified_name if ctx.command else 'unknown'
+    BOT_COMMAND_SECONDS.observe(time.perf_counter() - getattr(ctx, 'started_at', time.perf_counter()), name)
+    if ctx.command_failed:
+        BOT_COMMAND_ERRORS.inc(name)
+
 # Discord Bot Events
 @bot.event
 async def on_ready():
@@ -224,6 +321,10 @@ async def on_ready():
     admin_url = get_full_url('admin')
     print(f'🌐 Web Admin Panel: {admin_url}')
     
+    for guild in bot.guilds:
+        admin_directory.rebuild(guild)
+        print(f'👑 {guild.name}: {admin_directory.count(guild)} admins will receive verification requests')
+    
     await bot.change_presence(
         activity=discord.Activity(
             type=discord.ActivityType.watching, 
@@ -231,42 +332,97 @@ async def on_ready():
         )
     )
 
+# Keep the admin directory current instead of scanning members per !verify
+@bot.event
+async def on_guild_join(guild):
+    admin_directory.rebuild(guild)
+
+@bot.event
+async def on_guild_remove(guild):
+    admin_directory.forget_guild(guild)
+
+@bot.event
+async def on_guild_update(before, after):
+    if before.owner_id != after.owner_id:
+        admin_directory.rebuild(after)
+
+@bot.event
+async def on_member_join(member):
+    admin_directory.update_member(member)
+
+@bot.event
+async def on_member_update(before, after):
+    if before.roles != after.roles:
+        admin_directory.update_member(after)
+
+@bot.event
+async def on_member_remove(member):
+    admin_directory.remove_member(member)
+
+@bot.event
+async def on_guild_role_update(before, after):
+    admin_directory.role_changed(before, after)
+
+@bot.event
+async def on_guild_role_delete(role):
+    admin_directory.role_changed(role, None)
+
 # Discord Bot Commands
 @bot.command(name='whitelist')
 @is_admin()
-async def whitelist_command(ctx, action: str, user_id: int = None):
+async def whitelist_command(ctx, action: str, user_id: int = None, expires: str = None):
     """Whitelist management commands"""
+    # Each Discord server manages its own tenant's whitelist
+    tenant = tenants.for_guild(ctx.guild.id if ctx.guild else None)
+    service = tenant.service
     if action.lower() == "add":
         if user_id is None:
-            await ctx.send("❌ Please provide a UserID: `!whitelist add USERID`")
+            await ctx.send("❌ Please provide a UserID: `!whitelist add USERID [EXPIRES]` (e.g. `7d`)")
+            return
+        try:
+            expires_at = parse_expires_at(expires)
+        except ValueError as e:
+            await ctx.send(f"❌ {e}")
             return
             
-        # Add to whitelist via API
-        if api_add_whitelist(user_id, "Manual_Add", ctx.author.name):
+        try:
+            await service.add_async(user_id, "Manual_Add", ctx.author.name, expires_at=expires_at)
+            added = True
+        except Exception as e:
+            print(f"Whitelist add error: {e}")
+            added = False
+        
+        if added:
             embed = discord.Embed(
                 title="✅ User Whitelisted!",
                 description=f"Roblox UserID `{user_id}` has been added to the whitelist!",
                 color=0x00ff00
             )
             embed.add_field(name="Added by", value=ctx.author.mention, inline=True)
+            if expires_at:
+                embed.add_field(name="Expires", value=f"<t:{int(expires_at)}:R>", inline=True)
             embed.add_field(name="Web Panel", value=f"[Manage Whitelist]({get_full_url('admin')})", inline=False)
             await ctx.send(embed=embed)
         else:
-            await ctx.send("❌ Failed to add user to whitelist via API")
+            await ctx.send("❌ Failed to add user to whitelist")
             
     elif action.lower() == "remove":
         if user_id is None:
             await ctx.send("❌ Please provide a UserID: `!whitelist remove USERID`")
             return
             
-        # Check if user exists in whitelist first
-        check_result = api_check_whitelist(user_id)
-        if not check_result or not check_result.get('whitelisted'):
+        # Removing reports whether the user was in the whitelist at all
+        try:
+            removed_user = await service.remove_async(user_id)
+        except Exception as e:
+            print(f"Whitelist remove error: {e}")
+            await ctx.send("❌ Failed to remove user from whitelist")
+            return
+        
+        if removed_user is None:
             await ctx.send(f"❌ User `{user_id}` is not in the whitelist!")
             return
-            
-        # Remove from whitelist via API
-        if api_remove_whitelist(user_id):
+        else:
             embed = discord.Embed(
                 title="🗑️ User Removed!",
                 description=f"Roblox UserID `{user_id}` has been removed from the whitelist!",
@@ -275,45 +431,28 @@ async def whitelist_command(ctx, action: str, user_id: int = None):
             embed.add_field(name="Removed by", value=ctx.author.mention, inline=True)
             embed.add_field(name="Web Panel", value=f"[Manage Whitelist]({get_full_url('admin')})", inline=False)
             await ctx.send(embed=embed)
-        else:
-            await ctx.send("❌ Failed to remove user from whitelist via API")
             
     elif action.lower() == "list":
         try:
-            data = api_get_whitelist()
-            if data and data.get('status') == 'success':
-                users_list = data.get('whitelist', [])
-                if users_list:
-                    user_list = "\n".join([f"• `{uid}`" for uid in users_list[:10]])  # Show first 10
-                    embed = discord.Embed(
-                        title="📋 Whitelisted Users",
-                        description=user_list,
-                        color=0x0099ff
-                    )
-                    embed.set_footer(text=f"Total: {len(users_list)} users - See full list at {get_full_url('admin')}")
-                    await ctx.send(embed=embed)
-                else:
-                    embed = discord.Embed(
-                        title="📋 Whitelisted Users",
-                        description="No users whitelisted",
-                        color=0x0099ff
-                    )
-                    await ctx.send(embed=embed)
+            users = await service.list_users_async()
+            if users:
+                user_list = "\n".join([f"• `{uid}` ({user_data.get('username', 'Unknown')})" for uid, user_data in users[:10]])  # Show first 10
+                embed = discord.Embed(
+                    title="📋 Whitelisted Users",
+                    description=user_list,
+                    color=0x0099ff
+                )
+                embed.set_footer(text=f"Total: {len(users)} users - See full list at {get_full_url('admin')}")
+                await ctx.send(embed=embed)
             else:
-                # Fallback to direct memory access if API fails
-                with data_lock:
-                    user_count = len(whitelist_data)
-                    user_list = "\n".join([f"• `{uid}` ({whitelist_data[uid].get('username', 'Unknown')})" for uid in list(whitelist_data.keys())[:5]])
-                
                 embed = discord.Embed(
-                    title="📋 Whitelisted Users (Local Cache)",
-                    description=user_list or "No users whitelisted",
-                    color=0xffa500
+                    title="📋 Whitelisted Users",
+                    description="No users whitelisted",
+                    color=0x0099ff
                 )
-                embed.set_footer(text=f"Total: {user_count} users - API unavailable, showing cached data")
                 await ctx.send(embed=embed)
         except Exception as e:
-            await ctx.send(f"❌ API error: {str(e)}")
+            await ctx.send(f"❌ Whitelist error: {str(e)}")
             
     elif action.lower() == "api":
         embed = discord.Embed(
@@ -325,14 +464,15 @@ async def whitelist_command(ctx, action: str, user_id: int = None):
             value=f"[{get_full_url('admin')}]({get_full_url('admin')})",
             inline=False
         )
+        prefix = '' if tenant is tenants.default else f't/{tenant.id}/'
         embed.add_field(
             name="Check Whitelist",
-            value=f"`{get_full_url('check_whitelist?user_id=USERID')}`",
+            value=f"`{get_full_url(prefix + 'check_whitelist?user_id=USERID')}`",
             inline=False
         )
         embed.add_field(
             name="Get All Whitelisted",
-            value=f"`{get_full_url('whitelist')}`",
+            value=f"`{get_full_url(prefix + 'whitelist')}`",
             inline=False
         )
         await ctx.send(embed=embed)
@@ -342,8 +482,8 @@ async def whitelist_command(ctx, action: str, user_id: int = None):
             await ctx.send("❌ Please provide a UserID: `!whitelist check USERID`")
             return
             
-        result = api_check_whitelist(user_id)
-        if result and result.get('success'):
+        result = await service.check_async(user_id)
+        if result:
             is_whitelisted = result.get('whitelisted', False)
             status = "✅ Whitelisted" if is_whitelisted else "❌ Not Whitelisted"
             embed = discord.Embed(
@@ -378,7 +518,7 @@ async def setup_command(ctx):
     
     embed.add_field(
         name="👑 Admin Commands",
-        value="`!whitelist add USERID` - Add user\n`!whitelist remove USERID` - Remove user\n`!whitelist list` - Show users\n`!whitelist check USERID` - Check status\n`!whitelist api` - API endpoints",
+        value="`!whitelist add USERID [EXPIRES]` - Add user (e.g. `7d` for a week)\n`!whitelist remove USERID` - Remove user\n`!whitelist list` - Show users\n`!whitelist check USERID` - Check status\n`!whitelist api` - API endpoints\n`!queue` - Pending verification requests\n`!queue approve all|USERID...` - Approve requests\n`!queue deny USERID...` - Deny requests",
         inline=False
     )
     
@@ -390,6 +530,107 @@ async def setup_command(ctx):
     
     await ctx.send(embed=embed)
 
+# === VERIFICATION QUEUE ===
+def verification_embed(request, outcome=None, tenant=None):
+    """Review message for a pending request, or its final state once resolved"""
+    user_id = request['user_id']
+    requesters = ', '.join(f"<@{discord_id}>" for discord_id in request['requester_ids'])
+    if outcome is None:
+        embed = discord.Embed(title="🔒 Verification Request", color=0xffa500)
+    elif outcome['approved']:
+        embed = discord.Embed(title=f"✅ Approved by {outcome['by']}", color=0x00ff00)
+    else:
+        embed = discord.Embed(title=f"❌ Denied by {outcome['by']}", color=0xff0000)
+    embed.description = f"**Player:** {request['username']}\n**UserID:** `{user_id}`\n**Discord User:** {requesters}"
+    if outcome is None and not REVIEW_CHANNEL_ID:
+        embed.add_field(
+            name="Actions",
+            value=f"✅ Approve: `!queue approve {user_id}`\n❌ Deny: `!queue deny {user_id}`",
+            inline=False
+        )
+    embed.add_field(
+        name="Profile",
+        value=f"[View Roblox Profile](https://www.roblox.com/users/{user_id}/profile)",
+        inline=False
+    )
+    if tenant is not None and tenant is not tenants.default:
+        embed.add_field(name="Tenant", value=tenant.id, inline=True)
+    embed.set_footer(text=f"Requested {request['requested_at']}")
+    return embed
+
+def verification_buttons(tenant, user_id):
+    # Handled in on_interaction by custom_id, so buttons keep working after a restart.
+    # The tenant rides along because every tenant's requests share REVIEW_CHANNEL_ID.
+    view = discord.ui.View(timeout=None)
+    view.add_item(discord.ui.Button(label="Approve", style=discord.ButtonStyle.success,
+                                    custom_id=f"verify:approve:{user_id}:{tenant.id}"))
+    view.add_item(discord.ui.Button(label="Deny", style=discord.ButtonStyle.danger,
+                                    custom_id=f"verify:deny:{user_id}:{tenant.id}"))
+    return view
+
+async def post_verification_request(tenant, guild, request):
+    """Post a new request once; returns a description of where it went"""
+    channel = bot.get_channel(REVIEW_CHANNEL_ID) if REVIEW_CHANNEL_ID else None
+    if channel is None:
+        admin_count = await admin_directory.notify(guild, embed=verification_embed(request, tenant=tenant))
+        return f"sent to {admin_count} admins"
+    message = await channel.send(embed=verification_embed(request, tenant=tenant),
+                                 view=verification_buttons(tenant, request['user_id']))
+    await asyncio.to_thread(tenant.verification_queue.set_message, request['user_id'], channel.id, message.id)
+    return f"posted for review in {channel.mention}"
+
+async def resolve_verification_requests(tenant, user_ids, approved, admin_name):
+    """Approve (whitelist in one store write) or deny a tenant's pending requests.
+
+    Returns the requests that were still pending; their review messages are
+    updated concurrently and lose their buttons.
+    """
+    requests = await asyncio.to_thread(tenant.verification_queue.pop_many, user_ids)
+    if not requests:
+        return []
+    if approved:
+        await tenant.service.add_many_async(requests, added_by=admin_name)
+    
+    outcome = {'approved': approved, 'by': admin_name}
+    semaphore = asyncio.Semaphore(ADMIN_DM_CONCURRENCY)
+    
+    async def close_review_message(request):
+        if not request['message_id']:
+            return
+        channel = bot.get_channel(request['channel_id'])
+        if channel is None:
+            return
+        async with semaphore:
+            try:
+                await channel.get_partial_message(request['message_id']).edit(
+                    embed=verification_embed(request, outcome, tenant), view=None)
+            except discord.HTTPException as e:
+                print(f"⚠️  Could not update review message for {request['user_id']}: {e}")
+    
+    await asyncio.gather(*(close_review_message(request) for request in requests))
+    return requests
+
+@bot.event
+async def on_interaction(interaction):
+    custom_id = (interaction.data or {}).get('custom_id', '')
+    if interaction.type != discord.InteractionType.component or not custom_id.startswith('verify:'):
+        return
+    
+    # verify:<action>:<user_id>[:<tenant>]; buttons from before tenants belong to the default one
+    _, action, user_id, *tenant_id = custom_id.split(':')
+    tenant = tenants.get(tenant_id[0]) if tenant_id else tenants.default
+    if tenant is None:
+        await interaction.response.send_message("ℹ️ This request's whitelist no longer exists.", ephemeral=True)
+        return
+    if not isinstance(interaction.user, discord.Member) or not admin_directory.is_admin(interaction.user):
+        await interaction.response.send_message("❌ You don't have permission to review verification requests.", ephemeral=True)
+        return
+    
+    await interaction.response.defer()
+    resolved = await resolve_verification_requests(tenant, [int(user_id)], action == 'approve', interaction.user.name)
+    if not resolved:
+        await interaction.followup.send("ℹ️ This request was already handled.", ephemeral=True)
+
 @bot.command(name='verify')
 async def verify_command(ctx, roblox_username: str = None):
     """Request whitelist access"""
@@ -397,52 +638,84 @@ async def verify_command(ctx, roblox_username: str = None):
         await ctx.send("❌ Please provide your Roblox username: `!verify YourRobloxUsername`")
         return
     
-    result = api_verify_username(roblox_username)
+    # Requests go to the whitelist of the server they were sent from
+    tenant = tenants.for_guild(ctx.guild.id if ctx.guild else None)
+    queue = tenant.verification_queue
     
-    if not result or not result.get('success'):
-        await ctx.send("❌ Could not verify Roblox username. Please check the spelling.")
-        return
-    
-    user_id = result['user_id']
-    verified_username = result['username']
-    is_whitelisted = result['whitelisted']
+    # Repeat requests are answered from the queue without asking Roblox again
+    pending = queue.find_username(roblox_username)
+    if pending is None:
+        result = await tenant.service.verify_async(roblox_username)
+        
+        if not result or not result.get('success'):
+            await ctx.send("❌ Could not verify Roblox username. Please check the spelling.")
+            return
+        
+        user_id = result['user_id']
+        verified_username = result['username']
+        
+        if result['whitelisted']:
+            embed = discord.Embed(
+                title="✅ Already Whitelisted!",
+                description=f"**{verified_username}** (`{user_id}`) is already whitelisted!",
+                color=0x00ff00
+            )
+            await ctx.send(embed=embed)
+            return
+    else:
+        user_id, verified_username = pending['user_id'], pending['username']
     
-    if is_whitelisted:
-        embed = discord.Embed(
-            title="✅ Already Whitelisted!",
-            description=f"**{verified_username}** (`{user_id}`) is already whitelisted!",
-            color=0x00ff00
-        )
-        await ctx.send(embed=embed)
+    request, created = await asyncio.to_thread(
+        queue.add, user_id, verified_username, ctx.author.id, ctx.author.name)
+    if not created:
+        await ctx.send(f"⏳ A verification request for **{verified_username}** is already waiting for admin review.")
         return
     
-    embed = discord.Embed(
-        title="🔒 Verification Request",
-        color=0xffa500
-    )
-    embed.description = f"**Player:** {verified_username}\n**UserID:** `{user_id}`\n**Discord User:** {ctx.author.mention}"
-    embed.add_field(
-        name="Actions",
-        value=f"✅ Approve: `!whitelist add {user_id}`\n❌ Remove: `!whitelist remove {user_id}`",
-        inline=False
-    )
-    embed.add_field(
-        name="Profile",
-        value=f"[View Roblox Profile](https://www.roblox.com/users/{user_id}/profile)",
-        inline=False
-    )
-    
-    # Send to admins
-    admin_count = 0
-    for member in ctx.guild.members:
-        if member.guild_permissions.administrator and not member.bot:
-            try:
-                await member.send(embed=embed)
-                admin_count += 1
-            except:
-                pass
+    destination = await post_verification_request(tenant, ctx.guild, request)
+    await ctx.send(f"✅ Verification request for **{verified_username}** {destination}!")
+
+@bot.command(name='queue')
+@is_admin()
+async def queue_command(ctx, action: str = 'list', *targets: str):
+    """Review pending verification requests"""
+    action = action.lower()
+    tenant = tenants.for_guild(ctx.guild.id if ctx.guild else None)
     
-    await ctx.send(f"✅ Verification request for **{verified_username}** sent to {admin_count} admins!")
+    if action == 'list':
+        pending = tenant.verification_queue.pending()
+        if not pending:
+            await ctx.send("📭 No pending verification requests.")
+            return
+        lines = [f"• `{request['user_id']}` {request['username']} ({request['discord_user']}, {request['requested_at']})"
+                 for request in pending[:20]]
+        embed = discord.Embed(title="📨 Pending Verification Requests", description="\n".join(lines), color=0xffa500)
+        embed.set_footer(text=f"Total: {len(pending)} - !queue approve all | !queue approve ID... | !queue deny ID...")
+        await ctx.send(embed=embed)
+        
+    elif action in ('approve', 'deny'):
+        if not targets:
+            await ctx.send(f"❌ Please provide UserIDs or `all`: `!queue {action} USERID [USERID...]`")
+            return
+        try:
+            if [target.lower() for target in targets] == ['all']:
+                user_ids = [request['user_id'] for request in tenant.verification_queue.pending()]
+            else:
+                user_ids = [int(target) for target in targets]
+        except ValueError:
+            await ctx.send("❌ UserIDs must be numbers.")
+            return
+        
+        resolved = await resolve_verification_requests(tenant, user_ids, action == 'approve', ctx.author.name)
+        if not resolved:
+            await ctx.send("ℹ️ None of those requests are pending.")
+            return
+        verb = "Approved and whitelisted" if action == 'approve' else "Denied"
+        names = ", ".join(request['username'] for request in resolved[:20])
+        more = f" and {len(resolved) - 20} more" if len(resolved) > 20 else ""
+        await ctx.send(f"✅ {verb} {len(resolved)} request(s): {names}{more}")
+        
+    else:
+        await ctx.send("❌ Invalid action. Use `list`, `approve`, or `deny`")
 
 @bot.command(name='status')
 async def status_command(ctx):
@@ -455,20 +728,15 @@ async def status_command(ctx):
     embed.add_field(name="Server", value=ctx.guild.name, inline=True)
     embed.add_field(name="Ping", value=f"{round(bot.latency * 1000)}ms", inline=True)
     
-    # Test API connectivity using localhost
+    # The bot shares the web server's whitelist service, so no HTTP probe is needed
     try:
-        port = os.environ.get('PORT', '8080')
-        response = requests.get(f"http://localhost:{port}/whitelist", timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            user_count = len(data.get('whitelist', []))
-            embed.add_field(name="Web API", value="✅ Live", inline=True)
-            embed.add_field(name="Whitelisted Users", value=str(user_count), inline=True)
-        else:
-            embed.add_field(name="Web API", value="❌ API Error", inline=True)
-            embed.add_field(name="Whitelisted Users", value="Unknown", inline=True)
-    except:
-        embed.add_field(name="Web API", value="❌ Unreachable", inline=True)
+        embed.add_field(name="Whitelist Store", value="✅ Live", inline=True)
+        tenant = tenants.for_guild(ctx.guild.id if ctx.guild else None)
+        if len(tenants) > 1:
+            embed.add_field(name="Tenant", value=tenant.id, inline=True)
+        embed.add_field(name="Whitelisted Users", value=str(tenant.service.count()), inline=True)
+    except Exception:
+        embed.add_field(name="Whitelist Store", value="❌ Unavailable", inline=True)
         embed.add_field(name="Whitelisted Users", value="Unknown", inline=True)
     
     embed.add_field(name="API URL", value=WEB_API_URL, inline=False)
@@ -490,7 +758,7 @@ async def help_command(ctx):
     
     embed.add_field(
         name="👑 Admin Commands",
-        value="`!whitelist add USERID` - Add user\n`!whitelist remove USERID` - Remove user\n`!whitelist list` - Show users\n`!whitelist check USERID` - Check status\n`!whitelist api` - API endpoints\n`!setup` - Setup guide",
+        value="`!whitelist add USERID [EXPIRES]` - Add user (e.g. `7d` for a week)\n`!whitelist remove USERID` - Remove user\n`!whitelist list` - Show users\n`!whitelist check USERID` - Check status\n`!whitelist api` - API endpoints\n`!queue` - Pending verification requests\n`!queue approve all|USERID...` - Approve requests\n`!queue deny USERID...` - Deny requests\n`!setup` - Setup guide",
         inline=False
     )
     
@@ -546,11 +814,17 @@ def start_discord_bot():
     else:
         print("❌ No valid BOT_TOKEN configured - Discord bot disabled")
 
+def start_discord_bot_when_elected(start=start_discord_bot):
+    """Start the bot in exactly one of the processes serving DATA_DIR"""
+    if replica:
+        print("🤖 Discord bot runs on the replication leader, not on replicas")
+        return
+    lock = run_when_elected(os.path.join(DATA_DIR, 'discord_bot.lock'), start)
+    if not lock.held:
+        print(f"🤖 Discord bot runs in another process; worker {os.getpid()} will take over if it exits")
+
 # === WEB FORM ROUTES ===
-@app.route('/admin')
-def admin_panel():
-    """Web interface for managing whitelist"""
-    return render_template_string('''
+ADMIN_TEMPLATE = '''
     <!DOCTYPE html>
     <html>
     <head>
@@ -563,7 +837,7 @@ def admin_panel():
                 background: #f5f5f5;
             }
             .container {
-                max-width: 600px;
+                max-width: 900px;
                 background: white;
                 padding: 30px;
                 border-radius: 10px;
@@ -606,6 +880,13 @@ def admin_panel():
                 border-radius: 4px;
                 margin: 10px 0;
             }
+            table { width: 100%; border-collapse: collapse; margin-top: 10px; }
+            th, td { text-align: left; padding: 6px 8px; border-bottom: 1px solid #eee; font-size: 14px; }
+            th { background: #fafafa; }
+            td button { padding: 4px 10px; margin: 0; }
+            select { padding: 9px; border: 1px solid #ccc; border-radius: 4px; }
+            .pager { margin-top: 10px; }
+            .pager a { margin-right: 10px; }
             h1 { color: #333; }
             h3 { color: #555; margin-bottom: 15px; }
         </style>
@@ -619,6 +900,7 @@ def admin_panel():
                 <h3>➕ Add User to Whitelist</h3>
                 <form action="/web_add_user" method="post">
                     <input type="text" name="user_id" placeholder="Roblox User ID" required>
+                    <input type="text" name="expires_at" placeholder="Expires (e.g. 7d, optional)">
                     <button type="submit" class="add-btn">Add User</button>
                 </form>
             </div>
@@ -632,11 +914,47 @@ def admin_panel():
                 </form>
             </div>
 
-            <!-- Current Whitelist Info -->
+            <!-- Current Whitelist -->
             <div class="form-group">
                 <h3>📋 Current Whitelist</h3>
+                <form action="/admin" method="get">
+                    <input type="text" name="q" value="{{ query }}" placeholder="Search (prefix)">
+                    <select name="field">
+                        {% for name, label in search_fields %}
+                        <option value="{{ name }}" {{ 'selected' if name == field else '' }}>{{ label }}</option>
+                        {% endfor %}
+                    </select>
+                    <button type="submit" class="view-btn">Search</button>
+                </form>
+                <p>{{ total }} matching user{{ '' if total == 1 else 's' }}</p>
+                {% if users %}
+                <table>
+                    <tr><th>User ID</th><th>Username</th><th>Discord User</th><th>Added By</th><th>Added At</th><th>Expires</th><th></th></tr>
+                    {% for user_id, user in users %}
+                    <tr>
+                        <td>{{ user_id }}</td>
+                        <td>{{ user.get('username', 'Unknown') }}</td>
+                        <td>{{ user.get('discord_user', '') }}</td>
+                        <td>{{ user.get('added_by', '') }}</td>
+                        <td>{{ user.get('added_at', '') }}</td>
+                        <td>{{ user['expires_at']|timestamp if user.get('expires_at') else 'Never' }}</td>
+                        <td>
+                            <form action="/web_remove_user" method="post">
+                                <input type="hidden" name="user_id" value="{{ user_id }}">
+                                <button type="submit" class="remove-btn">Remove</button>
+                            </form>
+                        </td>
+                    </tr>
+                    {% endfor %}
+                </table>
+                {% endif %}
+                <div class="pager">
+                    {% if page > 1 %}<a href="?q={{ query|urlencode }}&field={{ field }}&page={{ page - 1 }}">← Previous</a>{% endif %}
+                    <span>Page {{ page }} of {{ pages }}</span>
+                    {% if page < pages %}<a href="?q={{ query|urlencode }}&field={{ field }}&page={{ page + 1 }}">Next →</a>{% endif %}
+                </div>
                 <a href="/whitelist" target="_blank">
-                    <button type="button" class="view-btn">View Full Whitelist</button>
+                    <button type="button" class="view-btn">View Raw JSON</button>
                 </a>
             </div>
 
@@ -658,24 +976,61 @@ def admin_panel():
         </div>
     </body>
     </html>
-    ''', message=request.args.get('message'), message_type=request.args.get('type'), user_count=len(whitelist_data))
+    '''
+
+# Parsed and compiled once at import instead of on every request
+admin_template = app.jinja_env.from_string(ADMIN_TEMPLATE)
+
+ADMIN_PAGE_SIZE = 25
+ADMIN_SEARCH_FIELDS = [('username', 'Username'), ('discord_user', 'Discord User'), ('added_by', 'Added By')]
+
+@app.route('/admin')
+def admin_panel():
+    """Web interface for managing whitelist"""
+    query = request.args.get('q', '').strip()
+    field = request.args.get('field', 'username')
+    if field not in search_index.fields:
+        field = 'username'
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+    except ValueError:
+        page = 1
+    
+    total, user_ids = search_index.search(query, field, (page - 1) * ADMIN_PAGE_SIZE, ADMIN_PAGE_SIZE)
+    snapshot = whitelist_service.snapshot()
+    users = [(user_id, snapshot.get(user_id) or {}) for user_id in user_ids]
+    
+    return admin_template.render(
+        message=request.args.get('message'),
+        message_type=request.args.get('type'),
+        user_count=whitelist_service.count(),
+        query=query,
+        field=field,
+        search_fields=ADMIN_SEARCH_FIELDS,
+        users=users,
+        total=total,
+        page=page,
+        pages=max(1, (total + ADMIN_PAGE_SIZE - 1) // ADMIN_PAGE_SIZE)
+    )
+
+@app.template_filter('timestamp')
+def format_timestamp(value):
+    """Unix seconds as local time, in the added_at format"""
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(value))
 
 @app.route('/web_add_user', methods=['POST'])
 def web_add_user():
     """Add a user to whitelist via web form"""
     user_id = request.form['user_id'].strip()
     
+    try:
+        expires_at = parse_expires_at(request.form.get('expires_at', '').strip())
+    except ValueError as e:
+        return redirect('/admin?message=%s&type=error' % str(e))
+    
     try:
         user_id = int(user_id)
-        username = get_roblox_username(user_id) or f"User_{user_id}"
-        
-        with data_lock:
-            whitelist_data[user_id] = {
-                'username': username,
-                'discord_user': 'Web_Admin',
-                'added_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
-                'added_by': 'Web_Form'
-            }
+        whitelist_service.add(user_id, discord_user='Web_Admin', added_by='Web_Form', expires_at=expires_at)
         
         return redirect('/admin?message=User %s added successfully!&type=success' % user_id)
         
@@ -692,36 +1047,283 @@ def web_remove_user():
     try:
         user_id = int(user_id)
         
-        with data_lock:
-            if user_id in whitelist_data:
-                removed_user = whitelist_data[user_id]
-                del whitelist_data[user_id]
-                return redirect('/admin?message=User %s removed successfully!&type=success' % user_id)
-            else:
-                return redirect('/admin?message=User %s not found in whitelist&type=error' % user_id)
+        if whitelist_service.remove(user_id) is not None:
+            return redirect('/admin?message=User %s removed successfully!&type=success' % user_id)
+        else:
+            return redirect('/admin?message=User %s not found in whitelist&type=error' % user_id)
                 
     except ValueError:
         return redirect('/admin?message=Invalid User ID format&type=error')
     except Exception as e:
         return redirect('/admin?message=Error: %s&type=error' % str(e))
 
+# === REQUEST METRICS ===
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, route, request.method)
+        HTTP_REQUESTS.inc(route, request.method, response.status_code)
+    return response
+
+# Roblox lookups made while handling a request share its budget
+@app.before_request
+def start_roblox_budget():
+    if ROBLOX_REQUEST_BUDGET > 0:
+        g.roblox_budget = set_budget(ROBLOX_REQUEST_BUDGET)
+
+@app.teardown_request
+def end_roblox_budget(error=None):
+    token = g.pop('roblox_budget', None)
+    if token is not None:
+        reset_budget(token)
+
+# === RATE LIMITING ===
+# (requests per second, burst) per client for each route, by endpoint name.
+# RATE_LIMITS='{"verify_username": [0.5, 3]}' overrides entries (null removes
+# one); RATE_LIMITS=off disables rate limiting.
+DEFAULT_RATE_LIMITS = {
+    'check_whitelist': (50, 100),
+    'check_whitelist_batch': (5, 10),
+    'webhook_verify': (20, 40),
+    'verify_username': (1, 5),
+}
+# /verify requests allowed at once; each may wait on Roblox (0 = no cap)
+VERIFY_MAX_IN_FLIGHT = int(os.environ.get('VERIFY_MAX_IN_FLIGHT', '4'))
+# Known API keys (JSON list) get their own buckets; everyone else is limited by IP
+API_KEYS = set(json.loads(os.environ.get('API_KEYS', '[]')))
+# Proxies in front of us appending to X-Forwarded-For (Railway adds one)
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', '0'))
+
+def load_rate_limits():
+    setting = os.environ.get('RATE_LIMITS', '').strip()
+    if setting.lower() == 'off':
+        return {}
+    limits = dict(DEFAULT_RATE_LIMITS)
+    if setting:
+        try:
+            for endpoint, limit in json.loads(setting).items():
+                if limit is None:
+                    limits.pop(endpoint, None)
+                else:
+                    limits[endpoint] = tuple(limit)
+        except Exception as e:
+            print(f"❌ Invalid RATE_LIMITS ({e}), using defaults")
+    return limits
+
+rate_limiters = {endpoint: TokenBucketLimiter(rate, burst) for endpoint, (rate, burst) in load_rate_limits().items()}
+in_flight_limits = {'verify_username': ConcurrencyLimit(VERIFY_MAX_IN_FLIGHT)} if VERIFY_MAX_IN_FLIGHT > 0 else {}
+
+def client_key(headers=None, remote_addr=None):
+    """Rate-limit identity: a known API key, else the client IP (of the current request by default)"""
+    if headers is None:
+        headers, remote_addr = request.headers, request.remote_addr
+    api_key = headers.get('X-API-Key')
+    if api_key and api_key in API_KEYS:
+        return 'key:' + api_key
+    if TRUSTED_PROXY_HOPS:
+        # Only the entries our own proxies appended can be trusted
+        forwarded = [ip.strip() for ip in headers.get('X-Forwarded-For', '').split(',') if ip.strip()]
+        if forwarded:
+            return forwarded[-min(TRUSTED_PROXY_HOPS, len(forwarded))]
+    return remote_addr
+
+def too_many_requests(retry_after, message):
+    retry_after = max(1, math.ceil(retry_after))
+    response = jsonify({'error': message, 'retry_after': retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+@app.before_request
+def enforce_rate_limits():
+    endpoint = request.endpoint
+    limiter = rate_limiters.get(endpoint)
+    if limiter is not None:
+        retry_after = limiter.acquire(client_key())
+        if retry_after:
+            RATE_LIMITED.inc(endpoint, 'rate')
+            return too_many_requests(retry_after, 'Rate limit exceeded')
+    in_flight = in_flight_limits.get(endpoint)
+    if in_flight is not None:
+        if not in_flight.try_acquire():
+            RATE_LIMITED.inc(endpoint, 'in_flight')
+            return too_many_requests(1, 'Server busy, try again shortly')
+        g.in_flight = in_flight
+
+@app.teardown_request
+def release_in_flight(error=None):
+    in_flight = g.pop('in_flight', None)
+    if in_flight is not None:
+        in_flight.release()
+
+# === REPLICATION ===
+# Endpoints that change the whitelist; replicas send these to the leader
+WRITE_ENDPOINTS = {
+    'add_to_whitelist', 'remove_from_whitelist', 'remove_from_whitelist_direct', 'add_user',
+    'import_whitelist', 'web_add_user', 'web_remove_user', 'register_webhook', 'unregister_webhook'
+}
+# Reads that only mean something on the leader
+LEADER_ENDPOINTS = {'list_webhooks'}
+FORWARDED_HEADERS = ('Content-Type', 'Content-Encoding', 'Accept', 'X-API-Key')
+# Hop-by-hop or re-encoded by requests, so not copied back from the leader
+SKIPPED_RESPONSE_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+REPLICATION_LOG_MAX = 10000
+REPLICATION_MAX_WAIT = 30
+
+def is_write_request():
+    # Replicas only follow the default tenant's log
+    if g.get('tenant') is not None:
+        return True
+    if request.endpoint in WRITE_ENDPOINTS or request.endpoint in LEADER_ENDPOINTS:
+        return True
+    if request.endpoint == 'webhook_verify':
+        return (request.get_json(silent=True) or {}).get('action', 'check') != 'check'
+    return False
+
+@app.before_request
+def forward_writes_to_leader():
+    if replica is None or not is_write_request():
+        return
+    headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+    forwarded_for = request.headers.get('X-Forwarded-For')
+    headers['X-Forwarded-For'] = f"{forwarded_for}, {request.remote_addr}" if forwarded_for else request.remote_addr
+    try:
+        upstream = replica.forward(request.method, request.full_path, headers,
+                                   request.get_data() if request.content_length is not None else request.stream)
+    except Exception as e:
+        return jsonify({'error': f'Replication leader unavailable: {e}'}), 503
+    # Read-your-writes: hold the response until the change has replicated here
+    leader_seq = upstream.headers.get('X-Whitelist-Seq')
+    if leader_seq and g.get('tenant') is None:
+        replica.wait_for(int(leader_seq))
+    headers = [(name, value) for name, value in upstream.headers.items() if name.lower() not in SKIPPED_RESPONSE_HEADERS]
+    return Response(upstream.content, status=upstream.status_code, headers=headers)
+
+@app.after_request
+def add_seq_header(response):
+    response.headers['X-Whitelist-Seq'] = str(current_tenant().store.seq)
+    return response
+
+@app.route('/replication/log', methods=['GET'])
+def replication_log():
+    """Raw change log for replicas
+
+    Returns entries after `after` (up to `limit`), waiting up to `wait`
+    seconds for new ones. `resync: true` means the replica is too far behind
+    and should load /whitelist?format=ndjson instead.
+    """
+    try:
+        after = int(request.args['after'])
+        limit = min(int(request.args.get('limit', REPLICATION_LOG_MAX)), REPLICATION_LOG_MAX)
+        wait = min(float(request.args.get('wait', 0)), REPLICATION_MAX_WAIT)
+    except (KeyError, ValueError):
+        return jsonify({'error': 'Invalid after, limit or wait'}), 400
+    
+    if wait > 0 and store.seq == after:
+        change_notifier.wait_for(after + 1, wait)
+    result = store.log_after(after, limit)
+    if result is None:
+        return jsonify({'resync': True, 'seq': store.seq})
+    seq, entries = result
+    return json_response({'resync': False, 'seq': seq, 'entries': entries})
+
+@app.route('/replication/status', methods=['GET'])
+def replication_status():
+    """This node's role, and replication lag on replicas"""
+    if replica is None:
+        return jsonify({'role': 'leader', 'seq': store.seq})
+    return jsonify(replica.status())
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text exposition of all metrics"""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+# === RESPONSE CACHE ===
+# Encoded bodies of /, /status and /whitelist, reused until the store changes
+response_cache = ResponseCache(store, max_entries=int(os.environ.get('RESPONSE_CACHE_ENTRIES', '256')),
+                               max_bytes=int(os.environ.get('RESPONSE_CACHE_MB', '256')) * 1024 ** 2)
+CallbackCounter('http_response_cache_total', 'Response cache lookups by result', ('result',),
+                function=lambda: {(name,): value for name, value in response_cache.stats().items()
+                                  if name in ('hits', 'misses', 'not_modified')})
+# /status also reports live counters, so its entries expire even without writes
+STATUS_CACHE_TTL = float(os.environ.get('STATUS_CACHE_TTL', '1'))
+CACHED_HEADERS = ('Content-Type', 'Content-Encoding', 'Vary')
+
+def not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response_cache.count_not_modified()
+    return response
+
+def cached_response(ttl=None, bypass=None):
+    """Serve a GET route from response_cache, with a strong ETag and 304s.
+
+    Only 200 responses are cached; requests for which bypass() is true
+    (e.g. streamed variants) and tenant routes, whose stores the cache does
+    not track, go straight to the view.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if (bypass is not None and bypass()) or g.get('tenant') is not None:
+                return view(*args, **kwargs)
+            key = (request.path, request.query_string, client_accepts_gzip())
+            # The view reads this snapshot or a newer one, so a body is never older than its ETag
+            seq = store.snapshot().seq
+            # The ETag only depends on (seq, key): no lookup needed to revalidate
+            if ttl is None and request.if_none_match.contains(ResponseCache.etag(seq, key)):
+                return not_modified(ResponseCache.etag(seq, key))
+            entry = response_cache.get(key)
+            if entry is None:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                headers = [(name, response.headers[name]) for name in CACHED_HEADERS if name in response.headers]
+                entry = response_cache.put(key, seq, response.get_data(), headers, ttl)
+                if entry is None:
+                    return response
+            if request.if_none_match.contains(entry.etag):
+                return not_modified(entry.etag)
+            response = Response(entry.body, headers=entry.headers)
+            response.set_etag(entry.etag)
+            return response
+        return wrapper
+    return decorator
+
 # API Routes
 @app.route('/')
+@cached_response()
 def home():
     return jsonify({
         "status": "online",
         "service": "Roblox Whitelist API",
         "timestamp": time.time(),
-        "whitelisted_users_count": len(whitelist_data),
+        "whitelisted_users_count": whitelist_service.count(),
         "endpoints": {
             "check_whitelist": f"{get_full_url('check_whitelist?user_id=123')}",
+            "check_whitelist_batch": f"{get_full_url('check_whitelist/batch')} (POST)",
             "verify_user": f"{get_full_url('verify?username=RobloxUser')}",
             "get_whitelist": f"{get_full_url('whitelist')}",
+            "whitelist_changes": f"{get_full_url('whitelist/changes?since=SEQ')}",
+            "whitelist_import": f"{get_full_url('whitelist/import?format=csv')} (POST)",
+            "whitelist_export": f"{get_full_url('whitelist/export?format=csv')}",
             "server_status": f"{get_full_url('status')}",
+            "metrics": f"{get_full_url('metrics')}",
+            "replication_status": f"{get_full_url('replication/status')}",
+            "webhooks": f"{get_full_url('webhooks')} (GET, POST, DELETE /webhooks/<id>)",
             "webhook_verify": f"{get_full_url('webhook_verify')} (POST)",
             "add_user": f"{get_full_url('whitelist/add')} (POST)",
             "remove_user": f"{get_full_url('whitelist/remove')} (POST)",
             "remove_user_direct": f"{get_full_url('whitelist/<user_id>')} (DELETE)",
+            "tenant_routes": f"{get_full_url('t/<tenant>/whitelist')} (and the other whitelist routes)",
             "web_admin_panel": f"{get_full_url('admin')}"
         }
     })
@@ -735,18 +1337,55 @@ def check_whitelist():
     
     try:
         user_id = int(user_id)
-        with data_lock:
-            is_whitelisted = user_id in whitelist_data
-            
-            return jsonify({
-                'whitelisted': is_whitelisted,
-                'user_id': user_id,
-                'username': whitelist_data.get(user_id, {}).get('username', 'Unknown'),
-                'discord_user': whitelist_data.get(user_id, {}).get('discord_user', 'Unknown')
-            })
+        return jsonify(current_service().check(user_id))
     except ValueError:
         return jsonify({'error': 'Invalid user_id'}), 400
 
+# Upper bound on IDs per batch request, to keep one request from hogging a worker
+MAX_BATCH_IDS = int(os.environ.get('MAX_BATCH_IDS', '50000'))
+
+@app.route('/check_whitelist/batch', methods=['POST'])
+def check_whitelist_batch():
+    """Check many user IDs at once (e.g. every player on a game server)
+
+    Body: {"user_ids": [...], "format": "list" | "bitmap"}. The list format
+    returns the whitelisted IDs; the bitmap format returns base64 bits in
+    request order (bit i of byte i // 8, LSB first, set = whitelisted).
+    """
+    payload, status_code = batch_check(request.get_json(silent=True) or {})
+    return jsonify(payload), status_code
+
+def batch_check(data):
+    """Body and status code for a /check_whitelist/batch request body"""
+    try:
+        user_ids = data.get('user_ids')
+        
+        if not isinstance(user_ids, list) or not user_ids:
+            return {'error': 'No user_ids provided'}, 400
+        if len(user_ids) > MAX_BATCH_IDS:
+            return {'error': f'Too many user_ids (max {MAX_BATCH_IDS})'}, 400
+        
+        user_ids = [int(user_id) for user_id in user_ids]
+        whitelisted = current_service().check_batch(user_ids)
+        
+        response = {
+            'count': len(user_ids),
+            'whitelisted_count': len(whitelisted)
+        }
+        if data.get('format') == 'bitmap':
+            allowed = set(whitelisted)
+            bitmap = bytearray((len(user_ids) + 7) // 8)
+            for i, user_id in enumerate(user_ids):
+                if user_id in allowed:
+                    bitmap[i >> 3] |= 1 << (i & 7)
+            response['bitmap'] = base64.b64encode(bytes(bitmap)).decode()
+        else:
+            response['whitelisted'] = whitelisted
+        return response, 200
+        
+    except (TypeError, ValueError):
+        return {'error': 'Invalid user_id in user_ids'}, 400
+
 @app.route('/verify', methods=['GET'])
 def verify_username():
     """Verify Roblox username and get UserID"""
@@ -755,41 +1394,214 @@ def verify_username():
     if not username:
         return jsonify({'error': 'No username provided'}), 400
     
-    user_id, verified_username = get_roblox_user_id(username)
+    result = current_service().verify(username)
     
-    if user_id:
-        with data_lock:
-            is_whitelisted = user_id in whitelist_data
-            
-        return jsonify({
-            'success': True,
-            'user_id': user_id,
-            'username': verified_username,
-            'whitelisted': is_whitelisted,
-            'profile_url': f'https://www.roblox.com/users/{user_id}/profile'
-        })
+    if result:
+        return jsonify(result)
     else:
         return jsonify({
             'success': False,
             'error': 'User not found on Roblox'
         }), 404
 
+# Largest page /whitelist?limit= will return
+WHITELIST_PAGE_MAX = 1000
+# Bytes of NDJSON buffered before each chunk is sent (and compressed)
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def client_accepts_gzip():
+    return 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+
+def gzip_chunks(chunks):
+    """Compress a stream of byte chunks into one gzip stream"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def json_response(payload):
+    """jsonify() equivalent that gzips the body when the client allows it"""
+    body = json.dumps(payload, separators=(',', ':')).encode()
+    headers = {'Vary': 'Accept-Encoding'}
+    if client_accepts_gzip():
+        body = b''.join(gzip_chunks([body]))
+        headers['Content-Encoding'] = 'gzip'
+    return Response(body, mimetype='application/json', headers=headers)
+
+def ndjson_chunks(snapshot):
+    """Header line, then one line per user, grouped into ~64KB chunks"""
+    yield json.dumps({'seq': snapshot.seq, 'total_count': len(snapshot)}).encode() + b'\n'
+    buffer = []
+    size = 0
+    for user_id, user_data in snapshot.items():
+        line = json.dumps({'user_id': user_id, **user_data}, separators=(',', ':')).encode() + b'\n'
+        buffer.append(line)
+        size += len(line)
+        if size >= STREAM_CHUNK_SIZE:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
 @app.route('/whitelist', methods=['GET'])
+@cached_response(bypass=lambda: request.args.get('format') == 'ndjson')
 def get_whitelist():
-    """Get all whitelisted users"""
-    with data_lock:
-        # Format the data for better readability
-        formatted_users = {}
-        for user_id, user_data in whitelist_data.items():
-            formatted_users[str(user_id)] = user_data
+    """Get all whitelisted users
+
+    Optional query parameters:
+      limit / cursor  - page through users ordered by ID; pass the returned
+                        next_cursor back as cursor until it is null
+      format=ndjson   - stream a consistent snapshot, one user per line
+    All variants are gzip-compressed when the client sends Accept-Encoding: gzip.
+    """
+    if request.args.get('format') == 'ndjson':
+        snapshot = current_service().snapshot()
+        chunks = ndjson_chunks(snapshot)
+        headers = {'Vary': 'Accept-Encoding'}
+        if client_accepts_gzip():
+            chunks = gzip_chunks(chunks)
+            headers['Content-Encoding'] = 'gzip'
+        return Response(stream_with_context(chunks), mimetype='application/x-ndjson', headers=headers)
+    
+    if 'limit' in request.args or 'cursor' in request.args:
+        try:
+            limit = min(int(request.args.get('limit', WHITELIST_PAGE_MAX)), WHITELIST_PAGE_MAX)
+            cursor = request.args.get('cursor')
+            cursor = int(cursor) if cursor else None
+        except ValueError:
+            return jsonify({'error': 'Invalid limit or cursor'}), 400
+        if limit < 1:
+            return jsonify({'error': 'Invalid limit or cursor'}), 400
         
-        return jsonify({
+        seq, users = current_service().list_page(cursor, limit)
+        return json_response({
             'status': 'success',
-            'whitelist': list(whitelist_data.keys()),
-            'whitelisted_users': formatted_users,
-            'total_count': len(whitelist_data),
+            'whitelist': [user_id for user_id, _ in users],
+            'whitelisted_users': {str(user_id): user_data for user_id, user_data in users},
+            'count': len(users),
+            'total_count': current_service().count(),
+            'next_cursor': str(users[-1][0]) if len(users) == limit else None,
+            'seq': seq,
             'timestamp': time.time()
         })
+    
+    seq, users = current_service().list_users_with_seq()
+    
+    # Format the data for better readability
+    formatted_users = {}
+    for user_id, user_data in users:
+        formatted_users[str(user_id)] = user_data
+    
+    return json_response({
+        'status': 'success',
+        'whitelist': [user_id for user_id, _ in users],
+        'whitelisted_users': formatted_users,
+        'total_count': len(users),
+        'seq': seq,
+        'timestamp': time.time()
+    })
+
+@app.route('/whitelist/changes', methods=['GET'])
+def get_whitelist_changes():
+    """Adds/removes since a sequence number, for servers polling for updates
+
+    Start from the `seq` returned by /whitelist, then pass each response's
+    `seq` as the next `since`. If the server no longer remembers that far
+    back the response has `resync: true` and the client should re-fetch
+    /whitelist.
+    """
+    since = request.args.get('since')
+    
+    if since is None:
+        return jsonify({'error': 'No since provided'}), 400
+    
+    try:
+        since = int(since)
+    except ValueError:
+        return jsonify({'error': 'Invalid since'}), 400
+    
+    result = current_service().changes_since(since)
+    if result is None:
+        return jsonify({
+            'status': 'resync',
+            'resync': True,
+            'message': 'Requested sequence is no longer available, fetch /whitelist again',
+            'since': since
+        })
+    
+    seq, added, removed = result
+    return jsonify({
+        'status': 'success',
+        'resync': False,
+        'since': since,
+        'seq': seq,
+        'added': [user_id for user_id, _ in added],
+        'added_users': {str(user_id): user_data for user_id, user_data in added},
+        'removed': removed
+    })
+
+@app.route('/whitelist/import', methods=['POST'])
+def import_whitelist():
+    """Bulk add users from a CSV or NDJSON request body
+
+    format=csv|ndjson (defaults from Content-Type); the body may be gzipped
+    with Content-Encoding: gzip. CSV needs a header row with user_id and any
+    of username, discord_user, added_at, added_by. Users without a username
+    are added immediately and their names are filled in from Roblox in the
+    background. Responds with a report of imported and rejected rows.
+    """
+    fmt = request.args.get('format')
+    if not fmt:
+        fmt = 'csv' if 'csv' in (request.content_type or '') else 'ndjson'
+    if fmt not in bulk.FORMATS:
+        return jsonify({'error': f'Invalid format. Use one of: {", ".join(bulk.FORMATS)}'}), 400
+    
+    try:
+        body = request.stream
+        if request.headers.get('Content-Encoding', '').lower() == 'gzip':
+            body = gzip.GzipFile(fileobj=body)
+        lines = io.TextIOWrapper(io.BufferedReader(body), encoding='utf-8', newline='')
+        tenant = current_tenant()
+        report = bulk.import_rows(
+            tenant.store,
+            bulk.parse_rows(lines, fmt),
+            backfill=tenant.backfill,
+            discord_user=request.args.get('discord_user', 'Import'),
+            added_by=request.args.get('added_by', 'Import')
+        )
+        print(f"📥 Imported {report['imported']}/{report['rows']} rows ({report['rows_per_second']} rows/s)")
+        return jsonify({'status': 'success', **report})
+    except (ValueError, OSError, EOFError) as e:
+        return jsonify({'error': f'Invalid import body: {e}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/whitelist/export', methods=['GET'])
+def export_whitelist():
+    """Stream a consistent snapshot of the whitelist as CSV or NDJSON
+
+    Gzip-compressed when the client sends Accept-Encoding: gzip.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in bulk.FORMATS:
+        return jsonify({'error': f'Invalid format. Use one of: {", ".join(bulk.FORMATS)}'}), 400
+    
+    snapshot = current_service().snapshot()
+    if fmt == 'csv':
+        chunks, mimetype = bulk.csv_chunks(snapshot), 'text/csv'
+    else:
+        chunks, mimetype = ndjson_chunks(snapshot), 'application/x-ndjson'
+    headers = {
+        'Vary': 'Accept-Encoding',
+        'Content-Disposition': f'attachment; filename=whitelist-{snapshot.seq}.{fmt}'
+    }
+    if client_accepts_gzip():
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
 
 @app.route('/whitelist/add', methods=['POST'])
 def add_to_whitelist():
@@ -800,29 +1612,28 @@ def add_to_whitelist():
         
         if not user_id:
             return jsonify({'error': 'No user_id provided'}), 400
+        try:
+            expires_at = parse_expires_at(data.get('expires_at'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         user_id = int(user_id)
-        username = data.get('username')
-        
-        if not username:
-            username = get_roblox_username(user_id) or f"User_{user_id}"
-        
-        discord_user = data.get('discord_user', 'API')
-        
-        with data_lock:
-            whitelist_data[user_id] = {
-                'username': username,
-                'discord_user': discord_user,
-                'added_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
-                'added_by': data.get('added_by', 'API')
-            }
+        user_data = current_service().add(
+            user_id,
+            username=data.get('username'),
+            discord_user=data.get('discord_user', 'API'),
+            added_by=data.get('added_by', 'API'),
+            expires_at=expires_at
+        )
+        username = user_data['username']
         
         return jsonify({
             'status': 'success',
             'message': f'User {username} ({user_id}) added to whitelist',
             'user_id': user_id,
             'username': username,
-            'whitelist': list(whitelist_data.keys())
+            'expires_at': expires_at,
+            'whitelist': current_service().ids()
         })
         
     except ValueError:
@@ -842,22 +1653,20 @@ def remove_from_whitelist():
         
         user_id = int(user_id)
         
-        with data_lock:
-            if user_id in whitelist_data:
-                removed_user = whitelist_data[user_id]
-                del whitelist_data[user_id]
-                return jsonify({
-                    'status': 'success',
-                    'message': f'User {removed_user.get("username", "Unknown")} ({user_id}) removed from whitelist',
-                    'user_id': user_id,
-                    'username': removed_user.get('username', 'Unknown'),
-                    'whitelist': list(whitelist_data.keys())
-                })
-            else:
-                return jsonify({
-                    'status': 'error',
-                    'message': f'User {user_id} not found in whitelist'
-                }), 404
+        removed_user = current_service().remove(user_id)
+        if removed_user is not None:
+            return jsonify({
+                'status': 'success',
+                'message': f'User {removed_user.get("username", "Unknown")} ({user_id}) removed from whitelist',
+                'user_id': user_id,
+                'username': removed_user.get('username', 'Unknown'),
+                'whitelist': current_service().ids()
+            })
+        else:
+            return jsonify({
+                'status': 'error',
+                'message': f'User {user_id} not found in whitelist'
+            }), 404
                 
     except ValueError:
         return jsonify({'error': 'Invalid user_id format'}), 400
@@ -873,36 +1682,106 @@ def remove_from_whitelist_direct(user_id):
         
         user_id = int(user_id)
         
-        with data_lock:
-            if user_id in whitelist_data:
-                removed_user = whitelist_data[user_id]
-                del whitelist_data[user_id]
-                return jsonify({
-                    'status': 'success',
-                    'message': f'User {removed_user.get("username", "Unknown")} ({user_id}) removed from whitelist',
-                    'user_id': user_id,
-                    'username': removed_user.get('username', 'Unknown'),
-                    'whitelist': list(whitelist_data.keys())
-                })
-            else:
-                return jsonify({
-                    'status': 'error',
-                    'message': f'User {user_id} not found in whitelist'
-                }), 404
+        removed_user = current_service().remove(user_id)
+        if removed_user is not None:
+            return jsonify({
+                'status': 'success',
+                'message': f'User {removed_user.get("username", "Unknown")} ({user_id}) removed from whitelist',
+                'user_id': user_id,
+                'username': removed_user.get('username', 'Unknown'),
+                'whitelist': current_service().ids()
+            })
+        else:
+            return jsonify({
+                'status': 'error',
+                'message': f'User {user_id} not found in whitelist'
+            }), 404
                 
     except ValueError:
         return jsonify({'error': 'Invalid user_id format'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# === WEBHOOKS ===
+def api_key_required():
+    """403 response unless the request carries a known X-API-Key.
+
+    Webhook subscribers make this server POST to URLs of their choosing, so
+    unlike the other routes these stay closed until API_KEYS is set.
+    """
+    if not API_KEYS:
+        return jsonify({'error': 'Webhook management is disabled until API_KEYS is configured'}), 403
+    if request.headers.get('X-API-Key') not in API_KEYS:
+        return jsonify({'error': 'A valid X-API-Key is required'}), 403
+    return None
+
+@app.route('/webhooks', methods=['POST'])
+def register_webhook():
+    """Subscribe a URL to whitelist change pushes
+
+    Body: {"url": "...", "secret": optional}. Deliveries are POSTed as JSON in
+    the /whitelist/changes format, signed in X-Whitelist-Signature
+    (sha256=HMAC of "<X-Whitelist-Timestamp>.<body>" with the secret), and
+    start with the changes after the returned seq, so fetch /whitelist first.
+    """
+    denied = api_key_required()
+    if denied:
+        return denied
+    data = request.get_json(silent=True) or {}
+    url = data.get('url')
+    try:
+        check_url(url, allow_private=WEBHOOK_ALLOW_PRIVATE_URLS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    secret = data.get('secret')
+    if secret is not None and (not isinstance(secret, str) or len(secret) < 16):
+        return jsonify({'error': 'secret must be a string of at least 16 characters'}), 400
+    
+    subscriber = webhook_registry.add(url, secret, cursor=store.seq)
+    return jsonify({
+        'status': 'success',
+        'id': subscriber['id'],
+        'url': subscriber['url'],
+        'secret': subscriber['secret'],
+        'seq': subscriber['cursor']
+    }), 201
+
+@app.route('/webhooks', methods=['GET'])
+def list_webhooks():
+    """Subscribers with their cursor, lag and delivery errors"""
+    denied = api_key_required()
+    if denied:
+        return denied
+    webhook_registry.reload()
+    return jsonify({'seq': store.seq, 'subscribers': webhook_dispatcher.status()})
+
+@app.route('/webhooks/<subscriber_id>', methods=['DELETE'])
+def unregister_webhook(subscriber_id):
+    denied = api_key_required()
+    if denied:
+        return denied
+    if webhook_registry.remove(subscriber_id) is None:
+        return jsonify({'error': 'Subscriber not found'}), 404
+    return jsonify({'status': 'success', 'id': subscriber_id})
+
 @app.route('/status', methods=['GET'])
+@cached_response(ttl=STATUS_CACHE_TTL)
 def status():
     """Get server status"""
     return jsonify({
         'status': 'online',
         'timestamp': time.time(),
-        'users_whitelisted': len(whitelist_data),
+        'users_whitelisted': whitelist_service.count(),
         'special_users': list(PRE_WHITELISTED_USERS.keys()),
+        'roblox_cache': roblox_client.stats(),
+        'username_backfill': username_backfill.stats(),
+        'store_backend': STORE_BACKEND,
+        'worker_pid': os.getpid(),
+        'replication': replica.status() if replica else {'role': 'leader'},
+        'response_cache': response_cache.stats(),
+        'webhook_subscribers': len(webhook_registry),
+        'expiry': expiry_scheduler.stats(),
+        'tenants': tenants.stats(),
         'service': 'Roblox Whitelist API'
     })
 
@@ -921,50 +1800,40 @@ def webhook_verify():
         user_id = int(user_id)
         
         if action == 'check':
-            with data_lock:
-                is_whitelisted = user_id in whitelist_data
-                user_data = whitelist_data.get(user_id, {})
-            
-            return jsonify({
-                'whitelisted': is_whitelisted,
-                'user_id': user_id,
-                'username': user_data.get('username', 'Unknown'),
-                'discord_user': user_data.get('discord_user', 'Unknown')
-            })
+            return jsonify(current_service().check(user_id))
             
         elif action == 'add':
-            username = data.get('username')
-            if not username:
-                username = get_roblox_username(user_id) or f"User_{user_id}"
-                
-            discord_user = data.get('discord_user', 'API')
-            
-            with data_lock:
-                whitelist_data[user_id] = {
-                    'username': username,
-                    'discord_user': discord_user,
-                    'added_at': data.get('added_at', time.strftime('%Y-%m-%dT%H:%M:%S')),
-                    'added_by': data.get('added_by', 'API')
-                }
+            try:
+                expires_at = parse_expires_at(data.get('expires_at'))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            user_data = current_service().add(
+                user_id,
+                username=data.get('username'),
+                discord_user=data.get('discord_user', 'API'),
+                added_by=data.get('added_by', 'API'),
+                added_at=data.get('added_at'),
+                expires_at=expires_at
+            )
+            username = user_data['username']
             
             return jsonify({
                 'success': True,
                 'message': f'User {username} ({user_id}) added to whitelist',
                 'user_id': user_id,
-                'username': username
+                'username': username,
+                'expires_at': expires_at
             })
             
         elif action == 'remove':
-            with data_lock:
-                if user_id in whitelist_data:
-                    removed_user = whitelist_data[user_id]
-                    del whitelist_data[user_id]
-                    return jsonify({
-                        'success': True, 
-                        'message': f'User {removed_user.get("username", "Unknown")} removed from whitelist'
-                    })
-                else:
-                    return jsonify({'error': 'User not in whitelist'}), 404
+            removed_user = current_service().remove(user_id)
+            if removed_user is not None:
+                return jsonify({
+                    'success': True, 
+                    'message': f'User {removed_user.get("username", "Unknown")} removed from whitelist'
+                })
+            else:
+                return jsonify({'error': 'User not in whitelist'}), 404
         
         else:
             return jsonify({'error': 'Invalid action. Use "check", "add", or "remove"'}), 400
@@ -982,30 +1851,55 @@ def add_user():
         
         if not user_id:
             return jsonify({'error': 'No user_id provided'}), 400
+        try:
+            expires_at = parse_expires_at(data.get('expires_at'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         user_id = int(user_id)
-        
-        if not username:
-            username = get_roblox_username(user_id) or f"User_{user_id}"
-        
-        with data_lock:
-            whitelist_data[user_id] = {
-                'username': username,
-                'discord_user': data.get('discord_user', 'Manual'),
-                'added_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
-                'added_by': data.get('added_by', 'Manual')
-            }
+        user_data = current_service().add(
+            user_id,
+            username=username,
+            discord_user=data.get('discord_user', 'Manual'),
+            added_by=data.get('added_by', 'Manual'),
+            expires_at=expires_at
+        )
+        username = user_data['username']
         
         return jsonify({
             'success': True,
             'message': f'User {username} added successfully',
             'user_id': user_id,
-            'username': username
+            'username': username,
+            'expires_at': expires_at
         })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# === TENANT ROUTES ===
+# The same views under /t/<tenant>/..., serving that tenant's whitelist. The
+# endpoint names are unchanged, so rate limits, in-flight caps and the
+# write/leader sets apply to tenant routes as they are.
+TENANT_ENDPOINTS = (
+    'check_whitelist', 'check_whitelist_batch', 'verify_username', 'get_whitelist', 'get_whitelist_changes',
+    'import_whitelist', 'export_whitelist', 'add_to_whitelist', 'remove_from_whitelist',
+    'remove_from_whitelist_direct', 'webhook_verify', 'add_user'
+)
+
+for rule in list(app.url_map.iter_rules()):
+    if rule.endpoint in TENANT_ENDPOINTS:
+        app.add_url_rule('/t/<tenant>' + rule.rule, endpoint=rule.endpoint, methods=rule.methods)
+
+@app.url_value_preprocessor
+def resolve_tenant(endpoint, values):
+    if values and 'tenant' in values:
+        tenant = tenants.get(values.pop('tenant'))
+        if tenant is None:
+            abort(404)
+        if tenant is not tenants.default:
+            g.tenant = tenant
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
@@ -0,0 +1,334 @@
+"""Push whitelist changes to registered game servers instead of making them poll.
+
+WebhookRegistry is the list of subscribers (URL, signing secret, cursor),
+kept in a small JSON file that every server process can edit (under a file
+lock, temp file + rename). WebhookDispatcher runs in one process (elected
+like the Discord bot) with a delivery thread per subscriber:
+
+- a store listener wakes the threads on every commit; each waits `window`
+  seconds so a burst of changes goes out as one request;
+- a delivery carries the changes after the subscriber's cursor, collapsed to
+  the latest state per user and in the /whitelist/changes format, at most
+  `batch_size` changes per request (bigger backlogs go out over several);
+- the body is signed with HMAC-SHA256 over "<timestamp>.<body>" using the
+  subscriber's secret (see verify_signature);
+- the cursor only advances on a 2xx answer; failures are retried with
+  exponential backoff and jitter, so nothing is skipped;
+- a subscriber whose cursor has fallen out of the store's change ring gets
+  one `resync: true` delivery and should re-fetch /whitelist.
+"""
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import random
+import secrets
+import socket
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+import requests
+
+from metrics import Counter, Histogram
+from store import unpack_record
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process, the thread lock is enough
+    fcntl = None
+
+WEBHOOK_DELIVERIES = Counter('webhook_deliveries_total', 'Webhook deliveries by result', ('result',))
+WEBHOOK_DELIVERY_SECONDS = Histogram('webhook_delivery_seconds', 'Time for a subscriber to accept a delivery')
+WEBHOOK_LAG_SECONDS = Histogram('webhook_change_lag_seconds', 'Time from a whitelist change to its delivery')
+
+SIGNATURE_HEADER = 'X-Whitelist-Signature'
+TIMESTAMP_HEADER = 'X-Whitelist-Timestamp'
+DELIVERY_HEADER = 'X-Whitelist-Delivery'
+
+
+def sign(secret, timestamp, body):
+    """Signature header value for a delivery body (bytes)"""
+    digest = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+
+def verify_signature(secret, timestamp, body, signature, tolerance=300):
+    """Check a delivery on the receiving end; rejects replays older than `tolerance` seconds"""
+    try:
+        fresh = abs(time.time() - int(timestamp)) <= tolerance
+    except (TypeError, ValueError):
+        return False
+    return fresh and hmac.compare_digest(sign(secret, timestamp, body), signature or '')
+
+
+def check_url(url, allow_private=False):
+    """Raise ValueError unless url is http(s) and its host only resolves to public addresses.
+
+    Keeps subscribers from aiming deliveries at the server's own network
+    (loopback, private ranges, link-local cloud metadata endpoints).
+    """
+    if not isinstance(url, str):
+        raise ValueError('url must be an http(s) URL')
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError('url must be an http(s) URL')
+    if allow_private:
+        return
+    try:
+        infos = socket.getaddrinfo(parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80),
+                                   proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f'Cannot resolve {parts.hostname}')
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split('%')[0])
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f'{parts.hostname} resolves to a non-public address ({address})')
+
+
+class WebhookRegistry:
+    """Subscribers persisted to a JSON file shared by all server processes"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._mtime = None
+        self.reload()
+
+    def reload(self):
+        """Re-read the file if another process (or thread) changed it"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path) as f:
+                subscribers = {subscriber['id']: subscriber for subscriber in json.load(f)}
+        except Exception as e:
+            print(f"❌ Could not load webhook subscribers: {e}")
+            return
+        self._subscribers = subscribers
+        self._mtime = mtime
+
+    def _modify(self, change):
+        """Apply change(subscribers) to the latest file contents and save them"""
+        with self._lock, open(self.path + '.lock', 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._mtime = None
+            self.reload()
+            result = change(self._subscribers)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(list(self._subscribers.values()), f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._mtime = os.stat(self.path).st_mtime_ns
+            return result
+
+    def subscribers(self):
+        return list(self._subscribers.values())
+
+    def get(self, subscriber_id):
+        return self._subscribers.get(subscriber_id)
+
+    def add(self, url, secret=None, cursor=0):
+        """Register a URL; deliveries start with the changes after `cursor`"""
+        subscriber = {
+            'id': uuid.uuid4().hex[:12],
+            'url': url,
+            'secret': secret or secrets.token_hex(32),
+            'cursor': cursor,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+
+        def add(subscribers):
+            subscribers[subscriber['id']] = subscriber
+        self._modify(add)
+        return subscriber
+
+    def remove(self, subscriber_id):
+        """Unregister; returns the removed subscriber, or None"""
+        return self._modify(lambda subscribers: subscribers.pop(subscriber_id, None))
+
+    def advance(self, subscriber_id, cursor):
+        """Record that a subscriber has everything up to `cursor`"""
+        def advance(subscribers):
+            if subscriber_id in subscribers:
+                subscribers[subscriber_id]['cursor'] = cursor
+        self._modify(advance)
+
+    def __len__(self):
+        return len(self._subscribers)
+
+
+class WebhookDispatcher:
+    """Delivers store changes to every registered subscriber"""
+
+    def __init__(self, store, registry, window=0.25, batch_size=1000, timeout=10,
+                 max_backoff=300, poll_interval=1.0, allow_private=False):
+        self.store = store
+        self.registry = registry
+        self.window = window
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self.allow_private = allow_private
+        self.session = requests.Session()
+        self._cond = threading.Condition()
+        self._workers = {}  # subscriber id -> delivery state
+        self._committed_at = {}  # seq -> commit time, for the lag histogram
+        self._running = False
+
+    def start(self):
+        if self._running:
+            return self
+        self._running = True
+        self.store.add_listener(self._changed, sync=self._resynced)
+        threading.Thread(target=self._supervise, daemon=True).start()
+        print(f"📡 Webhook dispatcher started ({len(self.registry)} subscribers)")
+        return self
+
+    def _changed(self, changes):
+        with self._cond:
+            self._committed_at[changes[-1][0]] = time.time()
+            if len(self._committed_at) > 10000:
+                for seq in sorted(self._committed_at)[:5000]:
+                    del self._committed_at[seq]
+            self._cond.notify_all()
+
+    def _resynced(self, snapshot):
+        with self._cond:
+            self._cond.notify_all()
+
+    # === SUBSCRIBERS ===
+    def _supervise(self):
+        """Start and stop delivery threads as subscribers come and go"""
+        while True:
+            try:
+                self.registry.reload()
+                ids = {subscriber['id'] for subscriber in self.registry.subscribers()}
+                with self._cond:
+                    for subscriber_id in ids - self._workers.keys():
+                        state = {'failures': 0, 'last_error': None, 'last_delivery': None,
+                                 'next_attempt': None, 'delivered': 0}
+                        self._workers[subscriber_id] = state
+                        threading.Thread(target=self._deliver_loop, args=(subscriber_id, state),
+                                         daemon=True).start()
+                    for subscriber_id in self._workers.keys() - ids:
+                        del self._workers[subscriber_id]
+                    self._cond.notify_all()
+            except Exception as e:
+                print(f"❌ Webhook supervisor error: {e}")
+            time.sleep(self.poll_interval)
+
+    def _deliver_loop(self, subscriber_id, state):
+        while True:
+            with self._cond:
+                while True:
+                    if self._workers.get(subscriber_id) is not state:
+                        return
+                    subscriber = self.registry.get(subscriber_id)
+                    if subscriber is not None and subscriber['cursor'] < self.store.seq:
+                        break
+                    self._cond.wait(self.poll_interval)
+            # Let a burst of writes accumulate into one delivery
+            time.sleep(self.window)
+            subscriber = self.registry.get(subscriber_id)
+            if subscriber is None:
+                continue
+            try:
+                self._deliver(subscriber, state)
+                state['failures'] = 0
+                state['last_error'] = None
+                state['next_attempt'] = None
+            except Exception as e:
+                state['failures'] += 1
+                state['last_error'] = str(e)
+                WEBHOOK_DELIVERIES.inc('error')
+                backoff = min(self.max_backoff, 2 ** (state['failures'] - 1))
+                backoff *= random.uniform(0.5, 1.0)
+                state['next_attempt'] = time.time() + backoff
+                print(f"⚠️  Webhook delivery to {subscriber['url']} failed ({state['failures']}x): {e}; "
+                      f"retrying in {backoff:.1f}s")
+                time.sleep(backoff)
+
+    # === DELIVERY ===
+    def payload(self, subscriber):
+        """Next delivery for a subscriber: (seq it brings them to, body dict)"""
+        since = subscriber['cursor']
+        result = self.store.log_after(since, self.batch_size)
+        if result is None:
+            seq = self.store.seq
+            return seq, {'resync': True, 'since': since, 'seq': seq,
+                         'message': 'Changes are no longer available, fetch /whitelist again'}
+        _latest, entries = result
+        latest = {}
+        for entry in entries:
+            latest[entry['id']] = entry
+        seq = entries[-1]['seq'] if entries else since
+        added = {user_id: unpack_record(entry['rec']) for user_id, entry in latest.items() if entry['op'] == 'put'}
+        return seq, {
+            'resync': False,
+            'since': since,
+            'seq': seq,
+            'added': list(added),
+            'added_users': {str(user_id): user_data for user_id, user_data in added.items()},
+            'removed': [user_id for user_id, entry in latest.items() if entry['op'] == 'del'],
+        }
+
+    def _deliver(self, subscriber, state):
+        # Checked again on every delivery, as the host may since resolve somewhere private
+        check_url(subscriber['url'], allow_private=self.allow_private)
+        seq, payload = self.payload(subscriber)
+        delivery_id = uuid.uuid4().hex
+        body = json.dumps(dict(payload, delivery=delivery_id, subscriber=subscriber['id']),
+                          separators=(',', ':')).encode()
+        timestamp = str(int(time.time()))
+        headers = {
+            'Content-Type': 'application/json',
+            SIGNATURE_HEADER: sign(subscriber['secret'], timestamp, body),
+            TIMESTAMP_HEADER: timestamp,
+            DELIVERY_HEADER: delivery_id,
+        }
+        started = time.perf_counter()
+        # Redirects are not followed (a 3xx is a failed delivery): they could point anywhere
+        response = self.session.post(subscriber['url'], data=body, timeout=self.timeout, headers=headers,
+                                     allow_redirects=False)
+        WEBHOOK_DELIVERY_SECONDS.observe(time.perf_counter() - started)
+        if not 200 <= response.status_code < 300:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        WEBHOOK_DELIVERIES.inc('ok')
+        committed_at = self._committed_at.get(seq)
+        if committed_at is not None:
+            WEBHOOK_LAG_SECONDS.observe(time.time() - committed_at)
+        self.registry.advance(subscriber['id'], seq)
+        state['last_delivery'] = time.time()
+        state['delivered'] += 1
+
+    # === STATUS ===
+    def status(self):
+        """Per-subscriber delivery state (secrets left out)"""
+        seq = self.store.seq
+        result = []
+        for subscriber in self.registry.subscribers():
+            state = self._workers.get(subscriber['id'], {})
+            result.append({
+                'id': subscriber['id'],
+                'url': subscriber['url'],
+                'cursor': subscriber['cursor'],
+                'lag_entries': max(0, seq - subscriber['cursor']),
+                'deliveries': state.get('delivered', 0),
+                'failures': state.get('failures', 0),
+                'last_error': state.get('last_error'),
+                'last_delivery': state.get('last_delivery'),
+                'next_attempt': state.get('next_attempt'),
+            })
+        return result
@@ -0,0 +1,178 @@
+"""Whitelist operations shared by the Flask routes and the Discord bot.
+
+Both sides call this layer directly instead of the bot making HTTP requests
+back to its own web server. Reads only touch memory and are safe to call from
+the event loop. The async variants of the blocking calls await the store's
+durable write and, when async resolvers are given, the Roblox lookup itself;
+without them the lookup runs on a worker thread so the loop never stalls.
+
+With `enrich` (a UsernameBackfill's submit), adds without a username don't
+look it up at all: the user is stored under the placeholder name at once and
+the real name is patched in by the backfill workers.
+
+Every add takes an optional expires_at (see expiry.parse_expires_at); the
+ExpiryScheduler removes the user when it passes.
+"""
+import asyncio
+import time
+
+from bulk import placeholder_username
+from expiry import parse_expires_at
+
+
+class WhitelistService:
+    """Whitelist business logic on top of a WhitelistStore"""
+
+    def __init__(self, store, resolve_username, resolve_user_id,
+                 resolve_username_async=None, resolve_user_id_async=None, enrich=None):
+        self.store = store
+        self.enrich = enrich
+        self.resolve_username = resolve_username
+        self.resolve_user_id = resolve_user_id
+        self.resolve_username_async = resolve_username_async or (
+            lambda user_id: asyncio.to_thread(resolve_username, user_id))
+        self.resolve_user_id_async = resolve_user_id_async or (
+            lambda username: asyncio.to_thread(resolve_user_id, username))
+
+    # === SYNC API (Flask routes) ===
+    def check(self, user_id):
+        """Return the whitelist status of a Roblox user ID"""
+        user_data = self.store.get(user_id) or {}
+        return {
+            'whitelisted': bool(user_data),
+            'user_id': user_id,
+            'username': user_data.get('username', 'Unknown'),
+            'discord_user': user_data.get('discord_user', 'Unknown')
+        }
+
+    def check_batch(self, user_ids):
+        """Return which of user_ids are whitelisted, from a single consistent read"""
+        return self.store.whitelisted_among(user_ids)
+
+    def verify(self, username):
+        """Resolve a Roblox username; returns None if Roblox doesn't know it"""
+        return self._verified(*self.resolve_user_id(username))
+
+    def _verified(self, user_id, verified_username):
+        if not user_id:
+            return None
+        return {
+            'success': True,
+            'user_id': user_id,
+            'username': verified_username,
+            'whitelisted': user_id in self.store,
+            'profile_url': f'https://www.roblox.com/users/{user_id}/profile'
+        }
+
+    def add(self, user_id, username=None, discord_user='API', added_by='API', added_at=None, expires_at=None):
+        """Whitelist a user, looking the username up on Roblox if not given.
+
+        expires_at (Unix seconds, ISO 8601 or a duration like "7d") makes the
+        entry time-limited; raises ValueError if it can't be parsed.
+        """
+        user_id = int(user_id)
+        expires_at = parse_expires_at(expires_at)
+        if not username and self.enrich is not None:
+            user_data = self.store.put(user_id, self._user_data(placeholder_username(user_id), discord_user,
+                                                                added_by, added_at, expires_at))
+            self.enrich([user_id])
+            return user_data
+        if not username:
+            username = self.resolve_username(user_id) or placeholder_username(user_id)
+        return self.store.put(user_id, self._user_data(username, discord_user, added_by, added_at, expires_at))
+
+    @staticmethod
+    def _user_data(username, discord_user, added_by, added_at=None, expires_at=None):
+        return {
+            'username': username,
+            'discord_user': discord_user,
+            'added_at': added_at or time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'added_by': added_by,
+            'expires_at': expires_at
+        }
+
+    def add_many(self, users, added_by='API'):
+        """Whitelist several users (dicts with user_id, username, discord_user, expires_at) in one write"""
+        results = self.store.apply(self._add_many_ops(users, added_by))
+        self._enrich_placeholders(users)
+        return results
+
+    def _enrich_placeholders(self, users):
+        if self.enrich is not None:
+            missing = [int(user['user_id']) for user in users if not user.get('username')]
+            if missing:
+                self.enrich(missing)
+
+    @staticmethod
+    def _add_many_ops(users, added_by):
+        added_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        return [('put', int(user['user_id']), {
+            'username': user.get('username') or placeholder_username(user['user_id']),
+            'discord_user': user.get('discord_user', 'API'),
+            'added_at': added_at,
+            'added_by': added_by,
+            'expires_at': parse_expires_at(user.get('expires_at'))
+        }) for user in users]
+
+    def remove(self, user_id):
+        """Remove a user; returns the removed user dict, or None if absent"""
+        return self.store.delete(int(user_id))
+
+    def list_users(self):
+        """Return a list of (user_id, user dict) pairs"""
+        return self.store.items()
+
+    def list_users_with_seq(self):
+        """Return (seq, users) so clients can poll changes_since(seq) afterwards"""
+        return self.store.items_with_seq()
+
+    def list_page(self, after, limit):
+        """Return (seq, users) for one page of users ordered by user ID"""
+        return self.store.page(after, limit)
+
+    def snapshot(self):
+        """Consistent view of the whole whitelist for streaming exports"""
+        return self.store.snapshot()
+
+    def changes_since(self, since):
+        """Delta since a sequence number, or None if the client must resync"""
+        return self.store.changes_since(since)
+
+    def ids(self):
+        return self.store.ids()
+
+    def count(self):
+        return len(self.store)
+
+    # === ASYNC API (Discord bot, async server) ===
+    async def check_async(self, user_id):
+        return self.check(user_id)
+
+    async def verify_async(self, username):
+        return self._verified(*await self.resolve_user_id_async(username))
+
+    async def add_async(self, user_id, username=None, discord_user='API', added_by='API', added_at=None,
+                        expires_at=None):
+        user_id = int(user_id)
+        expires_at = parse_expires_at(expires_at)
+        if not username and self.enrich is not None:
+            user_data = await self.store.put_async(user_id, self._user_data(placeholder_username(user_id),
+                                                                            discord_user, added_by, added_at,
+                                                                            expires_at))
+            self.enrich([user_id])
+            return user_data
+        if not username:
+            username = await self.resolve_username_async(user_id) or placeholder_username(user_id)
+        return await self.store.put_async(user_id, self._user_data(username, discord_user, added_by, added_at,
+                                                                   expires_at))
+
+    async def add_many_async(self, users, added_by='API'):
+        results = await self.store.apply_async(self._add_many_ops(users, added_by))
+        self._enrich_placeholders(users)
+        return results
+
+    async def remove_async(self, user_id):
+        return await self.store.delete_async(int(user_id))
+
+    async def list_users_async(self):
+        return self.list_users()